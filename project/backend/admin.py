@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Shop, Order, OrderItem, Product, ProductInfo, ProductParameter, Parameter, Category
+from .models import (Shop, Order, OrderItem, Product, ProductInfo, ProductParameter, Parameter, Category,
+                     ImportJob, ParameterFacet)
 
 
 admin.site.register(Shop)
@@ -9,4 +10,6 @@ admin.site.register(Parameter)
 admin.site.register(Product)
 admin.site.register(ProductInfo)
 admin.site.register(ProductParameter)
-admin.site.register(Category)
\ No newline at end of file
+admin.site.register(Category)
+admin.site.register(ImportJob)
+admin.site.register(ParameterFacet)
@@ -0,0 +1,16 @@
+from asgiref.sync import sync_to_async
+
+
+async def aiterate(iterator):
+    """
+    Yield the items of a synchronous iterator, each one fetched in the sync thread.
+
+    Django's ASGI handler reads a synchronous streaming response whole with
+    ``sync_to_async(list)`` before sending it; this lets it send every item
+    as soon as it is produced.
+    """
+    iterator = iter(iterator)
+    end = object()
+    fetch = sync_to_async(next, thread_sensitive=True)
+    while (item := await fetch(iterator, end)) is not end:
+        yield item
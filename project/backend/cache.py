@@ -0,0 +1,88 @@
+import hashlib
+from functools import partial
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CatalogVersion, Shop
+
+
+CATALOG_CACHE = 'catalog'
+CATALOG_VERSION_ID = 1
+
+# hits/misses of the catalog cache in this process
+stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+
+def catalog_version():
+    return CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', flat=True).first() or 0
+
+
+def bump_catalog_version(shop_ids=()):
+    """
+    Invalidate all cached catalog responses, and the snapshots of the shops
+    whose goods changed, once the current transaction commits.
+    """
+    transaction.on_commit(partial(_increment_version, sorted(set(shop_ids))))
+
+
+def _increment_version(shop_ids=()):
+    if shop_ids:
+        Shop.objects.filter(pk__in=shop_ids).update(catalog_version=F('catalog_version') + 1)
+    if not CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(version=F('version') + 1):
+        CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_ID, defaults={'version': 1})
+
+
+class CatalogCacheMixin:
+    """
+    Cache the rendered responses of a read-only catalog list view.
+
+    Responses are keyed by the normalized query string, the negotiated format
+    and the catalog version, so bumping the version invalidates all of them at
+    once and the old entries just expire. The key doubles as the ETag: a request
+    with a matching ``If-None-Match`` gets 304 without reading the cache at all.
+    """
+    cache_alias = CATALOG_CACHE
+
+    def get_cache_key(self, request):
+        query = sorted((name, value) for name, values in request.query_params.lists() for value in values if value)
+        key = '|'.join([
+            str(catalog_version()),
+            request.accepted_renderer.format,
+            request.build_absolute_uri(request.path),
+            urlencode(query),
+        ])
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        self.cache_key = self.get_cache_key(request)
+        etag = f'"{self.cache_key}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            stats['not_modified'] += 1
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag, 'X-Cache': 'HIT'})
+
+        cached = caches[self.cache_alias].get(f'catalog:{self.cache_key}')
+        if cached is not None:
+            stats['hits'] += 1
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type,
+                                headers={'ETag': etag, 'X-Cache': 'HIT', 'Vary': 'Accept'})
+
+        stats['misses'] += 1
+        response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.get('X-Cache') == 'MISS' and response.status_code == status.HTTP_200_OK:
+            response.render()
+            caches[self.cache_alias].set(f'catalog:{self.cache_key}', (response.content, response['Content-Type']))
+        return response
@@ -0,0 +1,78 @@
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .fast_serializers import ProductInfoValues
+from .models import ProductInfo
+from .renderers import orjson
+
+
+EXPORT_FORMATS = ('json', 'ndjson')
+EXPORT_CHUNK_SIZE = 2000
+# bytes gathered before a piece of the export is sent
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def _encoder():
+    if orjson is not None:
+        return lambda row: orjson.dumps(row, default=DjangoJSONEncoder().default)
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    return lambda row: encoder.encode(row).encode()
+
+
+def catalog_rows(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    The whole catalog in the shape of the product listing, read with a
+    server-side cursor ``chunk_size`` rows at a time.
+    """
+    serializer = ProductInfoValues()
+    build = serializer.build
+    for row in serializer.values(ProductInfo.objects.order_by('pk')).iterator(chunk_size=chunk_size):
+        yield build(row)
+
+
+def export_catalog(format='json', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Encode the catalog incrementally as a JSON array or as NDJSON.
+
+    Memory stays flat whatever the size of the catalog: rows are encoded as
+    they are read and yielded in pieces of about ``EXPORT_BUFFER_SIZE`` bytes.
+
+    Yields:
+        bytes: The consecutive pieces of the document.
+    """
+    encode = _encoder()
+    separator, opening, closing = (b',', b'[', b']') if format == 'json' else (b'\n', b'', b'\n')
+    buffer = bytearray(opening)
+    first = True
+    for row in catalog_rows(chunk_size):
+        if not first:
+            buffer += separator
+        first = False
+        buffer += encode(row)
+        if len(buffer) >= EXPORT_BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if not first or format == 'json':
+        buffer += closing
+    if buffer:
+        yield bytes(buffer)
+
+
+def gzip_stream(pieces, level=6):
+    """
+    Compress a stream of bytes on the fly into a gzip member.
+
+    The first piece is flushed at once, so that the client receives the
+    first bytes without waiting for the compressor to fill its window.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    first = True
+    for piece in pieces:
+        data = compressor.compress(piece)
+        if first:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
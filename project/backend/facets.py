@@ -0,0 +1,98 @@
+import re
+
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.fields.json import KeyTransform
+
+from .feeds import parameter_value
+from .models import ParameterFacet, ProductParameter
+
+
+PREDICATE_RE = re.compile(r'^(?P<name>[^<>=!]+?)\s*(?P<operator>>=|<=|!=|=|>|<)\s*(?P<value>.*)$')
+LOOKUPS = {'=': 'exact', '!=': 'exact', '>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte'}
+
+
+def parse_predicate(predicate):
+    """
+    Parse a predicate like ``Цвет=черный`` or ``Встроенная память (Гб)>=256``.
+
+    Returns:
+        tuple: ``(name, operator, value)``.
+
+    Raises:
+        ValueError: If the predicate has no operator or no parameter name.
+    """
+    match = PREDICATE_RE.match(predicate.strip())
+    if match is None:
+        raise ValueError(f'Invalid parameter predicate: {predicate}')
+    return match['name'].strip(), match['operator'], parameter_value(match['value'])
+
+
+def filter_parameters(queryset, predicates):
+    """
+    Narrow a ``ProductInfo`` queryset down with parsed parameter predicates.
+
+    Equality runs as JSONB containment on PostgreSQL, which the GIN index on
+    ``parameters`` serves; comparisons (and equality elsewhere) extract the key.
+    """
+    for number, (name, operator, value) in enumerate(predicates):
+        if operator == '=' and connection.vendor == 'postgresql':
+            queryset = queryset.filter(parameters__contains={name: value})
+            continue
+        alias = f'parameter_{number}'
+        queryset = queryset.alias(**{alias: KeyTransform(name, 'parameters')})
+        condition = Q(**{f'{alias}__{LOOKUPS[operator]}': value})
+        queryset = queryset.exclude(condition) if operator == '!=' else queryset.filter(condition)
+    return queryset
+
+
+def facet_counts(queryset=None):
+    """
+    Number of goods per parameter value.
+
+    Without a queryset the precomputed ``ParameterFacet`` table is read;
+    otherwise values are counted over the goods of the (filtered) queryset.
+
+    Returns:
+        dict: ``{parameter name: {value: count}}``, most frequent values first.
+    """
+    if queryset is None:
+        rows = ParameterFacet.objects.order_by('parameter__name', '-count', 'value').values_list(
+            'parameter__name', 'value', 'count')
+    else:
+        rows = ProductParameter.objects.filter(product_info__in=queryset.values('pk')).values_list(
+            'parameter__name', 'value').annotate(count=Count('id')).order_by('parameter__name', '-count', 'value')
+    facets = {}
+    for name, value, count in rows:
+        facets.setdefault(name, {})[value] = count
+    return facets
+
+
+def refresh_facets(parameter_ids):
+    """
+    Recount the precomputed facet values of the given parameters.
+
+    Counts are written as upserts, so imports of different shops running at
+    the same time never conflict; each of them leaves the counts it could see,
+    and the next import touching a parameter brings its counts up to date.
+    """
+    parameter_ids = list(parameter_ids)
+    if not parameter_ids:
+        return
+    counts = ProductParameter.objects.filter(parameter_id__in=parameter_ids).values_list(
+        'parameter_id', 'value').annotate(count=Count('id')).order_by()
+    facets = [ParameterFacet(parameter_id=parameter_id, value=value, count=count)
+              for parameter_id, value, count in counts]
+    ParameterFacet.objects.bulk_create(
+        facets,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['parameter', 'value'],
+        update_fields=['count'],
+    )
+    current = {(facet.parameter_id, facet.value) for facet in facets}
+    stale = [pk for pk, parameter_id, value in ParameterFacet.objects.filter(
+        parameter_id__in=parameter_ids).values_list('id', 'parameter_id', 'value')
+        if (parameter_id, value) not in current]
+    if stale:
+        ParameterFacet.objects.filter(pk__in=stale).delete()
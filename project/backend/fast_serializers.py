@@ -0,0 +1,110 @@
+from django.db import models
+from rest_framework.response import Response
+
+from .models import OrderItem, ProductInfo
+from .pagination import KeysetPagination
+
+
+def _decimal(decimal_places):
+    # the string DRF's DecimalField renders for a value stored with these places
+    return lambda value: None if value is None else f'{value:.{decimal_places}f}'
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer building the JSON of a ModelSerializer from ``values()`` rows.
+
+    ``shape`` mirrors the output: a lookup for every field and a dict for every
+    nested object. No model instance is created and no DRF field runs per
+    row; values needing a conversion (decimals) are converted by a function
+    chosen once from the model field.
+    """
+    model = None
+    shape = {}
+
+    def __init__(self):
+        self.lookups = []
+        self.build = self.builder(self.shape)
+
+    def builder(self, shape):
+        parts = []
+        for key, spec in shape.items():
+            if isinstance(spec, dict):
+                parts.append((key, None, self.builder(spec)))
+            else:
+                self.lookups.append(spec)
+                parts.append((key, spec, self.converter(spec)))
+
+        def build(row):
+            return {key: (convert(row) if lookup is None else convert(row[lookup]) if convert else row[lookup])
+                    for key, lookup, convert in parts}
+        return build
+
+    def converter(self, lookup):
+        model = self.model
+        for name in lookup.split('__'):
+            field = model._meta.get_field(name)
+            model = field.related_model
+        if isinstance(field, models.DecimalField):
+            return _decimal(field.decimal_places)
+        return None
+
+    def values(self, queryset, extra=()):
+        """
+        The queryset selecting the lookups of the shape, and ``extra`` ones such as the pagination keys.
+        """
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*self.lookups, *extra]))
+
+    def serialize(self, rows):
+        build = self.build
+        return [build(row) for row in rows]
+
+
+class ProductInfoValues(ValuesSerializer):
+    """
+    The output of ProductInfoSerializer.
+    """
+    model = ProductInfo
+    shape = {
+        'model': 'model',
+        'quantity': 'quantity',
+        'price_rrc': 'price_rrc',
+        'shop': {'id': 'shop_id', 'name': 'shop__name'},
+        'product': {'id': 'product_id', 'name': 'product__name'},
+    }
+
+
+class ListItemsValues(ValuesSerializer):
+    """
+    The output of ListItemsSerializer.
+    """
+    model = OrderItem
+    shape = {
+        'order': 'order_id',
+        'product': {'id': 'product_id', 'name': 'product__name'},
+        'quantity': 'quantity',
+        'shop': 'shop_id',
+        'unit_price': 'unit_price',
+        'total_price': 'total_price',
+    }
+
+
+class ValuesListMixin:
+    """
+    List a read-only endpoint through ``values_serializer_class`` instead of its ModelSerializer.
+    """
+    values_serializer_class = None
+
+    def values_queryset(self, queryset):
+        serializer = self.values_serializer_class()
+        extra = []
+        if isinstance(self.paginator, KeysetPagination):
+            extra = [field.lstrip('-') for field in self.paginator.get_ordering(queryset)]
+        return serializer, serializer.values(queryset, extra)
+
+    def list(self, request, *args, **kwargs):
+        serializer, queryset = self.values_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
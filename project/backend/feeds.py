@@ -0,0 +1,409 @@
+import asyncio
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import math
+import posixpath
+import tempfile
+import threading
+from collections import defaultdict
+from itertools import islice
+from urllib.parse import urlparse
+
+from requests import RequestException, Session
+from requests.adapters import HTTPAdapter
+from yaml import SafeLoader, YAMLError
+from yaml.composer import Composer
+from yaml.constructor import SafeConstructor
+from yaml.events import MappingStartEvent, MappingEndEvent, SequenceStartEvent, SequenceEndEvent
+from yaml.resolver import Resolver
+
+try:
+    from yaml.cyaml import CParser
+except ImportError:
+    CParser = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+FEED_FORMATS = ('yaml', 'json', 'jsonl', 'csv')
+CHUNK_SIZE = 64 * 1024
+MAX_FEED_SIZE = 256 * 1024 * 1024
+# seconds to connect and to wait for the next chunk of a feed
+FETCH_TIMEOUT = (10, 60)
+CONNECTIONS_PER_HOST = 4
+HOSTS_KEPT = 100
+
+_session = None
+_session_lock = threading.Lock()
+
+EXTENSION_FORMATS = {
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+}
+
+CONTENT_TYPE_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+    'text/csv': 'csv',
+}
+
+CSV_GOOD_FIELDS = ('id', 'category', 'category_name', 'model', 'name', 'price', 'price_rrc', 'quantity')
+
+
+class FeedError(Exception):
+    pass
+
+
+if CParser is not None:
+    class FeedLoader(CParser, Composer, SafeConstructor, Resolver):
+        """
+        Safe loader on top of libyaml which can compose single nodes,
+        so that a document can be constructed one sequence item at a time.
+        """
+
+        def __init__(self, stream):
+            CParser.__init__(self, stream)
+            Composer.__init__(self)
+            SafeConstructor.__init__(self)
+            Resolver.__init__(self)
+else:
+    FeedLoader = SafeLoader
+
+
+def detect_format(url, content_type=None):
+    """
+    Guess the feed format from the URL extension, then from the response content type.
+    YAML is assumed when neither is conclusive.
+    """
+    extension = posixpath.splitext(urlparse(url).path)[1].lower()
+    if extension in EXTENSION_FORMATS:
+        return EXTENSION_FORMATS[extension]
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(content_type, 'yaml')
+
+
+def parameter_value(value):
+    """
+    Value of a parameter as it is kept in ``ProductInfo.parameters``.
+
+    Numbers, and strings holding numbers as the values of CSV feeds do, stay
+    or become numbers, so that range predicates compare them numerically;
+    everything that JSON cannot hold as is (dates, NaN) is stored as a string.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        for convert in (int, float):
+            try:
+                value = convert(value)
+            except ValueError:
+                continue
+            break
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else str(value)
+    return str(value)
+
+
+class FeedReader:
+    """
+    Incremental reader of a shop price list from a binary file object.
+
+    The header of the feed (``shop`` and ``categories``) is read on creation;
+    goods are parsed lazily while iterating over ``goods()`` or ``batches()``,
+    so memory use does not depend on the size of the feed.
+
+    Supported formats:
+        yaml, json: a document shaped like ``shop1.yaml``.
+        jsonl: one JSON object per line; objects with an ``id`` are goods,
+            the others (``{"shop": ..., "categories": [...]}``) are header records.
+        csv: one good per row with ``id, category, model, name, price, price_rrc, quantity``
+            columns, an optional ``category_name`` column, every other column is a parameter.
+            The shop name is taken from the ``shop`` argument.
+    """
+
+    def __init__(self, stream, format='yaml', shop=None):
+        if format not in FEED_FORMATS:
+            raise FeedError(f'Unsupported feed format: {format}')
+        self.shop = shop
+        self.categories = []
+        parse = {'yaml': self._parse_yaml, 'json': self._parse_yaml,
+                 'jsonl': self._parse_jsonl, 'csv': self._parse_csv}[format]
+        self._items = parse(stream)
+        self._first = None
+        while (item := self._next()) is not None:
+            key, value = item
+            if key == 'good':
+                self._first = value
+                break
+            if key == 'shop':
+                self.shop = value
+            elif key == 'categories':
+                self.categories.extend(value or [])
+        if not self.shop:
+            raise KeyError('shop')
+
+    def goods(self):
+        if self._first is None:
+            return
+        yield self._first
+        self._first = None
+        while (item := self._next()) is not None:
+            key, value = item
+            if key == 'good':
+                yield value
+
+    def batches(self, size):
+        goods = self.goods()
+        while batch := list(islice(goods, size)):
+            yield batch
+
+    def _next(self):
+        try:
+            return next(self._items, None)
+        except (YAMLError, ValueError, csv.Error) as er:
+            raise FeedError(f'Invalid feed: {er}') from er
+
+    @staticmethod
+    def _parse_yaml(stream):
+        loader = FeedLoader(stream)
+        try:
+            loader.get_event()
+            loader.get_event()
+            if not loader.check_event(MappingStartEvent):
+                raise FeedError('Invalid feed: the document should be a mapping')
+            loader.get_event()
+            while not loader.check_event(MappingEndEvent):
+                key = loader.construct_document(loader.compose_node(None, None))
+                if key == 'goods' and loader.check_event(SequenceStartEvent):
+                    loader.get_event()
+                    while not loader.check_event(SequenceEndEvent):
+                        yield 'good', loader.construct_document(loader.compose_node(None, None))
+                    loader.get_event()
+                else:
+                    yield key, loader.construct_document(loader.compose_node(None, None))
+        finally:
+            loader.dispose()
+
+    @staticmethod
+    def _parse_jsonl(stream):
+        for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'id' in record:
+                yield 'good', record
+            else:
+                yield from record.items()
+
+    @staticmethod
+    def _parse_csv(stream):
+        rows = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        for row in rows:
+            good = {field: row[field] for field in CSV_GOOD_FIELDS if row.get(field)}
+            good['parameters'] = {name: parameter_value(value) for name, value in row.items()
+                                  if name not in CSV_GOOD_FIELDS and name and value}
+            yield 'good', good
+
+
+class Download:
+    """
+    A fetched feed spooled to a temporary file, with the validators needed to skip unchanged feeds.
+    """
+
+    def __init__(self, file=None, digest='', etag='', last_modified='', content_type='', not_modified=False):
+        self.file = file
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+        self.not_modified = not_modified
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class _Spool:
+    """
+    Write the decoded body of a response into a temporary file while hashing
+    and measuring it, so that an oversized feed fails before filling the disk.
+    The file is closed, and so removed, when the download fails.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > MAX_FEED_SIZE:
+            raise FeedError(f'The feed is larger than {MAX_FEED_SIZE} bytes')
+        self.digest.update(chunk)
+        self.file.write(chunk)
+
+    def close(self):
+        self.file.close()
+
+    def download(self, headers):
+        self.file.seek(0)
+        return Download(
+            file=self.file,
+            digest=self.digest.hexdigest(),
+            etag=headers.get('ETag', ''),
+            last_modified=headers.get('Last-Modified', ''),
+            content_type=headers.get('Content-Type', ''),
+        )
+
+
+def _conditional_headers(etag, last_modified):
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+def _check_response(response, etag, last_modified):
+    if response.status_code == 304:
+        return Download(etag=etag, last_modified=last_modified, not_modified=True)
+    if response.status_code != 200:
+        raise FeedError(f'Could not fetch the feed: HTTP {response.status_code}')
+    if int(response.headers.get('Content-Length') or 0) > MAX_FEED_SIZE:
+        raise FeedError(f'The feed is larger than {MAX_FEED_SIZE} bytes')
+    return None
+
+
+def feed_session():
+    """
+    The keep-alive session shared by all downloads of the process.
+
+    At most ``CONNECTIONS_PER_HOST`` connections are kept and used per
+    supplier; further downloads from the same host wait for a free one.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_connections=HOSTS_KEPT, pool_maxsize=CONNECTIONS_PER_HOST, pool_block=True)
+            _session = Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def download_feed(url, etag='', last_modified=''):
+    """
+    Download a feed chunk by chunk into a temporary file while hashing it.
+
+    The body may be gzip or deflate compressed and is stored decoded. A feed
+    over ``MAX_FEED_SIZE`` or a server slower than ``FETCH_TIMEOUT`` fails.
+    Transport errors are raised as FeedError, as in ``adownload_feed``.
+
+    Parameters:
+        url (str): The address of the feed.
+        etag (str): The ETag of the previous download, sent as If-None-Match.
+        last_modified (str): The Last-Modified of the previous download, sent as If-Modified-Since.
+
+    Returns:
+        Download: ``not_modified`` is set when the server answered 304.
+    """
+    headers = _conditional_headers(etag, last_modified)
+    try:
+        with feed_session().get(url, stream=True, headers=headers, timeout=FETCH_TIMEOUT) as response:
+            not_modified = _check_response(response, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            spool = _Spool()
+            try:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    spool.write(chunk)
+            except BaseException:
+                spool.close()
+                raise
+            return spool.download(response.headers)
+    except RequestException as er:
+        raise FeedError(f'Could not fetch the feed: {er}') from er
+
+
+class FeedClient:
+    """
+    Connections shared by concurrent downloads: an ``httpx`` client, when it is
+    installed, and a limit of simultaneous downloads per supplier host.
+    """
+
+    def __init__(self, http=None, connections_per_host=CONNECTIONS_PER_HOST):
+        self.http = http
+        self.slots = defaultdict(lambda: asyncio.Semaphore(connections_per_host))
+
+    def slot(self, url):
+        return self.slots[urlparse(url).netloc]
+
+
+@contextlib.asynccontextmanager
+async def feed_client():
+    """
+    Open a FeedClient for a batch of concurrent downloads.
+    """
+    if httpx is None:
+        yield FeedClient()
+        return
+    connect_timeout, read_timeout = FETCH_TIMEOUT
+    async with httpx.AsyncClient(follow_redirects=True, timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                                 limits=httpx.Limits(max_keepalive_connections=HOSTS_KEPT)) as http:
+        yield FeedClient(http)
+
+
+async def adownload_feed(url, etag='', last_modified='', client=None):
+    """
+    Asynchronous ``download_feed``, so that one process can wait for many slow feeds at once.
+
+    The feed is fetched with ``httpx`` when it is installed; otherwise
+    ``download_feed`` runs in a thread. Transport errors are raised as FeedError.
+
+    Parameters:
+        url (str): The address of the feed.
+        etag (str): The ETag of the previous download, sent as If-None-Match.
+        last_modified (str): The Last-Modified of the previous download, sent as If-Modified-Since.
+        client (FeedClient): The client of ``feed_client``, a new one is opened when omitted.
+
+    Returns:
+        Download: ``not_modified`` is set when the server answered 304.
+    """
+    if client is None:
+        async with feed_client() as client:
+            return await adownload_feed(url, etag, last_modified, client)
+
+    async with client.slot(url):
+        if client.http is None:
+            return await asyncio.to_thread(download_feed, url, etag, last_modified)
+        try:
+            async with client.http.stream('GET', url, headers=_conditional_headers(etag, last_modified)) as response:
+                not_modified = _check_response(response, etag, last_modified)
+                if not_modified is not None:
+                    return not_modified
+
+                spool = _Spool()
+                try:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        spool.write(chunk)
+                except BaseException:
+                    spool.close()
+                    raise
+                return spool.download(response.headers)
+        except httpx.HTTPError as er:
+            raise FeedError(f'Could not fetch the feed: {er}') from er
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F
+from django_filters import rest_framework as django_filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .facets import filter_parameters, parse_predicate
+from .models import Order, STATUS_CHOICES
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    Full-text search over ``ProductInfo.search_document`` with the ``q`` parameter.
+
+    On PostgreSQL the query runs against the precomputed ``search_vector``
+    (GIN index) and results are ordered by relevance; when nothing matches,
+    trigram word similarity (``pg_trgm`` GIN index) catches misspellings.
+    Other databases fall back to substring matching of every search term.
+    """
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        if connection.vendor == 'postgresql':
+            return self.postgres_search(queryset, query)
+        return self.fallback_search(queryset, query)
+
+    def postgres_search(self, queryset, query):
+        search_query = SearchQuery(query, config=settings.CATALOG_SEARCH_CONFIG, search_type='websearch')
+        found = queryset.filter(search_vector=search_query)
+        if found.exists():
+            return found.annotate(rank=SearchRank(F('search_vector'), search_query)).order_by('-rank')
+        return queryset.filter(search_document__trigram_word_similar=query.lower()).annotate(
+            rank=TrigramWordSimilarity(query.lower(), 'search_document'),
+        ).order_by('-rank')
+
+    def fallback_search(self, queryset, query):
+        for term in query.lower().split():
+            queryset = queryset.filter(search_document__contains=term)
+        return queryset
+
+
+class ParameterFilter(BaseFilterBackend):
+    """
+    Filtering by product parameters with repeated ``param`` predicates, e.g.
+    ``?param=Цвет=черный&param=Встроенная память (Гб)>=256``.
+
+    Supported operators are ``=``, ``!=``, ``>``, ``>=``, ``<`` and ``<=``;
+    predicates run on the ``ProductInfo.parameters`` document, not on the
+    ``ProductParameter`` rows.
+    """
+    parameter_param = 'param'
+
+    def filter_queryset(self, request, queryset, view):
+        try:
+            predicates = [parse_predicate(predicate) for predicate in
+                          request.query_params.getlist(self.parameter_param) if predicate.strip()]
+        except ValueError as er:
+            raise ValidationError({self.parameter_param: [str(er)]})
+        if not predicates:
+            return queryset
+        return filter_parameters(queryset, predicates)
+
+
+class ShopFilter(BaseFilterBackend):
+    """
+    Goods of one shop with ``?shop=<id>``.
+    """
+    shop_param = 'shop'
+
+    def get_shop_id(self, request):
+        shop = request.query_params.get(self.shop_param, '').strip()
+        if not shop:
+            return None
+        try:
+            return int(shop)
+        except ValueError:
+            raise ValidationError({self.shop_param: ['A shop id is expected']})
+
+    def filter_queryset(self, request, queryset, view):
+        shop_id = self.get_shop_id(request)
+        if shop_id is None:
+            return queryset
+        return queryset.filter(shop_id=shop_id)
+
+
+class OrderFilter(django_filters.FilterSet):
+    """
+    Filtering of the order list by status and by creation date range,
+    e.g. ``?status=confirmed&date_from=2024-01-01&date_to=2024-01-31``.
+    """
+    status = django_filters.MultipleChoiceFilter(choices=STATUS_CHOICES)
+    date_from = django_filters.DateFilter(field_name='dt', lookup_expr='date__gte')
+    date_to = django_filters.DateFilter(field_name='dt', lookup_expr='date__lte')
+
+    class Meta:
+        model = Order
+        fields = ['status', 'date_from', 'date_to']
@@ -0,0 +1,321 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import connection, transaction
+
+from .cache import bump_catalog_version
+from .facets import refresh_facets
+from .feeds import parameter_value
+from .models import Category, Product, ProductInfo, Parameter, ProductParameter
+from .snapshots import build_snapshot_on_commit
+
+
+PRUNE_CHUNK_SIZE = 10000
+
+
+def _new_counts(*extra):
+    return {'inserted': 0, 'updated': 0, 'unchanged': 0, **{key: 0 for key in extra}}
+
+
+def fingerprint(good):
+    """
+    Digest of everything a good contributes to its ``ProductInfo`` row and parameters.
+    """
+    parameters = sorted((str(name), str(value)) for name, value in (good.get('parameters') or {}).items())
+    payload = [good['name'], int(good['category']), good.get('model') or '', int(good['quantity']),
+               int(good['price']), int(good['price_rrc']), parameters]
+    return hashlib.md5(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+
+def search_document(good, shop_name, category_name):
+    """
+    Lowercased text the catalog search runs on, so that no joins are needed at query time.
+    """
+    return ' '.join([good['name'], good.get('model') or '', shop_name, category_name]).lower()
+
+
+class CatalogImporter:
+    """
+    Set-based importer of a shop price list.
+
+    Goods are processed in batches of ``batch_size``: every batch resolves its
+    categories, products, parameters and product infos with a constant number
+    of queries (one lookup and one bulk write per table), so the cost of an
+    upload grows with the number of batches instead of the number of goods.
+    All the rows are written as upserts on the unique constraints of their
+    tables, so imports of different shops running at the same time may create
+    the same categories, products or parameters without conflicts.
+
+    Every ``ProductInfo`` keeps a fingerprint of the good it was imported from,
+    so goods which did not change since the previous upload cost a single lookup
+    per batch and no writes. With ``prune`` the feed is treated as the whole
+    catalog of the shop and goods missing from it are deleted at the end.
+
+    Every ``ProductInfo`` also gets its parameters as a JSON document for
+    filtering, and the precomputed facet counts of the parameters touched by
+    the upload are recounted at the end of it. Once the import commits, the
+    catalog version is bumped, which invalidates the cached product listings,
+    and the snapshot file of the shop is rebuilt.
+
+    ``progress`` is called with the number of goods processed so far after every batch.
+    """
+
+    batch_size = 1000
+
+    def __init__(self, shop, batch_size=None, progress=None, prune=True):
+        self.shop = shop
+        if batch_size:
+            self.batch_size = batch_size
+        self.progress = progress
+        self.prune = prune
+        self.processed = 0
+        self.seen = set()
+        self.categories = {}
+        self.category_names = {}
+        self.products = {}
+        self.parameters = {}
+        self.touched_parameters = set()
+        self.summary = {
+            'categories': _new_counts(),
+            'products': _new_counts(),
+            'product_infos': _new_counts('deleted'),
+            'parameters': _new_counts('deleted'),
+        }
+
+    def run(self, categories, goods):
+        """
+        Import a whole price list inside one transaction.
+
+        Parameters:
+            categories (list): The ``categories`` section of the feed.
+            goods (iterable): The goods of the feed, consumed one batch at a time.
+
+        Returns:
+            dict: Counts of inserted/updated/unchanged rows per table.
+        """
+        with transaction.atomic():
+            self.import_categories(categories)
+            self.import_goods(goods)
+            if self.prune:
+                self.delete_missing()
+            refresh_facets(self.touched_parameters)
+            bump_catalog_version([self.shop.id])
+            build_snapshot_on_commit(self.shop.id)
+        return self.summary
+
+    def import_categories(self, categories):
+        counts = self.summary['categories']
+        names = {int(category['id']): category['name'] for category in categories}
+        existing = self._load_categories(names)
+
+        to_create, to_update = [], []
+        for external_id, name in names.items():
+            category = existing.get(external_id)
+            if category is None:
+                to_create.append(Category(external_id=external_id, name=name))
+            elif category.name != name:
+                category.name = name
+                to_update.append(category)
+            else:
+                counts['unchanged'] += 1
+
+        if to_create:
+            Category.objects.bulk_create(to_create, update_conflicts=True, unique_fields=['external_id'],
+                                         update_fields=['name'])
+            for category in to_create:
+                existing[category.external_id] = category
+        if to_update:
+            Category.objects.bulk_update(to_update, ['name'])
+        counts['inserted'] += len(to_create)
+        counts['updated'] += len(to_update)
+
+        through = Category.shops.through
+        through.objects.bulk_create(
+            [through(category_id=category.id, shop_id=self.shop.id) for category in existing.values()],
+            ignore_conflicts=True,
+        )
+        self.categories.update({external_id: category.id for external_id, category in existing.items()})
+        self.category_names.update({external_id: category.name for external_id, category in existing.items()})
+
+    def import_goods(self, goods):
+        batch = []
+        for good in goods:
+            batch.append(good)
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+
+    def import_batch(self, goods):
+        """
+        Import one batch of goods.
+
+        Raises:
+            KeyError: If a good misses a required field or refers to an unknown category.
+        """
+        goods = {int(good['id']): good for good in goods}
+        fingerprints = {external_id: fingerprint(good) for external_id, good in goods.items()}
+        existing = {
+            external_id: (pk, current) for pk, external_id, current in ProductInfo.objects.filter(
+                shop=self.shop, external_id__in=list(goods),
+            ).values_list('id', 'external_id', 'fingerprint')
+        }
+        self.seen.update(goods)
+
+        changed = [good for external_id, good in goods.items()
+                   if existing.get(external_id, (None, None))[1] != fingerprints[external_id]]
+        self.summary['product_infos']['unchanged'] += len(goods) - len(changed)
+        if changed:
+            self._resolve_categories(changed)
+            product_ids = self._resolve_products(changed)
+            product_infos = self._write_product_infos(changed, product_ids, existing, fingerprints)
+            self._write_parameters(changed, product_infos)
+        self.processed += len(goods)
+        if self.progress is not None:
+            self.progress(self.processed)
+
+    def _load_categories(self, external_ids):
+        return {category.external_id: category
+                for category in Category.objects.filter(external_id__in=list(external_ids))}
+
+    def _resolve_categories(self, goods):
+        missing = {int(good['category']) for good in goods} - self.categories.keys()
+        if missing:
+            found = self._load_categories(missing)
+            self.categories.update({external_id: category.id for external_id, category in found.items()})
+            self.category_names.update({external_id: category.name for external_id, category in found.items()})
+            unknown = missing - found.keys()
+            if unknown:
+                # flat feeds (CSV) may name their categories inline instead of in a header section
+                named = {int(good['category']): good['category_name'] for good in goods
+                         if good.get('category_name') and int(good['category']) in unknown}
+                if unknown - named.keys():
+                    raise KeyError(f'category {min(unknown - named.keys())}')
+                self.import_categories([{'id': external_id, 'name': name} for external_id, name in named.items()])
+
+    def _resolve_products(self, goods):
+        counts = self.summary['products']
+        # in the order of the feed, so new products get their ids in that order in every run
+        keys = dict.fromkeys((good['name'], self.categories[int(good['category'])]) for good in goods)
+        missing = dict.fromkeys(key for key in keys if key not in self.products)
+        if missing:
+            existing = Product.objects.filter(
+                category_id__in={category_id for _, category_id in missing},
+                name__in={name for name, _ in missing},
+            ).values_list('name', 'category_id', 'id')
+            for name, category_id, pk in existing:
+                if (name, category_id) in missing:
+                    self.products[(name, category_id)] = pk
+
+            to_create = [Product(name=name, category_id=category_id)
+                         for name, category_id in missing if (name, category_id) not in self.products]
+            if to_create:
+                Product.objects.bulk_create(to_create, update_conflicts=True, unique_fields=['name', 'category'],
+                                            update_fields=['name'])
+                self.products.update({(product.name, product.category_id): product.id for product in to_create})
+            counts['inserted'] += len(to_create)
+            counts['unchanged'] += len(missing) - len(to_create)
+        return {key: self.products[key] for key in keys}
+
+    def _write_product_infos(self, goods, product_ids, existing, fingerprints):
+        counts = self.summary['product_infos']
+        to_write = []
+        for good in goods:
+            external_id = int(good['id'])
+            counts['updated' if external_id in existing else 'inserted'] += 1
+            to_write.append(ProductInfo(
+                external_id=external_id,
+                shop=self.shop,
+                product_id=product_ids[(good['name'], self.categories[int(good['category'])])],
+                model=good.get('model') or '',
+                quantity=int(good['quantity']),
+                price=int(good['price']),
+                price_rrc=int(good['price_rrc']),
+                fingerprint=fingerprints[external_id],
+                search_document=search_document(good, self.shop.name, self.category_names[int(good['category'])]),
+                parameters={str(name): parameter_value(value)
+                            for name, value in (good.get('parameters') or {}).items()},
+            ))
+
+        ProductInfo.objects.bulk_create(
+            to_write,
+            update_conflicts=True,
+            unique_fields=['external_id', 'shop'],
+            update_fields=['product', 'model', 'quantity', 'price', 'price_rrc', 'fingerprint', 'search_document',
+                           'parameters'],
+        )
+        product_infos = {product_info.external_id: product_info.id for product_info in to_write}
+        if connection.vendor == 'postgresql':
+            ProductInfo.objects.filter(pk__in=list(product_infos.values())).update(
+                search_vector=SearchVector('search_document', config=settings.CATALOG_SEARCH_CONFIG),
+            )
+        return product_infos
+
+    def _write_parameters(self, goods, product_infos):
+        counts = self.summary['parameters']
+        values = {}
+        for good in goods:
+            product_info_id = product_infos[int(good['id'])]
+            for name, value in (good.get('parameters') or {}).items():
+                values[(product_info_id, str(name))] = str(value)
+
+        names = dict.fromkeys(name for _, name in values if name not in self.parameters)
+        if names:
+            self.parameters.update(Parameter.objects.filter(name__in=list(names)).values_list('name', 'id'))
+            to_create = [Parameter(name=name) for name in names if name not in self.parameters]
+            if to_create:
+                Parameter.objects.bulk_create(to_create, update_conflicts=True, unique_fields=['name'],
+                                              update_fields=['name'])
+                self.parameters.update({parameter.name: parameter.id for parameter in to_create})
+
+        values = {(product_info_id, self.parameters[name]): value for (product_info_id, name), value in values.items()}
+        existing = {
+            (product_info_id, parameter_id): (pk, value) for pk, product_info_id, parameter_id, value in
+            ProductParameter.objects.filter(
+                product_info_id__in=list(product_infos.values()),
+            ).values_list('id', 'product_info_id', 'parameter_id', 'value')
+        }
+
+        to_write = []
+        for (product_info_id, parameter_id), value in values.items():
+            pk, current = existing.get((product_info_id, parameter_id), (None, None))
+            if current == value:
+                counts['unchanged'] += 1
+                continue
+            counts['updated' if pk is not None else 'inserted'] += 1
+            to_write.append(ProductParameter(product_info_id=product_info_id, parameter_id=parameter_id, value=value))
+            self.touched_parameters.add(parameter_id)
+
+        if to_write:
+            ProductParameter.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=['product_info', 'parameter'],
+                update_fields=['value'],
+            )
+
+        to_delete = []
+        for (product_info_id, parameter_id), (pk, value) in existing.items():
+            if (product_info_id, parameter_id) not in values:
+                to_delete.append(pk)
+                self.touched_parameters.add(parameter_id)
+        if to_delete:
+            ProductParameter.objects.filter(pk__in=to_delete).delete()
+            counts['deleted'] += len(to_delete)
+
+    def delete_missing(self):
+        """
+        Delete the goods of the shop which were not present in the imported feed.
+        """
+        stale = [pk for pk, external_id in ProductInfo.objects.filter(shop=self.shop)
+                 .values_list('id', 'external_id').iterator(chunk_size=PRUNE_CHUNK_SIZE)
+                 if external_id not in self.seen]
+        for start in range(0, len(stale), PRUNE_CHUNK_SIZE):
+            chunk = stale[start:start + PRUNE_CHUNK_SIZE]
+            self.touched_parameters.update(ProductParameter.objects.filter(product_info_id__in=chunk)
+                                           .values_list('parameter_id', flat=True).distinct())
+            ProductInfo.objects.filter(pk__in=chunk).delete()
+        self.summary['product_infos']['deleted'] += len(stale)
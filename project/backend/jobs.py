@@ -0,0 +1,217 @@
+import asyncio
+import time
+import traceback
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction, DatabaseError
+from django.utils import timezone
+
+from .feeds import FeedError, FeedReader, adownload_feed, detect_format, download_feed, feed_client
+from .importer import CatalogImporter
+from .models import Shop, ImportJob
+
+
+PROGRESS_INTERVAL = 1.0
+
+
+def enqueue_import(user, url, format='', shop_name=''):
+    return ImportJob.objects.create(user=user, url=url, format=format or '', shop_name=shop_name or '')
+
+
+def enqueue_imports(feeds):
+    """
+    Queue many uploads with a single INSERT.
+
+    Parameters:
+        feeds (list): ``(user_id, url, format, shop_name)`` tuples.
+
+    Returns:
+        list: The queued ImportJob instances, in the order of ``feeds``.
+    """
+    return ImportJob.objects.bulk_create([
+        ImportJob(user_id=user_id, url=url, format=format or '', shop_name=shop_name or '')
+        for user_id, url, format, shop_name in feeds
+    ])
+
+
+def fail_stale_jobs():
+    """
+    Mark as failed the jobs running for longer than ``IMPORT_JOB_TIMEOUT`` seconds.
+
+    Such a job was left by a worker which crashed or was killed; it is not
+    queued again, as the same feed may crash the next worker too.
+
+    Returns:
+        int: The number of jobs marked as failed.
+    """
+    now = timezone.now()
+    return ImportJob.objects.filter(
+        status='running', started__lt=now - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+    ).update(status='failed', finished=now, error=f'Timed out after {settings.IMPORT_JOB_TIMEOUT} s')
+
+
+def claim_job():
+    """
+    Take the oldest queued job for this worker.
+
+    A job is claimed with a conditional UPDATE, so concurrent workers
+    never run the same job and no row locks are held while it runs.
+    Stale running jobs are failed first.
+
+    Returns:
+        ImportJob: The claimed job or None if the queue is empty.
+    """
+    fail_stale_jobs()
+    candidates = ImportJob.objects.filter(status='queued').order_by('dt').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        if ImportJob.objects.filter(pk=pk, status='queued').update(status='running', started=timezone.now()):
+            return ImportJob.objects.get(pk=pk)
+    return None
+
+
+class ProgressWriter:
+    """
+    Report the progress of a running job through a connection of its own.
+
+    The import runs in a single transaction, so progress written through the
+    worker's connection would only become visible once the import is over.
+    Writes are throttled and best effort: a failed write never breaks the import.
+    """
+
+    def __init__(self, job, interval=PROGRESS_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self.written = time.monotonic()
+        self.connection = None
+
+    def __call__(self, processed):
+        self.job.processed = processed
+        if time.monotonic() - self.written < self.interval:
+            return
+        self.written = time.monotonic()
+        try:
+            if self.connection is None:
+                self.connection = connections.create_connection(ImportJob.objects.db)
+            quote_name = self.connection.ops.quote_name
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {quote_name(ImportJob._meta.db_table)} SET {quote_name("processed")} = %s '
+                    f'WHERE {quote_name("id")} = %s',
+                    [processed, self.job.pk],
+                )
+        except DatabaseError:
+            pass
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def synced_shop(job):
+    """
+    The shop which was last synced from the URL of the job.
+    """
+    return Shop.objects.filter(user_id=job.user_id, url=job.url).order_by('pk')
+
+
+def run_job(job, fetch=download_feed):
+    """
+    Fetch and import the feed of a claimed job and record the outcome on it.
+
+    The shop which was last synced from the same URL provides the validators
+    of the previous download: the import is skipped when the server answers
+    304 Not Modified or the downloaded feed has the same digest.
+
+    Parameters:
+        job (ImportJob): The claimed job.
+        fetch (callable): Downloads the feed, called as ``download_feed(url, etag, last_modified)``.
+    """
+    progress = ProgressWriter(job)
+    download = None
+    try:
+        shop = synced_shop(job).first()
+        download = fetch(job.url, shop.feed_etag if shop else '', shop.feed_last_modified if shop else '')
+        if shop is not None and (download.not_modified or download.digest == shop.feed_digest):
+            job.summary = {'skipped': 'not modified' if download.not_modified else 'same digest'}
+        else:
+            feed = FeedReader(download.file, job.format or detect_format(job.url, download.content_type),
+                              job.shop_name or None)
+            with transaction.atomic():
+                shop, created = Shop.objects.get_or_create(name=feed.shop, user_id=job.user_id)
+                job.summary = CatalogImporter(shop, progress=progress).run(feed.categories, feed.goods())
+                shop.url = job.url
+                shop.feed_digest = download.digest
+                shop.feed_etag = download.etag
+                shop.feed_last_modified = download.last_modified
+                shop.save(update_fields=['url', 'feed_digest', 'feed_etag', 'feed_last_modified'])
+        job.shop = shop
+        job.status = 'done'
+    except KeyError as er:
+        job.status, job.error = 'failed', f'KeyError: {er}'
+    except (FeedError, ValueError) as er:
+        job.status, job.error = 'failed', str(er)
+    except Exception:
+        job.status, job.error = 'failed', traceback.format_exc()
+    finally:
+        progress.close()
+        if download is not None:
+            download.close()
+    job.finished = timezone.now()
+    job.save(update_fields=['shop', 'status', 'processed', 'summary', 'error', 'finished'])
+    return job
+
+
+async def arun_job(job, client=None):
+    """
+    ``run_job`` with the download awaited on the event loop.
+
+    The feed is fetched concurrently with the downloads of other jobs, then
+    imported in the thread of the worker's database connection, one import
+    at a time.
+    """
+    try:
+        shop = await synced_shop(job).afirst()
+        download = await adownload_feed(job.url, shop.feed_etag if shop else '',
+                                        shop.feed_last_modified if shop else '', client)
+    except Exception as er:
+        download = er
+
+    def fetched(*args):
+        if isinstance(download, Exception):
+            raise download
+        return download
+
+    return await sync_to_async(run_job)(job, fetched)
+
+
+async def run_jobs_concurrently(concurrency, poll_interval, burst, stopping, done=None):
+    """
+    Claim jobs and run up to ``concurrency`` of them at once until ``stopping`` is set.
+
+    Parameters:
+        concurrency (int): The number of jobs downloading at the same time.
+        poll_interval (float): Seconds to wait before polling an empty queue again.
+        burst (bool): Return once the queue is empty and the running jobs are over.
+        stopping (list): Stop claiming new jobs once it is not empty.
+        done (callable): Called with every finished job.
+    """
+    running = set()
+    async with feed_client() as client:
+        while True:
+            while not stopping and len(running) < concurrency:
+                job = await sync_to_async(claim_job)()
+                if job is None:
+                    break
+                running.add(asyncio.create_task(arun_job(job, client)))
+            if not running:
+                if burst or stopping:
+                    return
+                await asyncio.sleep(poll_interval)
+                continue
+            finished, running = await asyncio.wait(running, timeout=poll_interval,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                if done is not None:
+                    done(task.result())
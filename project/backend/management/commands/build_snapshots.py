@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.models import Shop
+from backend.snapshots import build_snapshot, snapshot_path, snapshot_version
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the catalog snapshots of the shops whose goods changed since their snapshot was written, '
+            'e.g. by confirmed orders. Imports rebuild the snapshot of their shop themselves.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('shops', nargs='*', type=int, help='Ids of the shops, all shops when omitted.')
+        parser.add_argument('--all', action='store_true', help='Rebuild the snapshots which are up to date too.')
+
+    def handle(self, *args, **options):
+        if not settings.CATALOG_SNAPSHOT_DIR:
+            raise CommandError('CATALOG_SNAPSHOT_DIR is not set.')
+        shops = Shop.objects.order_by('pk')
+        if options['shops']:
+            shops = shops.filter(pk__in=options['shops'])
+
+        built = 0
+        for shop_id, version in shops.values_list('pk', 'catalog_version'):
+            if options['all'] or snapshot_version(snapshot_path(shop_id)) != version:
+                build_snapshot(shop_id)
+                built += 1
+        self.stdout.write(f'Built {built} snapshots.')
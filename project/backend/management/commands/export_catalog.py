@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from backend.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_catalog, gzip_stream
+
+
+class Command(BaseCommand):
+    help = 'Export the whole catalog as a JSON array or NDJSON, streamed with flat memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help='Compress the export with gzip.')
+        parser.add_argument('--output', help='File to write, standard output by default.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        content = export_catalog(options['format'], options['chunk_size'])
+        if options['gzip']:
+            content = gzip_stream(content)
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for piece in content:
+                output.write(piece)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,54 @@
+import asyncio
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from backend.jobs import claim_job, run_job, run_jobs_concurrently
+
+
+class Command(BaseCommand):
+    help = 'Run queued product imports. Several workers (or --processes) import different feeds in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes.')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait before polling an empty queue again.')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Jobs of a process downloading their feeds at the same time.')
+
+    def handle(self, *args, **options):
+        work_options = (options['poll_interval'], options['burst'], options['concurrency'])
+        if options['processes'] <= 1:
+            return self.work(*work_options)
+
+        connections.close_all()
+        workers = [multiprocessing.Process(target=self.work, args=work_options)
+                   for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def work(self, poll_interval, burst, concurrency=1):
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+        if concurrency > 1:
+            return asyncio.run(run_jobs_concurrently(concurrency, poll_interval, burst, stopping, self.report))
+
+        while not stopping:
+            job = claim_job()
+            if job is None:
+                if burst:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+            self.report(job)
+
+    def report(self, job):
+        self.stdout.write(f'Import job #{job.pk} {job.status}: {job.processed} goods {job.error}'.rstrip())
@@ -0,0 +1,41 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.jobs import enqueue_imports, fail_stale_jobs, run_jobs_concurrently
+from backend.models import Shop, ImportJob
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('Queue uploads of the given feed URLs, or a refresh of the feeds of all shops, and download them '
+            'concurrently. Unchanged feeds are recognised by conditional GETs and digests and are not imported.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='Feed URLs to upload for --user.')
+        parser.add_argument('--user', help='Email of the shop user the given URLs belong to.')
+        parser.add_argument('--format', default='', help='Format of the given feeds, detected when omitted.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Feeds downloaded at the same time.')
+        parser.add_argument('--enqueue-only', action='store_true',
+                            help='Only queue the jobs and leave them to import_worker.')
+
+    def handle(self, *args, **options):
+        if options['urls']:
+            user = CustomUser.objects.filter(email=options['user'] or '', type='shop').first()
+            if user is None:
+                raise CommandError('--user must be the email of a shop user.')
+            feeds = [(user.id, url, options['format'], '') for url in options['urls']]
+        else:
+            feeds = [(user_id, url, '', '') for user_id, url in
+                     Shop.objects.exclude(url=None).exclude(url='').values_list('user_id', 'url').distinct()]
+
+        fail_stale_jobs()
+        pending = set(ImportJob.objects.filter(status__in=('queued', 'running')).values_list('user_id', 'url'))
+        jobs = enqueue_imports([feed for feed in feeds if feed[:2] not in pending])
+        self.stdout.write(f'Queued {len(jobs)} feeds, {len(feeds) - len(jobs)} already queued.')
+
+        if not options['enqueue_only']:
+            asyncio.run(run_jobs_concurrently(options['concurrency'], 0.1, True, [], self.report))
+
+    def report(self, job):
+        self.stdout.write(f'Import job #{job.pk} {job.status}: {job.processed} goods {job.error}'.rstrip())
@@ -0,0 +1,38 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS product_info_search_vector_idx '
+        'ON backend_productinfo USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS product_info_search_trgm_idx '
+        'ON backend_productinfo USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS product_info_search_vector_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS product_info_search_trgm_idx')
+
+
+class Migration(migrations.Migration):
+    """
+    PostgreSQL-only indexes of the catalog search. They are kept out of
+    ``ProductInfo.Meta.indexes`` so that the schema still builds on SQLite.
+    """
+
+    dependencies = [
+        ('backend', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
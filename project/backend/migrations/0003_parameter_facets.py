@@ -0,0 +1,90 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:56
+
+import math
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# a frozen copy of backend.feeds.parameter_value, which it must keep matching for the stored values
+def typed_value(value):
+    for convert in (int, float):
+        try:
+            value = convert(value)
+        except ValueError:
+            continue
+        return value if math.isfinite(value) else str(value)
+    return value
+
+
+def fill_parameters(apps, schema_editor):
+    ProductInfo = apps.get_model('backend', 'ProductInfo')
+    ProductParameter = apps.get_model('backend', 'ProductParameter')
+    ParameterFacet = apps.get_model('backend', 'ParameterFacet')
+
+    pks = list(ProductInfo.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), 1000):
+        product_infos = {pk: ProductInfo(pk=pk, parameters={}) for pk in pks[start:start + 1000]}
+        for product_info_id, name, value in ProductParameter.objects.filter(
+                product_info_id__in=list(product_infos)).values_list('product_info_id', 'parameter__name', 'value'):
+            product_infos[product_info_id].parameters[name] = typed_value(value)
+        ProductInfo.objects.bulk_update(product_infos.values(), ['parameters'])
+
+    ParameterFacet.objects.bulk_create(
+        [ParameterFacet(parameter_id=parameter_id, value=value, count=count) for parameter_id, value, count in
+         ProductParameter.objects.values_list('parameter_id', 'value').annotate(count=Count('id')).order_by()],
+        batch_size=1000,
+    )
+
+
+def create_parameters_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS product_info_parameters_idx '
+        'ON backend_productinfo USING gin (parameters jsonb_path_ops)'
+    )
+
+
+def drop_parameters_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS product_info_parameters_idx')
+
+
+class Migration(migrations.Migration):
+    """
+    Parameter document of every ``ProductInfo`` and precomputed facet counts,
+    both filled from the existing ``ProductParameter`` rows. The GIN index on
+    the document is PostgreSQL-only, like the search indexes.
+    """
+
+    dependencies = [
+        ('backend', '0002_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinfo',
+            name='parameters',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Параметры'),
+        ),
+        migrations.CreateModel(
+            name='ParameterFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=150, verbose_name='Значение')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество товаров')),
+                ('parameter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='backend.parameter', verbose_name='Параметр')),
+            ],
+            options={
+                'verbose_name': 'Значение фильтра',
+                'verbose_name_plural': 'Список значений фильтров',
+                'ordering': ('-count',),
+                'constraints': [models.UniqueConstraint(fields=('parameter', 'value'), name='unique_parameter_facet')],
+            },
+        ),
+        migrations.RunPython(fill_parameters, migrations.RunPython.noop),
+        migrations.RunPython(create_parameters_index, drop_parameters_index),
+    ]
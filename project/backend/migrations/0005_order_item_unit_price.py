@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+def fill_unit_price(apps, schema_editor):
+    OrderItem = apps.get_model('backend', 'OrderItem')
+    ProductInfo = apps.get_model('backend', 'ProductInfo')
+
+    items = list(OrderItem.objects.all())
+    prices = {}
+    for product_id, shop_id, price in ProductInfo.objects.filter(
+            product_id__in={item.product_id for item in items}).order_by('-pk').values_list(
+            'product_id', 'shop_id', 'price_rrc'):
+        prices[(product_id, shop_id)] = price
+    for item in items:
+        # the total of an existing line already is its price snapshot
+        if item.quantity:
+            item.unit_price = item.total_price / item.quantity
+        else:
+            item.unit_price = prices.get((item.product_id, item.shop_id), 0)
+    OrderItem.objects.bulk_update(items, ['unit_price'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0004_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Цена за единицу'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_unit_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def duplicates(model, *fields):
+    """
+    Groups of rows sharing the given fields: the row with the lowest pk and the pks of the others.
+    """
+    for values in model.objects.values(*fields).annotate(rows=Count('id')).filter(rows__gt=1).order_by():
+        keep, *others = model.objects.filter(**{field: values[field] for field in fields}).order_by('pk')
+        yield keep, [other.pk for other in others]
+
+
+def merge_duplicates(apps, schema_editor):
+    Category = apps.get_model('backend', 'Category')
+    Product = apps.get_model('backend', 'Product')
+    Parameter = apps.get_model('backend', 'Parameter')
+    ProductInfo = apps.get_model('backend', 'ProductInfo')
+    ProductParameter = apps.get_model('backend', 'ProductParameter')
+    ParameterFacet = apps.get_model('backend', 'ParameterFacet')
+    OrderItem = apps.get_model('backend', 'OrderItem')
+    CategoryShops = Category.shops.through
+
+    for keep, others in list(duplicates(Category, 'external_id')):
+        shop_ids = set(CategoryShops.objects.filter(category_id__in=others).values_list('shop_id', flat=True))
+        CategoryShops.objects.bulk_create([CategoryShops(category_id=keep.pk, shop_id=shop_id) for shop_id in shop_ids],
+                                          ignore_conflicts=True)
+        Product.objects.filter(category_id__in=others).update(category_id=keep.pk)
+        Category.objects.filter(pk__in=others).delete()
+
+    # after the categories, as merging them may leave products with the same name in one category
+    for keep, others in list(duplicates(Product, 'name', 'category')):
+        ProductInfo.objects.filter(product_id__in=others).update(product_id=keep.pk)
+        OrderItem.objects.filter(product_id__in=others).update(product_id=keep.pk)
+        Product.objects.filter(pk__in=others).delete()
+
+    for keep, others in list(duplicates(Parameter, 'name')):
+        for other in others:
+            # a good can only have one value of the merged parameter
+            ProductParameter.objects.filter(parameter_id=other, product_info_id__in=ProductParameter.objects.filter(
+                parameter_id=keep.pk).values('product_info_id')).delete()
+            ProductParameter.objects.filter(parameter_id=other).update(parameter_id=keep.pk)
+        ParameterFacet.objects.filter(parameter_id__in=[keep.pk, *others]).delete()
+        ParameterFacet.objects.bulk_create([
+            ParameterFacet(parameter_id=keep.pk, value=value, count=count) for value, count in
+            ProductParameter.objects.filter(parameter_id=keep.pk).values_list('value').annotate(count=Count('id'))
+            .order_by()
+        ])
+        Parameter.objects.filter(pk__in=others).delete()
+
+
+class Migration(migrations.Migration):
+    """
+    Merge rows which would violate the unique constraints added by the next
+    migration. It is a migration of its own, as PostgreSQL cannot alter
+    tables with pending deferred foreign key checks in the same transaction.
+    """
+
+    dependencies = [
+        ('backend', '0005_order_item_unit_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='catalog_version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Версия каталога магазина'),
+        ),
+    ]
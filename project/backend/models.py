@@ -1,4 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
 from users.models import Contact
@@ -13,6 +17,13 @@ STATUS_CHOICES = (
     ('canceled', 'Отменен'),
 )
 
+JOB_STATUS_CHOICES = (
+    ('queued', 'В очереди'),
+    ('running', 'Выполняется'),
+    ('done', 'Выполнено'),
+    ('failed', 'Ошибка'),
+)
+
 
 class Shop(models.Model):
     name = models.CharField(max_length=80, verbose_name='Название')
@@ -21,6 +32,11 @@ class Shop(models.Model):
                              verbose_name='Пользователь',
                              blank=True, null=True)
     url = models.URLField(max_length=255, null=True, blank=True, verbose_name='Ссылка')
+    feed_digest = models.CharField(max_length=64, blank=True, verbose_name='Контрольная сумма прайса')
+    feed_etag = models.CharField(max_length=255, blank=True, verbose_name='ETag прайса')
+    feed_last_modified = models.CharField(max_length=64, blank=True, verbose_name='Дата изменения прайса')
+    # bumped with the catalog version whenever the goods of the shop change; marks its snapshot file stale
+    catalog_version = models.PositiveBigIntegerField(default=0, verbose_name='Версия каталога магазина')
 
     class Meta:
         verbose_name = 'Магазин'
@@ -40,6 +56,9 @@ class Category(models.Model):
         verbose_name = 'Категория'
         verbose_name_plural = 'Список категорий'
         ordering = ('-name',)
+        constraints = [
+            models.UniqueConstraint(fields=['external_id'], name='unique_category_external_id'),
+        ]
 
     def __str__(self):
         return self.name
@@ -53,6 +72,10 @@ class Product(models.Model):
         verbose_name = 'Продукт'
         verbose_name_plural = 'Список продуктов'
         ordering = ('-name',)
+        # also serves the default ordering by name
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'category'], name='unique_product'),
+        ]
 
     def __str__(self):
         return self.name
@@ -73,6 +96,12 @@ class ProductInfo(models.Model):
     quantity = models.PositiveIntegerField(verbose_name='Количество')
     price = models.PositiveIntegerField(verbose_name='Цена')
     price_rrc = models.PositiveIntegerField(verbose_name='Розничная цена')
+    fingerprint = models.CharField(max_length=32, blank=True, verbose_name='Отпечаток строки прайса')
+    # maintained by the importer; GIN indexes on PostgreSQL are created in migrations
+    search_document = models.TextField(blank=True, verbose_name='Текст для поиска')
+    search_vector = SearchVectorField(null=True, blank=True, verbose_name='Поисковый вектор')
+    # parameters of the good as in the feed, for filtering without the ProductParameter join
+    parameters = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
 
     class Meta:
         verbose_name = 'Информация о продукте'
@@ -81,6 +110,12 @@ class ProductInfo(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['external_id', 'shop'], name='unique_product_info'),
         ]
+        # keyset pagination of the catalog: every ordering is completed with the primary key
+        indexes = [
+            models.Index(fields=['model', 'id'], name='product_info_model_idx'),
+            models.Index(fields=['price_rrc', 'id'], name='product_info_price_rrc_idx'),
+            models.Index(fields=['quantity', 'id'], name='product_info_quantity_idx'),
+        ]
 
 
     def __str__(self):
@@ -93,6 +128,9 @@ class Parameter(models.Model):
         verbose_name = 'Имя параметра'
         verbose_name_plural = 'Список имён параметров'
         ordering = ('-name',)
+        constraints = [
+            models.UniqueConstraint(fields=['name'], name='unique_parameter_name'),
+        ]
 
     def __str__(self):
         return self.name
@@ -121,6 +159,52 @@ class ProductParameter(models.Model):
     def __str__(self):
         return f'{self.product_info.model} - {self.parameter.name} : {self.value}'
 
+class ParameterFacet(models.Model):
+    parameter = models.ForeignKey(Parameter,
+                                  on_delete=models.CASCADE,
+                                  verbose_name='Параметр',
+                                  related_name='facets')
+    value = models.CharField(max_length=150, verbose_name='Значение')
+    count = models.PositiveIntegerField(default=0, verbose_name='Количество товаров')
+
+    class Meta:
+        verbose_name = 'Значение фильтра'
+        verbose_name_plural = 'Список значений фильтров'
+        ordering = ('-count',)
+        constraints = [
+            models.UniqueConstraint(fields=['parameter', 'value'], name='unique_parameter_facet'),
+        ]
+
+    def __str__(self):
+        return f'{self.parameter.name} - {self.value} : {self.count}'
+
+
+class CatalogVersion(models.Model):
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия')
+
+    class Meta:
+        verbose_name = 'Версия каталога'
+        verbose_name_plural = 'Версия каталога'
+
+    def __str__(self):
+        return str(self.version)
+
+
+class OrderQuerySet(models.QuerySet):
+
+    def with_totals(self):
+        """
+        Annotate every order with ``total_sum`` and ``items_count`` of its lines,
+        so that listings do not aggregate the lines of each order separately.
+        An order without lines has 0 of both rather than NULL, which cursors cannot compare with.
+        """
+        return self.annotate(
+            total_sum=Coalesce(models.Sum('orderitem__total_price'), Value(0),
+                               output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            items_count=Coalesce(models.Count('orderitem'), Value(0)),
+        )
+
+
 class Order(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE,
@@ -130,31 +214,120 @@ class Order(models.Model):
     status = models.CharField(max_length=12, default='new', verbose_name='Статус', choices=STATUS_CHOICES)
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE, verbose_name='Контактная информация', blank=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Список заказов'
         ordering = ('-dt',)
+        indexes = [
+            # order list of a user, newest first, optionally filtered by status
+            models.Index(fields=['user', '-dt', '-id'], name='order_user_dt_idx'),
+            models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+            # the basket of a user: only a small share of the orders is ever in the 'new' status
+            models.Index(fields=['user', 'contact'], condition=models.Q(status='new'), name='order_basket_idx'),
+        ]
 
     def __str__(self):
         return f'status: {self.status} -> {self.user}'
 
 
+class OrderItemQuerySet(models.QuerySet):
+    """
+    Bulk writes of order lines bypass ``OrderItem.save``, so they keep
+    ``total_price`` in step with ``quantity`` and ``unit_price`` themselves.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.total_price = obj.quantity * obj.unit_price
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if {'quantity', 'unit_price'} & set(fields):
+            for obj in objs:
+                obj.total_price = obj.quantity * obj.unit_price
+            if 'total_price' not in fields:
+                fields.append('total_price')
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if {'quantity', 'unit_price'} & kwargs.keys() and 'total_price' not in kwargs:
+            # the right-hand side of SET sees the old values, so the new ones are used directly
+            quantity, unit_price = kwargs.get('quantity', F('quantity')), kwargs.get('unit_price', F('unit_price'))
+            kwargs['total_price'] = ExpressionWrapper(
+                (quantity if hasattr(quantity, 'resolve_expression') else Value(quantity)) *
+                (unit_price if hasattr(unit_price, 'resolve_expression') else Value(unit_price)),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        return super().update(**kwargs)
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, verbose_name='Заказ', blank=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Продукт', blank=True)
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name='Магазин', blank=True)
     quantity = models.PositiveIntegerField(verbose_name='Количество')
+    # price of the shop's offer when the line was added, later catalog uploads do not change it
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Цена за единицу')
     total_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Общая стоимость')
 
+    objects = OrderItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Заказанная позиция'
         verbose_name_plural = 'Список заказанных позиций'
         ordering = ('-pk',)
+        indexes = [
+            models.Index(fields=['order', 'product'], name='order_item_order_product_idx'),
+        ]
 
 
     def __str__(self):
         return f'{self.order} | {self.product} * {self.quantity} pieces'
 
     def save(self, *args, **kwargs):
-        self.total_price = self.quantity * self.product.product_info.first().price_rrc
-        super().save(*args, **kwargs)
\ No newline at end of file
+        if self.unit_price is None:
+            self.unit_price = ProductInfo.objects.filter(
+                product_id=self.product_id, shop_id=self.shop_id,
+            ).order_by('pk').values_list('price_rrc', flat=True).first()
+            if self.unit_price is None:
+                raise ValidationError(f'Product {self.product_id} is not sold by shop {self.shop_id}')
+        self.total_price = self.quantity * self.unit_price
+        super().save(*args, **kwargs)
+
+
+class ImportJob(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE,
+                             verbose_name='Пользователь',
+                             related_name='import_jobs')
+    shop = models.ForeignKey(Shop,
+                             on_delete=models.SET_NULL,
+                             verbose_name='Магазин',
+                             related_name='import_jobs',
+                             blank=True, null=True)
+    url = models.URLField(max_length=255, verbose_name='Ссылка')
+    format = models.CharField(max_length=5, verbose_name='Формат', blank=True)
+    shop_name = models.CharField(max_length=80, verbose_name='Название магазина', blank=True)
+    status = models.CharField(max_length=8, default='queued', verbose_name='Статус', choices=JOB_STATUS_CHOICES)
+    processed = models.PositiveIntegerField(default=0, verbose_name='Обработано товаров')
+    summary = models.JSONField(default=dict, blank=True, verbose_name='Итоги')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    dt = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    started = models.DateTimeField(blank=True, null=True, verbose_name='Начало')
+    finished = models.DateTimeField(blank=True, null=True, verbose_name='Окончание')
+
+    class Meta:
+        verbose_name = 'Загрузка товаров'
+        verbose_name_plural = 'Список загрузок товаров'
+        ordering = ('-dt',)
+        indexes = [
+            models.Index(fields=['status', 'dt'], name='import_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.url} : {self.status}'
@@ -0,0 +1,98 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+
+from .cache import bump_catalog_version
+from .models import Order, ProductInfo
+from .snapshots import schedule_snapshots
+
+
+CLOSED_STATUSES = ['confirmed', 'assembled', 'sent', 'delivered', 'canceled']
+
+
+class OutOfStock(Exception):
+    """
+    Raised when the stock of a shop does not cover an order line.
+    """
+
+
+def product_infos_for(keys):
+    """
+    Find the offers the given ``(product_id, shop_id)`` pairs are ordered from.
+
+    A product may be offered by a shop more than once; the offer with the
+    lowest primary key is used, the same one for the basket and the confirmation.
+
+    Returns:
+        dict: ``ProductInfo`` instances (with their product) keyed by ``(product_id, shop_id)``.
+    """
+    if not keys:
+        return {}
+    product_infos = ProductInfo.objects.filter(
+        product_id__in={product_id for product_id, _ in keys},
+        shop_id__in={shop_id for _, shop_id in keys},
+    ).select_related('product').order_by('-pk')
+    return {(product_info.product_id, product_info.shop_id): product_info for product_info in product_infos}
+
+
+def reserve_stock(quantities):
+    """
+    Take the ordered quantities off the stock with a single conditional UPDATE.
+
+    A row is only decremented when its quantity covers the ordered amount, so
+    concurrent reservations can never take the stock below zero. The caller
+    must roll back its transaction when not every row could be reserved.
+
+    Parameters:
+        quantities (dict): Ordered quantities keyed by ``ProductInfo`` primary key.
+
+    Returns:
+        bool: Whether all the rows were reserved.
+    """
+    condition = reduce(or_, (Q(pk=pk, quantity__gte=quantity) for pk, quantity in quantities.items()))
+    reserved = ProductInfo.objects.filter(condition).update(quantity=Case(
+        *(When(pk=pk, then=F('quantity') - quantity) for pk, quantity in quantities.items()),
+        default=F('quantity'),
+        output_field=PositiveIntegerField(),
+    ))
+    return reserved == len(quantities)
+
+
+def confirm_order(order):
+    """
+    Confirm an order and reserve the stock of all its lines in one transaction.
+
+    The status is switched with a conditional UPDATE as well, so an order
+    confirmed twice at the same time only takes its goods off the stock once.
+
+    Returns:
+        list: The confirmed order items, or None if the order was already closed.
+
+    Raises:
+        OutOfStock: If any line is not covered by the stock; nothing is changed then.
+    """
+    items = list(order.orderitem_set.select_related('product'))
+    product_infos = product_infos_for({(item.product_id, item.shop_id) for item in items})
+    quantities = {}
+    for item in items:
+        product_info = product_infos.get((item.product_id, item.shop_id))
+        if product_info is None:
+            raise OutOfStock(f'{item.product.name} is no longer sold by the shop')
+        quantities[product_info.pk] = quantities.get(product_info.pk, 0) + item.quantity
+
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk).exclude(status__in=CLOSED_STATUSES).update(status='confirmed'):
+            return None
+        if quantities and not reserve_stock(quantities):
+            stock = dict(ProductInfo.objects.filter(pk__in=list(quantities)).values_list('pk', 'quantity'))
+            pk = next(pk for pk, quantity in quantities.items() if stock.get(pk, 0) < quantity)
+            product_info = next(product_info for product_info in product_infos.values() if product_info.pk == pk)
+            raise OutOfStock(f'Not enough products in stock. '
+                             f'There are {product_info.product.name}: available {stock.get(pk, 0)} pieces')
+        shop_ids = {shop_id for _, shop_id in product_infos}
+        bump_catalog_version(shop_ids)
+        schedule_snapshots(shop_ids)
+    order.status = 'confirmed'
+    return items
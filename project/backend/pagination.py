@@ -0,0 +1,164 @@
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder of the cursor values which keeps the microseconds of times:
+    DjangoJSONEncoder cuts them to milliseconds, and a cursor has to compare
+    equal to the stored value.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over all the ordering fields of the queryset.
+
+    The ordering requested through ``OrderingFilter`` (or the default ordering)
+    is completed with the primary key, and the cursor stores the values of the
+    last row of the page. The next page is selected with a row comparison on
+    those values instead of an OFFSET, so a deep page costs the same as the
+    first one when an index matches the ordering.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        values, reverse = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self.position_filter(values, reverse))
+        ordering = [self.invert(field) for field in self.ordering] if reverse else self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        self.has_next = has_more if not reverse else True
+        self.has_previous = values is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def paginate_sorted(self, rows, request, ordering, position):
+        """
+        Paginate a sequence of rows already sorted by ``ordering`` the way ``paginate_queryset`` pages a queryset.
+
+        The row a cursor points at is found with ``position(pk)``. If it is no
+        longer there, or its values differ from the cursor, the sequence cannot
+        continue the listing and None is returned.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = ordering
+
+        values, reverse = self.decode_cursor(request)
+        if values is None:
+            start, stop = 0, self.page_size
+        else:
+            cursor = position(values[-1])
+            if cursor is None or [self.row_value(rows[cursor], field.lstrip('-')) for field in ordering] != values:
+                return None
+            if reverse:
+                start, stop = max(cursor - self.page_size, 0), cursor
+            else:
+                start, stop = cursor + 1, cursor + 1 + self.page_size
+
+        self.has_next = stop < len(rows) if not reverse else True
+        self.has_previous = values is not None if not reverse else start > 0
+        self.page = rows[start:stop]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.API_PAGE_SIZE
+        return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    def get_ordering(self, queryset):
+        ordering = [str(field) for field in queryset.query.order_by or queryset.model._meta.ordering]
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+        return ordering
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def position_filter(self, values, reverse):
+        """
+        Build ``(a, b, pk) > (x, y, z)`` for mixed directions:
+        ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND pk > z)``.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            after = field.startswith('-') == reverse
+            condition |= Q(**equal, **{f'{name}__{"gt" if after else "lt"}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, row, reverse):
+        values = [self.row_value(row, field.lstrip('-')) for field in self.ordering]
+        cursor = json.dumps({'v': values, 'r': int(reverse)}, cls=CursorEncoder, separators=(',', ':'))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, urlsafe_b64encode(cursor.encode()).decode())
+
+    @staticmethod
+    def row_value(row, field):
+        if isinstance(row, dict):
+            return row[field]
+        for name in field.split('__'):
+            row = getattr(row, name)
+        return row
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
@@ -1,8 +1,8 @@
-from django.db.models import Sum
+from django.utils import timezone
 from rest_framework import serializers
 
 
-from .models import Order, OrderItem, Shop, Product, ProductInfo, Contact
+from .models import Order, OrderItem, Shop, Product, ProductInfo, Contact, ImportJob
 
 
 class ShopSerializer(serializers.ModelSerializer):
@@ -22,20 +22,21 @@ class ListItemsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = OrderItem
-        fields = ['order','product', 'quantity', 'shop']
+        fields = ['order','product', 'quantity', 'shop', 'unit_price', 'total_price']
 
 
 class GetOrderSerializer(serializers.ModelSerializer):
     total_sum = serializers.SerializerMethodField()
+    items_count = serializers.IntegerField(read_only=True)
     dt = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
     orderitem_set = ListItemsSerializer(many=True, read_only=True)
     class Meta:
         model = Order
-        fields = ['id', 'status', 'dt', 'contact', 'orderitem_set', 'total_sum']
+        fields = ['id', 'status', 'dt', 'contact', 'orderitem_set', 'total_sum', 'items_count']
 
     def get_total_sum(self, order):
-        total_sum = order.orderitem_set.aggregate(total_sum=Sum('total_price'))['total_sum'] or 0
-        return total_sum
+        # annotated by Order.objects.with_totals()
+        return order.total_sum or 0
 
 
 class ProductInfoSerializer(serializers.ModelSerializer):
@@ -55,6 +56,8 @@ class AddProductSerializer(serializers.ModelSerializer):
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product = AddProductSerializer(read_only=False)
+    # validated together with the product in one query by the view, not row by row
+    shop = serializers.IntegerField(source='shop_id')
     class Meta:
         model = OrderItem
         fields = ['order','product', 'quantity', 'shop']
@@ -75,16 +78,35 @@ class OrderSerializer(serializers.ModelSerializer):
 class ListOrderSerializer(serializers.ModelSerializer):
     dt = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
     total_sum = serializers.SerializerMethodField()
+    items_count = serializers.IntegerField(read_only=True)
     class Meta:
         model = Order
-        fields = ['id', 'status', 'dt', 'total_sum']
+        fields = ['id', 'status', 'dt', 'total_sum', 'items_count']
 
     def get_total_sum(self, order):
-        total_sum = order.orderitem_set.aggregate(total_sum=Sum('total_price'))['total_sum'] or 0
-        return total_sum
+        # annotated by Order.objects.with_totals()
+        return order.total_sum or 0
 
 class ConfirmOrderSerializer(serializers.ModelSerializer):
     status = serializers.ChoiceField(choices=(('confirm', 'Подтвердить'),))
     class Meta:
         model = Order
-        fields = ['id', 'status']
\ No newline at end of file
+        fields = ['id', 'status']
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    dt = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
+    started = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
+    finished = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
+    goods_per_second = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'url', 'shop', 'status', 'processed', 'goods_per_second', 'summary', 'error',
+                  'dt', 'started', 'finished']
+
+    def get_goods_per_second(self, job):
+        if job.started is None:
+            return None
+        elapsed = ((job.finished or timezone.now()) - job.started).total_seconds()
+        return round(job.processed / elapsed, 1) if elapsed > 0 else None
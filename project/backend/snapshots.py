@@ -0,0 +1,282 @@
+"""
+Per-shop snapshot files of the catalog, read through ``mmap``.
+
+After every import, and shortly after orders and stock updates, the goods
+of the shop are written, in the default order of the product listing, into a columnar file: a fixed header, a table of
+sections and 8-byte aligned arrays, one per integer column, plus offsets
+and UTF-8 blobs for the text columns and an index of the primary keys.
+Readers map the file and slice the arrays in place, so a page of one shop
+costs no join and no sort. The file records the ``catalog_version`` of the
+shop it was built at and is only used while the shop has that version;
+files are written by the host that reads them and use its byte order.
+"""
+import bisect
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+from .models import ProductInfo, Shop
+from .pagination import KeysetPagination
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RSNP'
+FORMAT_VERSION = 1
+# magic, format version, number of sections, shop id, catalog version of the shop, number of goods
+HEADER = struct.Struct('=4sHHQQQ')
+# offset and length of a section
+SECTION = struct.Struct('=QQ')
+INT_COLUMNS = ('pk', 'product_id', 'quantity', 'price_rrc')
+TEXT_COLUMNS = ('model', 'product__name')
+SECTIONS = (*INT_COLUMNS, *(f'{name}{part}' for name in TEXT_COLUMNS for part in ('.offsets', '')),
+            'index', 'index.positions', 'shop__name', 'ordering')
+SNAPSHOT_CHUNK_SIZE = 5000
+# snapshots kept mapped by a process
+SNAPSHOTS_KEPT = 256
+
+_snapshots = {}
+# shops with a rebuild waiting in a background thread of this process
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def snapshot_path(shop_id, directory=None):
+    return Path(directory or settings.CATALOG_SNAPSHOT_DIR) / f'shop-{shop_id}.snapshot'
+
+
+def build_snapshot(shop_id, directory=None):
+    """
+    Write the snapshot of the goods of a shop at its current catalog version.
+
+    The version is read before the goods, so a snapshot is never older than
+    the version it is labelled with. The file is replaced atomically; readers
+    of the previous one keep their mapping.
+
+    Returns:
+        Path: The snapshot file, or None if the shop does not exist.
+    """
+    path = snapshot_path(shop_id, directory)
+    shop = Shop.objects.filter(pk=shop_id).values('catalog_version', 'name').first()
+    if shop is None:
+        path.unlink(missing_ok=True)
+        return None
+
+    queryset = ProductInfo.objects.filter(shop_id=shop_id)
+    ordering = KeysetPagination().get_ordering(queryset)
+    ints = {name: array('q') for name in INT_COLUMNS}
+    texts = {name: (array('q', [0]), bytearray()) for name in TEXT_COLUMNS}
+    rows = queryset.order_by(*ordering).values(*INT_COLUMNS, *TEXT_COLUMNS)
+    for row in rows.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+        for name, column in ints.items():
+            column.append(row[name])
+        for name, (offsets, blob) in texts.items():
+            blob += row[name].encode()
+            offsets.append(len(blob))
+
+    pks = ints['pk']
+    positions = sorted(range(len(pks)), key=pks.__getitem__)
+    sections = {
+        **{name: column.tobytes() for name, column in ints.items()},
+        **{f'{name}.offsets': offsets.tobytes() for name, (offsets, _) in texts.items()},
+        **{name: bytes(blob) for name, (_, blob) in texts.items()},
+        'index': array('q', (pks[position] for position in positions)).tobytes(),
+        'index.positions': array('q', positions).tobytes(),
+        'shop__name': shop['name'].encode(),
+        'ordering': ','.join(ordering).encode(),
+    }
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(SECTIONS), shop_id, shop['catalog_version'], len(pks))
+    _write(path, header, [sections[name] for name in SECTIONS])
+    return path
+
+
+def _write(path, header, sections):
+    offset = len(header) + SECTION.size * len(sections)
+    table = []
+    for data in sections:
+        offset += -offset % 8
+        table.append((offset, len(data)))
+        offset += len(data)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f'.{path.name}.', delete=False) as file:
+        try:
+            file.write(header)
+            for offset, length in table:
+                file.write(SECTION.pack(offset, length))
+            for (offset, _), data in zip(table, sections):
+                file.write(b'\0' * (offset - file.tell()))
+                file.write(data)
+        except BaseException:
+            os.unlink(file.name)
+            raise
+    os.chmod(file.name, 0o644)
+    os.replace(file.name, path)
+
+
+def build_snapshot_on_commit(shop_id):
+    """
+    Rebuild the snapshot of a shop once the current transaction (and its version bump) commits.
+    """
+    if settings.CATALOG_SNAPSHOT_DIR:
+        transaction.on_commit(partial(_build_quietly, shop_id))
+
+
+def _build_quietly(shop_id):
+    # the import is committed already: a snapshot which cannot be written only leaves the listing on SQL
+    try:
+        build_snapshot(shop_id)
+    except OSError:
+        logger.exception('Cannot write the catalog snapshot of shop %s', shop_id)
+
+
+def schedule_snapshots(shop_ids):
+    """
+    Rebuild the snapshots of shops whose stock or prices changed, once the current transaction commits.
+
+    Orders and stock updates change a shop many times a minute, so a rebuild
+    waits ``CATALOG_SNAPSHOT_DELAY`` seconds in a background thread and covers
+    every change of the shop committed meanwhile. Without a delay the snapshot
+    is rebuilt at commit.
+    """
+    if settings.CATALOG_SNAPSHOT_DIR:
+        transaction.on_commit(partial(_schedule, sorted(set(shop_ids))))
+
+
+def _schedule(shop_ids):
+    delay = settings.CATALOG_SNAPSHOT_DELAY
+    for shop_id in shop_ids:
+        if not delay:
+            _build_quietly(shop_id)
+            continue
+        with _scheduled_lock:
+            if shop_id in _scheduled:
+                continue
+            _scheduled.add(shop_id)
+        timer = threading.Timer(delay, _build_later, [shop_id])
+        timer.daemon = True
+        timer.start()
+
+
+def _build_later(shop_id):
+    # changes committed while the snapshot is written schedule the next rebuild
+    with _scheduled_lock:
+        _scheduled.discard(shop_id)
+    try:
+        _build_quietly(shop_id)
+    except DatabaseError:
+        logger.exception('Cannot read the catalog of shop %s for its snapshot', shop_id)
+    finally:
+        connections.close_all()
+
+
+def snapshot_version(path):
+    """
+    The catalog version a snapshot file was built at, or None if it is missing or unreadable.
+    """
+    try:
+        with open(path, 'rb') as file:
+            magic, format_version, _, _, version, _ = HEADER.unpack(file.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return version if (magic, format_version) == (MAGIC, FORMAT_VERSION) else None
+
+
+class Snapshot:
+    """
+    A snapshot file mapped into memory.
+
+    Indexing or slicing returns ``values()``-like rows with the lookups of
+    ``ProductInfoValues`` and the ``pk``; only the requested rows are decoded.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        view = memoryview(buffer)
+        try:
+            magic, format_version, count, self.shop_id, self.version, self.count = HEADER.unpack_from(view)
+        except struct.error:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        if (magic, format_version, count) != (MAGIC, FORMAT_VERSION, len(SECTIONS)):
+            raise ValueError(f'{path} is not a catalog snapshot of this version')
+
+        sections = {}
+        for number, name in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(view, HEADER.size + number * SECTION.size)
+            if offset + length > len(view):
+                raise ValueError(f'{path} is truncated')
+            sections[name] = view[offset:offset + length]
+        self.ints = [(name, sections[name].cast('q')) for name in INT_COLUMNS]
+        self.texts = [(name, sections[f'{name}.offsets'].cast('q'), sections[name]) for name in TEXT_COLUMNS]
+        self.index = sections['index'].cast('q')
+        self.index_positions = sections['index.positions'].cast('q')
+        self.shop_name = bytes(sections['shop__name']).decode()
+        self.ordering = bytes(sections['ordering']).decode().split(',')
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.row(position) for position in range(*item.indices(self.count))]
+        if not -self.count <= item < self.count:
+            raise IndexError(item)
+        return self.row(item % self.count)
+
+    def row(self, position):
+        row = {name: column[position] for name, column in self.ints}
+        for name, offsets, blob in self.texts:
+            row[name] = str(blob[offsets[position]:offsets[position + 1]], 'utf-8')
+        row['shop_id'] = self.shop_id
+        row['shop__name'] = self.shop_name
+        return row
+
+    def position(self, pk):
+        """
+        The position of the good with the primary key ``pk``, or None if it is not in the snapshot.
+        """
+        number = bisect.bisect_left(self.index, pk)
+        if number < self.count and self.index[number] == pk:
+            return self.index_positions[number]
+        return None
+
+
+def open_snapshot(shop_id):
+    """
+    The snapshot of a shop if it is up to date.
+
+    A file is mapped once per process and mapped again when it is replaced,
+    which costs a ``stat`` per call.
+
+    Returns:
+        Snapshot: The snapshot, or None if there is none at the current catalog version of the shop.
+    """
+    version = Shop.objects.filter(pk=shop_id).values_list('catalog_version', flat=True).first()
+    if version is None:
+        return None
+    path = snapshot_path(shop_id)
+    try:
+        stat = os.stat(path)
+        snapshot = _snapshots.get(path)
+        if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns):
+            snapshot = Snapshot(path)
+            _snapshots.pop(path, None)
+            if len(_snapshots) >= SNAPSHOTS_KEPT:
+                _snapshots.pop(next(iter(_snapshots)), None)
+            _snapshots[path] = snapshot
+    except (OSError, ValueError, TypeError):
+        # a missing or corrupt file, a section of a length ``cast`` refuses included: the listing falls back to SQL
+        return None
+    return snapshot if snapshot.version == version else None
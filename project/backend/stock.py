@@ -0,0 +1,103 @@
+from django.db import connection, transaction
+
+from .cache import bump_catalog_version
+from .models import ProductInfo, Shop
+from .snapshots import schedule_snapshots
+
+
+STOCK_FIELDS = ('quantity', 'price', 'price_rrc')
+STOCK_UPDATE_CHUNK_SIZE = 1000
+# the upper bound of the PositiveIntegerField columns
+MAX_STOCK_VALUE = 2 ** 31 - 1
+
+
+def parse_stock_row(row):
+    """
+    Validate one row of a stock update.
+
+    Returns:
+        tuple: The external id and the new values, None for the fields left as they are.
+
+    Raises:
+        ValueError: If the row is not an object with an ``external_id`` and at least one field, all of them
+            integers from 0 to ``MAX_STOCK_VALUE``.
+    """
+    if not isinstance(row, dict):
+        raise ValueError('A row should be an object')
+    values = [row.get('external_id'), *(row.get(field) for field in STOCK_FIELDS)]
+    for name, value in zip(('external_id', *STOCK_FIELDS), values):
+        if value is not None and (type(value) is not int or not 0 <= value <= MAX_STOCK_VALUE):
+            raise ValueError(f'{name} should be an integer from 0 to {MAX_STOCK_VALUE}')
+    if values[0] is None:
+        raise ValueError('external_id is required')
+    if all(value is None for value in values[1:]):
+        raise ValueError(f'At least one of {", ".join(STOCK_FIELDS)} is required')
+    return values[0], tuple(values[1:])
+
+
+def _update_chunk(shop_id, changes):
+    """
+    Apply the changes of a chunk of goods with a single ``UPDATE ... FROM (VALUES ...)``.
+
+    Returns:
+        set: The external ids of the goods found and updated.
+    """
+    table = connection.ops.quote_name(ProductInfo._meta.db_table)
+    assignments = ', '.join(f'{field} = COALESCE(CAST(changes.{field} AS integer), {table}.{field})'
+                            for field in STOCK_FIELDS)
+    rows = ', '.join(['(%s, %s, %s, %s)'] * len(changes))
+    sql = (f'WITH changes (external_id, {", ".join(STOCK_FIELDS)}) AS (VALUES {rows}) '
+           f"UPDATE {table} SET {assignments}, fingerprint = '' FROM changes "
+           f'WHERE {table}.shop_id = %s AND {table}.external_id = changes.external_id '
+           f'RETURNING {table}.external_id')
+    params = [value for external_id, values in changes.items() for value in (external_id, *values)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, shop_id])
+        return {external_id for external_id, in cursor.fetchall()}
+
+
+def update_stock(shop, rows):
+    """
+    Set the stock and prices of goods of a shop, keyed by their external ids.
+
+    Valid rows are applied in chunks of ``STOCK_UPDATE_CHUNK_SIZE``, each with
+    one statement, inside one transaction. The goods lose their fingerprints
+    and the shop its feed validators, so the next upload of the feed rewrites
+    them; the catalog version is bumped and the snapshot of the shop rebuilt.
+
+    Parameters:
+        shop (Shop): The shop the goods belong to.
+        rows (list): Objects with ``external_id`` and any of ``quantity``, ``price`` and ``price_rrc``.
+
+    Returns:
+        list: A result per row, in the order of ``rows``: ``external_id``, ``status``
+        (``updated``, ``not_found`` or ``invalid``) and ``error`` for invalid rows.
+    """
+    results = []
+    changes = {}
+    for row in rows:
+        try:
+            external_id, values = parse_stock_row(row)
+            if external_id in changes:
+                raise ValueError('Duplicate external_id')
+        except ValueError as er:
+            results.append({'external_id': row.get('external_id') if isinstance(row, dict) else None,
+                            'status': 'invalid', 'error': str(er)})
+            continue
+        changes[external_id] = values
+        results.append({'external_id': external_id, 'status': None})
+
+    updated = set()
+    with transaction.atomic():
+        items = list(changes.items())
+        for start in range(0, len(items), STOCK_UPDATE_CHUNK_SIZE):
+            updated |= _update_chunk(shop.id, dict(items[start:start + STOCK_UPDATE_CHUNK_SIZE]))
+        if updated:
+            Shop.objects.filter(pk=shop.id).update(feed_digest='', feed_etag='', feed_last_modified='')
+            bump_catalog_version([shop.id])
+            schedule_snapshots([shop.id])
+
+    for result in results:
+        if result['status'] is None:
+            result['status'] = 'updated' if result['external_id'] in updated else 'not_found'
+    return results
@@ -1,12 +1,17 @@
 from django.urls import path
-from .views import (UploadProductsView, ListProductView, AddOrderItemView, ListItemsOrder, DeleteOrderItemView,
-                    ListOrderView, ConfirmOrderView, DetailOrderView)
+from .views import (UploadProductsView, BatchUploadProductsView, UpdateStockView, ListProductView, ExportProductsView,
+                    AddOrderItemView, ListItemsOrder, DeleteOrderItemView, ListOrderView, ConfirmOrderView,
+                    DetailOrderView, ImportJobView)
 
 app_name = 'backend'
 
 urlpatterns = [
     path('upload/', UploadProductsView.as_view(), name='upload'),
+    path('upload/batch/', BatchUploadProductsView.as_view(), name='upload_batch'),
+    path('upload/<int:job_id>/', ImportJobView.as_view(), name='upload_job'),
+    path('stock/', UpdateStockView.as_view(), name='stock'),
     path('products/', ListProductView.as_view(), name='products'),
+    path('products/export/', ExportProductsView.as_view(), name='products_export'),
     path('add_order_items/', AddOrderItemView.as_view(), name='add_order_items'),
     path('basket', ListItemsOrder.as_view(), name='basket'),
     path('order/<int:pk>/', DetailOrderView.as_view(), name='order'),
@@ -1,24 +1,66 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
 from django.core.validators import URLValidator
-from django.db import IntegrityError
-from django.http import JsonResponse
-from requests import get
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status
-from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView, CreateAPIView, DestroyAPIView, UpdateAPIView, RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from yaml import Loader, load as load_yaml
-
 from users.confirm import send_confirmed_order
+from .async_views import aiterate
+from .feeds import FEED_FORMATS
+from .cache import CatalogCacheMixin
+from .export import EXPORT_FORMATS, export_catalog, gzip_stream
+from .facets import facet_counts
+from .fast_serializers import ListItemsValues, ProductInfoValues, ValuesListMixin
+from .filters import ProductSearchFilter, ParameterFilter, ShopFilter, OrderFilter
+from .jobs import enqueue_import, enqueue_imports
+from .orders import CLOSED_STATUSES, OutOfStock, confirm_order, product_infos_for
+from .pagination import KeysetPagination
 from .permissions import IsOwnerOrderItem, IsOwnerOrder
-from .models import (Shop, Category, Product, ProductInfo, Parameter, ProductParameter, Order, OrderItem)
+from .models import Shop, ProductInfo, Order, OrderItem, ImportJob
+from .snapshots import open_snapshot
+from .stock import update_stock
 from .serializers import (ProductInfoSerializer, OrderSerializer, ListItemsSerializer, OrderItemSerializer,
-                          ListOrderSerializer, ConfirmOrderSerializer, GetOrderSerializer)
+                          ListOrderSerializer, ConfirmOrderSerializer, GetOrderSerializer, ImportJobSerializer)
+
+
+BATCH_UPLOAD_LIMIT = 1000
+STOCK_UPDATE_LIMIT = 20000
+
+
+def feed_error(url, feed_format):
+    """
+    Check the address and the format of a feed to upload.
+
+    Returns:
+        str: The error message, or None if the feed can be queued.
+    """
+    if not url or not isinstance(url, str):
+        return 'You should provide a URL'
+    try:
+        URLValidator()(url)
+    except ValidationError as er:
+        return ' '.join(er.messages)
+    if feed_format and feed_format not in FEED_FORMATS:
+        return f'Unsupported feed format: {feed_format}'
+    return None
 
 
 class UploadProductsView(APIView):
+    """
+    View for uploading products.
+
+    The feed is not imported during the request: a job is queued for the
+    ``import_worker`` management command and its id is returned at once.
+    """
     def post(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return JsonResponse({'Error': 'Log in required.'}, status=403)
@@ -27,80 +69,199 @@ class UploadProductsView(APIView):
             return JsonResponse({'Error': 'Only shops can upload products.'}, status=403)
 
         url = request.data.get('url')
-        if url:
-            validate = URLValidator()
-            try:
-                validate(url)
-            except ValidationError as er:
-                return JsonResponse({'Error': str(er)}, status=400)
+        feed_format = request.data.get('format')
+        error = feed_error(url, feed_format)
+        if error:
+            return JsonResponse({'Error': error}, status=400)
 
-            else:
-                stream = get(url).content
-                data = load_yaml(stream, Loader=Loader)
-
-                try:
-                    shop, created = Shop.objects.get_or_create(
-                        name=data['shop'],
-                        user_id = request.user.id
-                        )
-
-                    for category in data.get('categories'):
-                        category_obj, created = Category.objects.get_or_create(
-                            external_id=category['id'],
-                            name=category['name']
-                        )
-                        category_obj.shops.set([shop.id])
-
-                    for product in data.get('goods'):
-                        product_obj, created = Product.objects.get_or_create(
-                            name = product['name'],
-                            category = Category.objects.get(external_id = product['category'])
-                        )
-
-                        try:
-                            product_info_obj, created = ProductInfo.objects.get_or_create(
-                                product = product_obj,
-                                model = product['model'],
-                                external_id = product['id'],
-                                shop = shop,
-                                quantity = product['quantity'],
-                                price = product['price'],
-                                price_rrc = product['price_rrc']
-                            )
-
-                        except IntegrityError:
-                            continue
-
-                        for key, value in product['parameters'].items():
-
-                            parameter_obj, created = Parameter.objects.get_or_create(
-                                name = key
-                            )
-
-                            product_parameter_obj, created = ProductParameter.objects.get_or_create(
-                                product_info = product_info_obj,
-                                parameter = parameter_obj,
-                                value = value
-                            )
-
-                    return JsonResponse({'Success': 'Products uploaded.'}, status=200)
-
-                except KeyError as er:
-                    return JsonResponse({'Error': f'KeyError: {str(er)}'}, status=400)
-
-        return JsonResponse({'Error': 'You should provide a URL'}, status=400)
-
-
-class ListProductView(ListAPIView):
-    queryset = ProductInfo.objects.select_related('product').prefetch_related('shop', 'product__category')
+        job = enqueue_import(request.user, url, feed_format, request.data.get('shop'))
+        return JsonResponse({'Success': 'Upload queued.', 'job_id': job.id,
+                             'status_url': reverse('backend:upload_job', args=[job.id])},
+                            status=202)
+
+
+class BatchUploadProductsView(APIView):
+    """
+    View for uploading the feeds of many shops at once.
+
+    Expects ``feeds``: a list of URLs or of objects with ``url`` and optional
+    ``format`` and ``shop``. A job is queued for every feed; the workers
+    download them concurrently. Nothing is queued if any feed is invalid.
+    """
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'Error': 'Log in required.'}, status=403)
+
+        if request.user.type != 'shop':
+            return JsonResponse({'Error': 'Only shops can upload products.'}, status=403)
+
+        feeds = request.data.get('feeds')
+        if not feeds or not isinstance(feeds, list):
+            return JsonResponse({'Error': 'You should provide a list of feeds'}, status=400)
+        if len(feeds) > BATCH_UPLOAD_LIMIT:
+            return JsonResponse({'Error': f'At most {BATCH_UPLOAD_LIMIT} feeds can be uploaded at once'}, status=400)
+
+        feeds = [feed if isinstance(feed, dict) else {'url': feed} for feed in feeds]
+        errors = {number: error for number, feed in enumerate(feeds)
+                  if (error := feed_error(feed.get('url'), feed.get('format')))}
+        if errors:
+            return JsonResponse({'Error': errors}, status=400)
+
+        jobs = enqueue_imports([(request.user.id, feed['url'], feed.get('format'), feed.get('shop'))
+                                for feed in feeds])
+        return JsonResponse({'Success': 'Uploads queued.', 'jobs': [
+            {'url': job.url, 'job_id': job.id, 'status_url': reverse('backend:upload_job', args=[job.id])}
+            for job in jobs
+        ]}, status=202)
+
+
+class UpdateStockView(APIView):
+    """
+    View for updating the stock and prices of a shop without uploading its feed.
+
+    Expects ``items``: a list of objects with the ``external_id`` of a good of
+    the feed and any of ``quantity``, ``price`` and ``price_rrc``, and ``shop``
+    (an id) when the user has several shops. Invalid rows are skipped; the
+    response has a result for every row.
+    """
+    def patch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'Error': 'Log in required.'}, status=403)
+
+        if request.user.type != 'shop':
+            return JsonResponse({'Error': 'Only shops can update products.'}, status=403)
+
+        items = request.data.get('items')
+        if not items or not isinstance(items, list):
+            return JsonResponse({'Error': 'You should provide a list of items'}, status=400)
+        if len(items) > STOCK_UPDATE_LIMIT:
+            return JsonResponse({'Error': f'At most {STOCK_UPDATE_LIMIT} items can be updated at once'}, status=400)
+
+        shops = Shop.objects.filter(user=request.user)
+        if request.data.get('shop') is not None:
+            shops = shops.filter(pk=request.data['shop']) if str(request.data['shop']).isdigit() else shops.none()
+        shops = list(shops[:2])
+        if not shops:
+            return JsonResponse({'Error': 'Shop not found.'}, status=404)
+        if len(shops) > 1:
+            return JsonResponse({'Error': 'You have several shops, provide shop'}, status=400)
+
+        results = update_stock(shops[0], items)
+        counts = {status: 0 for status in ('updated', 'not_found', 'invalid')}
+        for result in results:
+            counts[result['status']] += 1
+        return JsonResponse({'Success': 'Stock updated.', **counts, 'results': results})
+
+
+class ImportJobView(RetrieveAPIView):
+    """
+    View for tracking an upload: state, processed goods, throughput and errors.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ImportJobSerializer
+    lookup_url_kwarg = 'job_id'
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(user=self.request.user)
+
+
+class ListProductView(CatalogCacheMixin, ValuesListMixin, ListAPIView):
+    """
+    List API View for the product catalog.
+
+    With ``facets=1`` the response also carries the number of goods per
+    parameter value: the precomputed counts of the whole catalog, or counts
+    over the filtered goods when ``q``, ``search`` or ``param`` is given.
+    Responses are cached until the catalog version changes. Rows are
+    serialized by ``ProductInfoValues`` straight from ``values()``.
+
+    The goods of one shop (``shop`` with no other filter, in the default
+    ordering) are read from the memory-mapped snapshot of the shop while it
+    is up to date, and from the database otherwise.
+    """
+    queryset = ProductInfo.objects.all()
     serializer_class = ProductInfoSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    values_serializer_class = ProductInfoValues
+    pagination_class = KeysetPagination
+    filter_backends = [ShopFilter, ProductSearchFilter, ParameterFilter, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['model', 'product__name', 'shop__name', 'product__category__name']
     ordering_fields = ['model', 'product__name', 'shop__name', 'product__category__name', 'price_rrc', 'quantity']
+    facets_param = 'facets'
+    filter_params = ['q', 'param', 'search', 'shop']
+    snapshot_params = {'shop', 'cursor', 'page_size', 'format'}
+
+    def list(self, request, *args, **kwargs):
+        response = self.list_snapshot(request)
+        if response is not None:
+            return response
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer, rows = self.values_queryset(queryset)
+        response = self.get_paginated_response(serializer.serialize(self.paginate_queryset(rows)))
+        if request.query_params.get(self.facets_param) in ('1', 'true'):
+            filtered = any(request.query_params.get(param) for param in self.filter_params)
+            response.data['facets'] = facet_counts(queryset if filtered else None)
+        return response
+
+    def list_snapshot(self, request):
+        """
+        The page of a shop listing read from the snapshot of the shop.
+
+        Returns:
+            Response: The page, or None if the listing has to be read from the database.
+        """
+        if not settings.CATALOG_SNAPSHOT_DIR or set(request.query_params) - self.snapshot_params:
+            return None
+        shop_id = ShopFilter().get_shop_id(request)
+        snapshot = open_snapshot(shop_id) if shop_id is not None else None
+        if snapshot is None:
+            return None
+        ordering = self.paginator.get_ordering(self.get_queryset())
+        if ordering != snapshot.ordering:
+            return None
+        page = self.paginator.paginate_sorted(snapshot, request, ordering, snapshot.position)
+        if page is None:
+            return None
+        return self.get_paginated_response(self.values_serializer_class().serialize(page))
+
+
+class ExportProductsView(View):
+    """
+    Stream the whole catalog as a JSON array (``format=json``) or NDJSON (``format=ndjson``).
 
-
-
-class ListItemsOrder(ListAPIView):
+    Rows are read with a server-side cursor and sent while they are encoded,
+    so the first byte leaves at once and memory does not grow with the
+    catalog. The export is gzip-compressed when the client accepts it, or
+    as requested by ``gzip=1``/``gzip=0``. Under ASGI the pieces are handed
+    over through an async iterator, so they are not gathered before sending.
+    """
+    content_types = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'json')
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({'Error': f'Unsupported export format: {export_format}'}, status=400)
+
+        compress = request.GET.get('gzip')
+        if compress is None:
+            compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+        else:
+            compress = compress in ('1', 'true')
+
+        content = export_catalog(export_format)
+        if compress:
+            content = gzip_stream(content)
+        if isinstance(request, ASGIRequest):
+            content = aiterate(content)
+        response = StreamingHttpResponse(content, content_type=self.content_types[export_format])
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['Vary'] = 'Accept-Encoding'
+        response['Content-Disposition'] = f'attachment; filename="catalog.{export_format}"'
+        return response
+
+
+class ListItemsOrder(ValuesListMixin, ListAPIView):
     """
     List API View for Order Items.
 
@@ -110,6 +271,7 @@ class ListItemsOrder(ListAPIView):
     permission_classes = [IsAuthenticated]
     queryset = OrderItem.objects.all()
     serializer_class = ListItemsSerializer
+    values_serializer_class = ListItemsValues
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['model', 'product__name', 'shop__name', 'product__category__name']
     ordering_fields = ['model', 'product__name', 'shop__name', 'product__category__name', 'price_rcc']
@@ -134,39 +296,53 @@ class AddOrderItemView(CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user'] = self.request.user
-        order, created = Order.objects.get_or_create(user=user,
-                                                     contact=serializer.validated_data['contact'],
-                                                     status='new')
-
-        # an empty dict to store info about added products
-        info = {}
 
+        # requested quantity per (product, shop), repeated lines are summed up
+        lines = {}
         for item in serializer.validated_data['orderitem_set']:
-            product_id = item.get('product').get('id')
-            shop_id = item.get('shop')
-            product = Product.objects.get(id=product_id, product_info__shop_id=shop_id)
-            total_quantity = product.product_info.first().quantity
-            item.pop('product')
-            product_item = OrderItem.objects.filter(order=order, product=product).first()
-
-            if product_item:
-                if total_quantity < (item['quantity'] + product_item.quantity):
-                    available_quantity = total_quantity - product_item.quantity
-                    return Response({'Error': f'Not enough products in stock. '
-                                                  f'There are {product.name}: available {available_quantity} pieces',
-                                         **info},
-                                        status=status.HTTP_403_FORBIDDEN)
-                info[product.name] = 'added in order'
-                product_item.quantity += item['quantity']
-                product_item.save()
+            key = (item['product']['id'], item['shop_id'])
+            lines[key] = lines.get(key, 0) + item['quantity']
+
+        product_infos = product_infos_for(lines.keys())
+        missing = lines.keys() - product_infos.keys()
+        if missing:
+            product_id, shop_id = min(missing)
+            return Response({'Error': f'Product {product_id} is not sold by shop {shop_id}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        order = Order.objects.filter(user=user, contact=serializer.validated_data['contact'], status='new').first()
+        order_items = {} if order is None else {
+            (order_item.product_id, order_item.shop_id): order_item
+            for order_item in OrderItem.objects.filter(order=order, product_id__in={key[0] for key in lines})
+        }
+
+        # every line is checked against the stock before anything is written
+        new_items, to_update = [], []
+        for key, quantity in lines.items():
+            product_info = product_infos[key]
+            order_item = order_items.get(key)
+            in_order = order_item.quantity if order_item else 0
+            if product_info.quantity < in_order + quantity:
+                return Response({'Error': f'Not enough products in stock. '
+                                          f'There are {product_info.product.name}: '
+                                          f'available {product_info.quantity - in_order} pieces'},
+                                status=status.HTTP_403_FORBIDDEN)
+            if order_item:
+                order_item.quantity += quantity
+                to_update.append(order_item)
             else:
-                if total_quantity < item['quantity']:
-                    return Response({'Error': f'Not enough products in stock. '
-                                                  f'There are {product.name}: available {total_quantity} pieces',
-                                         **info},
-                                        status=status.HTTP_403_FORBIDDEN)
-                info[product.name] = 'added in order'
-                product_item = OrderItem.objects.create(order=order, product=product, **item)
+                new_items.append(OrderItem(product_id=key[0], shop_id=key[1], quantity=quantity,
+                                           unit_price=product_info.price_rrc))
+
+        with transaction.atomic():
+            if order is None:
+                order = Order.objects.create(user=user, contact=serializer.validated_data['contact'], status='new')
+            if new_items:
+                for order_item in new_items:
+                    order_item.order = order
+                OrderItem.objects.bulk_create(new_items)
+            if to_update:
+                OrderItem.objects.bulk_update(to_update, ['quantity'])
 
         return Response({"Success": "Item(s) added successfully"}, status=status.HTTP_201_CREATED)
 
@@ -204,20 +380,25 @@ class ListOrderView(ListAPIView):
 
     This view handles listing of orders for authenticated users.
     It filters the orders based on the user making the request.
+    Totals are annotated in SQL, the list is cursor-paginated
+    and can be filtered by status and creation date.
     """
     permission_classes = [IsAuthenticated]
     queryset = Order.objects.all()
     serializer_class = ListOrderSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_class = OrderFilter
+    ordering_fields = ['dt', 'status', 'total_sum']
 
     def get_queryset(self):
         user = self.request.user
-        return Order.objects.filter(user=user)
+        return Order.objects.with_totals().filter(user=user)
 
 
 class DetailOrderView(RetrieveAPIView):
     permission_classes = [IsAuthenticated, IsOwnerOrder]
-    queryset = Order.objects.select_related('user', 'contact').prefetch_related('orderitem_set__product')
+    queryset = Order.objects.with_totals().select_related('user', 'contact').prefetch_related('orderitem_set__product')
     serializer_class = GetOrderSerializer
 
 
@@ -237,9 +418,23 @@ class ConfirmOrderView(UpdateAPIView):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data)
         serializer.is_valid(raise_exception=True)
-        if instance.status in ['confirmed', 'assembled', 'sent', 'delivered', 'canceled']:
+        if instance.status in CLOSED_STATUSES:
             return Response({"Order status": f"{instance.status}"}, status=status.HTTP_403_FORBIDDEN)
-        instance.status = 'confirmed'
+        with transaction.atomic():
+            try:
+                items = confirm_order(instance)
+            except OutOfStock as er:
+                return Response({'Error': str(er)}, status=status.HTTP_403_FORBIDDEN)
+            if items is None:
+                instance.refresh_from_db(fields=['status'])
+                return Response({"Order status": f"{instance.status}"}, status=status.HTTP_403_FORBIDDEN)
+            self.notify(request, instance, items)
+        return Response({"Success": "Order confirmed successfully"},status=status.HTTP_200_OK)
+
+    def notify(self, request, instance, items):
+        """
+        Queue the confirmation emails in the transaction of the confirmation.
+        """
         order_info = {
                         'price_order': 0,
                         'order_id': instance.id,
@@ -247,20 +442,13 @@ class ConfirmOrderView(UpdateAPIView):
                         'user': instance.user.username,
                         'products':{}
                       }
-        for item in instance.orderitem_set.all():
-            product = item.product
+        for item in items:
             info = {
                     'quantity': item.quantity,
                     'total price': item.total_price,
                     'id': item.id
                     }
-            order_info['products'][product.name] = info
+            order_info['products'][item.product.name] = info
             order_info['price_order'] += item.total_price
-            product_info = product.product_info.filter(shop=item.shop).first()
-            product_info.quantity -= item.quantity
-            product_info.save()
 
         send_confirmed_order(order_info, [request.user.email])
-
-        self.perform_update(instance)
-        return Response({"Success": "Order confirmed successfully"},status=status.HTTP_200_OK)
@@ -0,0 +1,65 @@
+"""
+Benchmark of imports from slow suppliers: one job at a time versus concurrent downloads.
+
+A local HTTP server serves synthetic feeds after a delay. The same number of
+upload jobs is run the synchronous way, one feed after another as a WSGI
+request or a plain worker does, and by the asynchronous worker which waits
+for many feeds at once. Run from the ``project`` directory:
+
+    python -m benchmarks.bench_async --feeds 50 --delay 0.5 --concurrency 10 50
+"""
+import argparse
+import asyncio
+import time
+
+import yaml
+
+from benchmarks.utils import feed_server, setup_django, synthetic_feed, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--feeds', type=int, default=50)
+    parser.add_argument('--goods', type=int, default=50, help='goods per feed')
+    parser.add_argument('--delay', type=float, default=0.5, help='seconds the server waits before answering')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50])
+    args = parser.parse_args()
+
+    setup_django()
+    from backend.jobs import claim_job, enqueue_import, run_job, run_jobs_concurrently
+    from backend.models import ImportJob
+    from users.models import CustomUser
+
+    feeds = {
+        f'/shop{number}.yaml': yaml.safe_dump(synthetic_feed(args.goods, shop=f'Shop {number}', seed=number),
+                                              allow_unicode=True, sort_keys=False).encode()
+        for number in range(args.feeds)
+    }
+
+    def sequential():
+        while (job := claim_job()) is not None:
+            run_job(job)
+
+    runs = [('sequential', sequential)] + [
+        (f'concurrency {concurrency}',
+         lambda concurrency=concurrency: asyncio.run(run_jobs_concurrently(concurrency, 0.05, True, [])))
+        for concurrency in args.concurrency
+    ]
+
+    with test_database(), feed_server(feeds, args.delay) as base_url:
+        for number, (name, run) in enumerate(runs):
+            # new shops every run, so that no feed is skipped as already imported
+            user = CustomUser.objects.create_user(email=f'bench{number}@mail.ru', password='secret', type='shop')
+            jobs = [enqueue_import(user, base_url + path) for path in feeds]
+
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+
+            statuses = list(ImportJob.objects.filter(pk__in=[job.pk for job in jobs]).values_list('status', flat=True))
+            print(f'{name:<16} {len(jobs):>5} feeds {elapsed:7.2f}s {len(jobs) / elapsed:7.1f} feeds/s '
+                  f'done={statuses.count("done")} failed={statuses.count("failed")}')
+
+
+if __name__ == '__main__':
+    main()
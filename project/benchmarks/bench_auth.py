@@ -0,0 +1,63 @@
+"""
+Cost of authenticating a request: HTTP Basic versus API tokens.
+
+Prints the time of the authentication step alone and the throughput of an
+authenticated endpoint. Run from the ``project`` directory:
+
+    python -m benchmarks.bench_auth --requests 200
+"""
+import argparse
+import base64
+import time
+
+from benchmarks.utils import setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.authentication import BasicAuthentication
+    from rest_framework.request import Request
+    from rest_framework.test import APIClient, APIRequestFactory
+    from users.authentication import TokenAuthentication, issue_token, token_cache
+    from users.models import CustomUser, Contact
+
+    with test_database():
+        user = CustomUser.objects.create_user(email='bench@mail.ru', password='secret', is_active=True)
+        Contact.objects.create(user=user, city='-', street='-', phone='-')
+        token, _ = issue_token(user)
+        basic = f'Basic {base64.b64encode(b"bench@mail.ru:secret").decode()}'
+        schemes = {
+            'basic': (BasicAuthentication(), basic, False),
+            'token': (TokenAuthentication(), f'Token {token}', False),
+            'token, cached': (TokenAuthentication(), f'Token {token}', True),
+        }
+
+        factory = APIRequestFactory()
+        for name, (authenticator, header, cached) in schemes.items():
+            token_cache.clear()
+            elapsed = 0.0
+            for _ in range(args.requests):
+                if not cached:
+                    token_cache.clear()
+                request = Request(factory.get('/', HTTP_AUTHORIZATION=header), authenticators=[authenticator])
+                started = time.perf_counter()
+                assert request.user == user
+                elapsed += time.perf_counter() - started
+            print(f'{name:<14} authentication {elapsed / args.requests * 1000:8.3f} ms/request')
+
+        client = APIClient()
+        for name, header in (('basic', basic), ('token', f'Token {token}')):
+            token_cache.clear()
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                assert client.get('/api/v1/contacts/', HTTP_AUTHORIZATION=header).status_code == 200
+            elapsed = time.perf_counter() - started
+            print(f'{name:<14} GET /api/v1/contacts/ {args.requests / elapsed:8.0f} req/s')
+
+
+if __name__ == '__main__':
+    main()
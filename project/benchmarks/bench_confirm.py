@@ -0,0 +1,78 @@
+"""
+Benchmark of concurrent order confirmations competing for the same goods.
+
+Run from the ``project`` directory against PostgreSQL:
+
+    python -m benchmarks.bench_confirm --orders 2000 --stock 500 --threads 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--stock', type=int, default=500, help='stock of every SKU')
+    parser.add_argument('--skus', type=int, default=1, help='SKUs shared by all the orders')
+    parser.add_argument('--lines', type=int, default=1, help='order lines per order')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection, DatabaseError
+    from backend.models import Shop, Category, Product, ProductInfo, Order, OrderItem
+    from backend.orders import OutOfStock, confirm_order
+    from users.models import CustomUser, Contact
+
+    def confirm(order):
+        try:
+            return 'confirmed' if confirm_order(order) is not None else 'closed'
+        except OutOfStock:
+            return 'out of stock'
+        except DatabaseError:
+            return 'error'
+        finally:
+            connection.close()
+
+    with test_database():
+        user = CustomUser.objects.create_user(email='bench@mail.ru', password='secret', type='buyer')
+        contact = Contact.objects.create(user=user, city='-', street='-', house='-', phone='-')
+        shop = Shop.objects.create(name='Benchmark shop', user=user)
+        category = Category.objects.create(external_id=1, name='Категория')
+        product_infos = [
+            ProductInfo.objects.create(external_id=sku, shop=shop, model=f'sku-{sku}', price=100, price_rrc=120,
+                                       quantity=args.stock,
+                                       product=Product.objects.create(name=f'Товар {sku}', category=category))
+            for sku in range(args.skus)
+        ]
+
+        for threads in args.threads:
+            ProductInfo.objects.filter(shop=shop).update(quantity=args.stock)
+            orders = [Order.objects.create(user=user, contact=contact, status='new') for _ in range(args.orders)]
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=product_info.product_id, shop=shop, quantity=1,
+                          unit_price=product_info.price_rrc)
+                for number, order in enumerate(orders)
+                for product_info in (product_infos[(number + line) % args.skus] for line in range(args.lines))
+            ])
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                outcomes = list(pool.map(confirm, orders))
+            elapsed = time.perf_counter() - started
+
+            taken = sum(args.stock - quantity for quantity in
+                        ProductInfo.objects.filter(shop=shop).values_list('quantity', flat=True))
+            confirmed = outcomes.count('confirmed')
+            oversold = taken != OrderItem.objects.filter(order__status='confirmed', order__in=orders).count() or \
+                ProductInfo.objects.filter(shop=shop, quantity__lt=0).exists()
+            print(f'{threads:>3} threads {args.orders:>6} orders {elapsed:7.2f}s {args.orders / elapsed:8.0f} orders/s '
+                  f'confirmed={confirmed} out_of_stock={outcomes.count("out of stock")} '
+                  f'errors={outcomes.count("error")} oversold={oversold}')
+
+
+if __name__ == '__main__':
+    main()
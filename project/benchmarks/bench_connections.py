@@ -0,0 +1,111 @@
+"""
+Load benchmark of the API with and without persistent or pooled DB connections.
+
+Seeds a small catalog into a test database, then runs the same request load
+in a fresh process per connection mode (the database settings are read at
+startup) and prints requests per second. Run from the ``project`` directory:
+
+    python -m benchmarks.bench_connections --requests 2000 --threads 1 8
+
+The ``pool`` mode needs PostgreSQL and ``psycopg[pool]``; it is skipped
+otherwise. ``DB_ENGINE=sqlite`` runs the other modes against a SQLite file.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import setup_django, test_database, synthetic_feed
+
+
+MODES = {
+    'per request': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': ''},
+    'persistent': {'DB_CONN_MAX_AGE': '600', 'DB_POOL': ''},
+    'pool': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': '1'},
+}
+
+
+def run_load(path, threads, requests):
+    from django.db import connection
+    from django.test import Client
+
+    def worker(count):
+        client = Client()
+        statuses = [client.get(path).status_code for _ in range(count)]
+        connection.close()
+        return statuses
+
+    # warm up the imports, the URL resolver and the catalog cache
+    Client().get(path)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        chunks = [requests // threads + (1 if i < requests % threads else 0) for i in range(threads)]
+        statuses = [status for result in pool.map(worker, chunks) for status in result]
+    elapsed = time.perf_counter() - started
+    return {'elapsed': elapsed, 'rps': requests / elapsed, 'errors': sum(status != 200 for status in statuses)}
+
+
+def run_mode(mode, database, args, threads):
+    env = dict(os.environ, **MODES[mode], DB_POOL_MIN_SIZE=str(threads), DB_POOL_MAX_SIZE=str(threads))
+    if database['ENGINE'].endswith('sqlite3'):
+        env.update(DB_ENGINE='sqlite', SQLITE_PATH=str(database['NAME']))
+    else:
+        env['POSTGRES_DB'] = database['NAME']
+    command = [sys.executable, '-m', 'benchmarks.bench_connections', '--worker',
+               '--path', args.path, '--requests', str(args.requests), '--threads', str(threads)]
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--goods', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--path', default='/api/v1/products/?page_size=20')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    setup_django()
+    if args.worker:
+        print(json.dumps(run_load(args.path, args.threads[0], args.requests)))
+        return
+
+    from django.db import connection
+    from backend.importer import CatalogImporter
+    from backend.models import Shop
+    from users.models import CustomUser
+
+    postgres = connection.vendor == 'postgresql'
+    with tempfile.TemporaryDirectory() as directory:
+        if not postgres:
+            # the workers need a database file they can open, not an in-memory one
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+        with test_database():
+            owner = CustomUser.objects.create_user(email='bench_shop@mail.ru', password='secret', type='shop')
+            data = synthetic_feed(args.goods)
+            CatalogImporter(Shop.objects.create(name=data['shop'], user=owner)).run(data['categories'], data['goods'])
+            database = dict(connection.settings_dict)
+            connection.close()
+
+            for threads in args.threads:
+                for mode in args.modes:
+                    if mode == 'pool' and not postgres:
+                        print(f'{threads:>3} threads {mode:<12} skipped: needs PostgreSQL')
+                        continue
+                    try:
+                        result = run_mode(mode, database, args, threads)
+                    except subprocess.CalledProcessError as er:
+                        print(f'{threads:>3} threads {mode:<12} failed: {er.stderr.strip().splitlines()[-1]}')
+                        continue
+                    print(f'{threads:>3} threads {mode:<12} {args.requests:>6} requests {result["elapsed"]:7.2f}s '
+                          f'{result["rps"]:8.0f} req/s errors={result["errors"]}')
+
+
+if __name__ == '__main__':
+    main()
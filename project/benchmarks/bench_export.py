@@ -0,0 +1,67 @@
+"""
+Benchmark of the catalog export: streamed pieces versus the whole listing built in memory.
+
+Measures the time to the first byte, the total time, the size and the peak
+of Python memory of both ways, plain and gzip-compressed. Run from the
+``project`` directory:
+
+    python -m benchmarks.bench_export --rows 50000
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.utils import setup_django, synthetic_feed, test_database
+
+
+def measure(pieces):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    for piece in pieces():
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(piece)
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, total, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from backend.export import catalog_rows, export_catalog, gzip_stream
+    from backend.importer import CatalogImporter
+    from backend.models import Shop
+    from backend.renderers import FastJSONRenderer
+    from users.models import CustomUser
+
+    with test_database():
+        user = CustomUser.objects.create_user(email='bench@mail.ru', password='secret', type='shop')
+        data = synthetic_feed(args.rows)
+        CatalogImporter(Shop.objects.create(name=data['shop'], user=user)).run(data['categories'], data['goods'])
+
+        def in_memory():
+            yield FastJSONRenderer().render(list(catalog_rows(args.chunk_size)))
+
+        cases = {
+            'in memory json': in_memory,
+            'streamed json': lambda: export_catalog('json', args.chunk_size),
+            'streamed ndjson': lambda: export_catalog('ndjson', args.chunk_size),
+            'in memory json gzip': lambda: gzip_stream(in_memory()),
+            'streamed ndjson gzip': lambda: gzip_stream(export_catalog('ndjson', args.chunk_size)),
+        }
+        for name, pieces in cases.items():
+            first_byte, total, size, peak = measure(pieces)
+            print(f'{name:<21} first byte {first_byte * 1000:8.1f} ms  total {total * 1000:8.1f} ms  '
+                  f'{size / 2 ** 20:7.1f} MB  peak memory {peak / 2 ** 20:7.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Benchmark of the catalog importer on synthetic price lists.
+
+Run from the ``project`` directory:
+
+    python -m benchmarks.bench_import --goods 10000 100000
+"""
+import argparse
+
+from benchmarks.utils import setup_django, test_database, QueryCounter, synthetic_feed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--goods', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+
+    setup_django()
+    from backend.importer import CatalogImporter
+    from backend.models import Shop
+    from users.models import CustomUser
+
+    with test_database():
+        user = CustomUser.objects.create_user(email='bench@mail.ru', password='secret', type='shop')
+        for goods in args.goods:
+            data = synthetic_feed(goods, shop=f'Benchmark shop {goods}')
+            shop = Shop.objects.create(name=data['shop'], user=user)
+            for run in ('initial', 're-import', '1% changed'):
+                if run == '1% changed':
+                    for good in data['goods'][::100]:
+                        good['quantity'] += 1
+                with QueryCounter() as counter:
+                    summary = CatalogImporter(shop, batch_size=args.batch_size).run(data['categories'], data['goods'])
+                infos = summary['product_infos']
+                print(f'{goods:>8} goods {run:<11} {counter.elapsed:8.2f}s '
+                      f'{goods / counter.elapsed:10.0f} goods/s {counter.count:6} queries '
+                      f'(db {counter.duration:.2f}s) inserted={infos["inserted"]} '
+                      f'updated={infos["updated"]} unchanged={infos["unchanged"]}')
+
+
+if __name__ == '__main__':
+    main()
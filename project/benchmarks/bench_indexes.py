@@ -0,0 +1,110 @@
+"""
+Benchmark of the hot API queries with and without the indexes of migration 0007.
+
+Seeds a catalog and the orders of many users, then prints the plan and the
+mean latency of every query before (schema migrated back to 0006) and after.
+Run from the ``project`` directory:
+
+    python -m benchmarks.bench_indexes --goods 20000 --users 500 --orders 40
+"""
+import argparse
+import random
+import time
+
+from benchmarks.utils import setup_django, test_database, synthetic_feed
+
+
+BEFORE = ('backend', '0006_merge_duplicates')
+AFTER = ('backend', '0007_hot_query_indexes')
+
+
+def seed(goods, users, orders, seed=0):
+    from backend.importer import CatalogImporter
+    from backend.models import Shop, ProductInfo, Order, OrderItem
+    from users.models import CustomUser, Contact
+
+    rnd = random.Random(seed)
+    owner = CustomUser.objects.create_user(email='bench_shop@mail.ru', password='secret', type='shop')
+    data = synthetic_feed(goods)
+    CatalogImporter(Shop.objects.create(name=data['shop'], user=owner)).run(data['categories'], data['goods'])
+    offers = list(ProductInfo.objects.values_list('product_id', 'shop_id', 'price_rrc'))
+
+    buyers = CustomUser.objects.bulk_create([CustomUser(email=f'buyer{i}@mail.ru', type='buyer') for i in range(users)])
+    contacts = Contact.objects.bulk_create([Contact(user=buyer, city='-', street='-', phone='-') for buyer in buyers])
+    statuses = ['confirmed', 'assembled', 'sent', 'delivered', 'canceled']
+    created = Order.objects.bulk_create([
+        Order(user=contact.user, contact=contact, status='new' if number == 0 else rnd.choice(statuses))
+        for contact in contacts for number in range(orders)
+    ], batch_size=5000)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=product_id, shop_id=shop_id, quantity=rnd.randint(1, 3), unit_price=price)
+        for order in created for product_id, shop_id, price in rnd.sample(offers, 3)
+    ], batch_size=5000)
+    return buyers[len(buyers) // 2], data
+
+
+def hot_queries(buyer, data):
+    from backend.models import Category, Parameter, Product, Order, OrderItem
+
+    contact = buyer.contacts.first()
+    basket = Order.objects.filter(user=buyer, status='new').first()
+    category_ids = [category['id'] for category in data['categories']]
+    names = list({good['name'] for good in data['goods'][:1000]})
+    return {
+        'basket lookup': lambda: Order.objects.filter(user=buyer, contact=contact, status='new'),
+        'order list': lambda: Order.objects.with_totals().filter(user=buyer).order_by('-dt', '-id')[:50],
+        'orders by status': lambda: Order.objects.filter(user=buyer, status='delivered').order_by('-dt', '-id')[:50],
+        'basket lines': lambda: OrderItem.objects.filter(order=basket, product_id__in=list(
+            basket.orderitem_set.values_list('product_id', flat=True))),
+        'categories by external id': lambda: Category.objects.filter(external_id__in=category_ids),
+        'products by name': lambda: Product.objects.filter(name__in=names),
+        'parameters by name': lambda: Parameter.objects.filter(name__in=['Цвет', 'Встроенная память (Гб)']),
+    }
+
+
+def measure(queries, repeat):
+    results = {}
+    for name, build in queries.items():
+        plan = build().explain()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(build())
+        results[name] = (plan, (time.perf_counter() - started) / repeat * 1000)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--goods', type=int, default=20_000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=40, help='orders per user')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+
+    with test_database():
+        buyer, data = seed(args.goods, args.users, args.orders)
+        queries = hot_queries(buyer, data)
+
+        call_command('migrate', *BEFORE, verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        before = measure(queries, args.repeat)
+        call_command('migrate', *AFTER, verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        after = measure(queries, args.repeat)
+
+    for name in queries:
+        print(f'== {name}: {before[name][1]:.2f} ms -> {after[name][1]:.2f} ms')
+        print('-- before')
+        print(before[name][0])
+        print('-- after')
+        print(after[name][0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of the catalog and basket serialization: DRF ModelSerializers versus values() serializers.
+
+Serializes pages of ``--rows`` product offers and basket lines both ways and
+renders them with the stdlib and the orjson JSON renderer. Run from the
+``project`` directory:
+
+    python -m benchmarks.bench_serializers --rows 10000
+"""
+import argparse
+import time
+
+from benchmarks.utils import setup_django, synthetic_feed, test_database
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from backend.fast_serializers import ListItemsValues, ProductInfoValues
+    from backend.importer import CatalogImporter
+    from backend.models import Shop, ProductInfo, Order, OrderItem
+    from backend.renderers import FastJSONRenderer, orjson
+    from backend.serializers import ListItemsSerializer, ProductInfoSerializer
+    from users.models import CustomUser, Contact
+
+    with test_database():
+        user = CustomUser.objects.create_user(email='bench@mail.ru', password='secret', type='shop')
+        contact = Contact.objects.create(user=user, city='-', street='-', phone='-')
+        data = synthetic_feed(args.rows)
+        CatalogImporter(Shop.objects.create(name=data['shop'], user=user)).run(data['categories'], data['goods'])
+        order = Order.objects.create(user=user, contact=contact, status='new')
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, shop_id=shop_id, quantity=2, unit_price=price)
+            for product_id, shop_id, price in ProductInfo.objects.values_list('product_id', 'shop_id', 'price_rrc')
+        ], batch_size=5000)
+
+        cases = {
+            'products': (ProductInfoSerializer, ProductInfo.objects.select_related('shop', 'product'),
+                         ProductInfoValues, ProductInfo.objects.all()),
+            'basket': (ListItemsSerializer, OrderItem.objects.filter(order=order).select_related('product'),
+                       ListItemsValues, OrderItem.objects.filter(order=order)),
+        }
+        for name, (serializer_class, queryset, values_class, values_queryset) in cases.items():
+            queryset = queryset.order_by('pk')[:args.rows]
+            values_queryset = values_class().values(values_queryset.order_by('pk')[:args.rows])
+            drf, drf_time = timed(lambda: serializer_class(list(queryset.all()), many=True).data, args.repeat)
+            fast, fast_time = timed(lambda: values_class().serialize(values_queryset.all()), args.repeat)
+            assert drf == fast
+            rows = len(fast)
+            print(f'{name:<9} ModelSerializer {drf_time * 1000:8.1f} ms {rows / drf_time:10.0f} objects/s')
+            print(f'{name:<9} values()        {fast_time * 1000:8.1f} ms {rows / fast_time:10.0f} objects/s')
+
+            for renderer in (JSONRenderer(), FastJSONRenderer()):
+                label = 'orjson' if isinstance(renderer, FastJSONRenderer) and orjson else 'json'
+                _, render_time = timed(lambda: renderer.render({'results': fast}), args.repeat)
+                print(f'{name:<9} render {label:<8} {render_time * 1000:8.1f} ms {rows / render_time:10.0f} objects/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark of the shop listing: pages read from SQL versus the memory-mapped snapshot of the shop.
+
+Imports ``--goods`` goods into each of ``--shops`` shops and walks the first
+``--pages`` pages of one shop with both read paths, the catalog cache
+being emptied before every request. Run from the ``project`` directory:
+
+    python -m benchmarks.bench_snapshots --shops 5 --goods 20000
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.utils import QueryCounter, setup_django, synthetic_feed, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shops', type=int, default=5)
+    parser.add_argument('--goods', type=int, default=20_000)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.cache import caches
+    from rest_framework.test import APIClient
+    from backend.cache import CATALOG_CACHE
+    from backend.importer import CatalogImporter
+    from backend.models import Shop
+    from backend.snapshots import build_snapshot
+    from users.models import CustomUser
+
+    settings.ALLOWED_HOSTS = ['*']
+    settings.CATALOG_SNAPSHOT_DIR = tempfile.mkdtemp(prefix='snapshots-')
+    with test_database():
+        user = CustomUser.objects.create_user(email='bench@mail.ru', password='secret', type='shop')
+        for number in range(args.shops):
+            data = synthetic_feed(args.goods, shop=f'Shop {number}', seed=number)
+            shop = Shop.objects.create(name=data['shop'], user=user)
+            CatalogImporter(shop).run(data['categories'], data['goods'])
+
+        client = APIClient()
+
+        def walk():
+            url = f'/api/v1/products/?shop={shop.id}&page_size={args.page_size}'
+            pages = []
+            with QueryCounter() as counter:
+                for _ in range(args.pages):
+                    caches[CATALOG_CACHE].clear()
+                    pages.append(client.get(url).json())
+                    url = pages[-1]['next']
+                    if not url:
+                        break
+            return pages, counter
+
+        from_database, database = walk()
+        started = time.perf_counter()
+        build_snapshot(shop.id)
+        build_time = time.perf_counter() - started
+        from_snapshot, snapshot = walk()
+        assert from_snapshot == from_database
+
+        print(f'snapshot of {args.goods} goods built in {build_time * 1000:.1f} ms')
+        for name, counter in (('sql', database), ('snapshot', snapshot)):
+            requests = len(from_database)
+            print(f'{name:<9} {requests / counter.elapsed:8.0f} pages/s  {counter.count / requests:5.1f} queries/page  '
+                  f'{counter.duration * 1000 / requests:6.2f} ms in SQL/page')
+
+
+if __name__ == '__main__':
+    main()
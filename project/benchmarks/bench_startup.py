@@ -0,0 +1,105 @@
+"""
+Startup time of the application and of the application server.
+
+Measures, in fresh processes, how long loading the WSGI application takes
+and how long a server needs until it answers its first request. Run from the
+``project`` directory with the database of the settings migrated:
+
+    python -m benchmarks.bench_startup --repeat 5 --workers 1 4
+
+Gunicorn is measured with ``gunicorn.conf.py``; the development server is
+measured as the baseline.
+"""
+import argparse
+import importlib.util
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+LOAD_APP = 'import time; started = time.perf_counter(); ' \
+           'from retail_api.wsgi import application; print(time.perf_counter() - started)'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(command, port, env, path, timeout=60):
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(process.stderr.read().decode().strip().splitlines()[-1])
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=1).read()
+            except urllib.error.HTTPError:
+                pass
+            except OSError:
+                time.sleep(0.02)
+                continue
+            return time.perf_counter() - started
+        raise RuntimeError(f'no response in {timeout}s')
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+
+def report(name, timings):
+    print(f'{name:<28} median {statistics.median(timings) * 1000:8.0f} ms '
+          f'min {min(timings) * 1000:8.0f} ms max {max(timings) * 1000:8.0f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--path', default='/api/v1/products/')
+    args = parser.parse_args()
+
+    env = dict(os.environ, RUN_MIGRATIONS='0')
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'retail_api.settings')
+
+    report('load wsgi application', [
+        float(subprocess.run([sys.executable, '-c', LOAD_APP], env=env, capture_output=True, text=True,
+                             check=True).stdout)
+        for _ in range(args.repeat)
+    ])
+
+    def runserver(port):
+        return [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+
+    def gunicorn(port):
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}',
+                'retail_api.wsgi:application']
+
+    servers = [('runserver', runserver, {})]
+    if importlib.util.find_spec('gunicorn'):
+        servers += [(f'gunicorn {workers} workers', gunicorn, {'WEB_CONCURRENCY': str(workers)})
+                    for workers in args.workers]
+    else:
+        print('gunicorn is not installed, measuring the development server only')
+
+    for name, command, extra in servers:
+        try:
+            timings = []
+            for _ in range(args.repeat):
+                port = free_port()
+                timings.append(time_to_first_response(command(port), port, dict(env, **extra), args.path))
+        except RuntimeError as er:
+            print(f'{name:<28} failed: {er}')
+            continue
+        report(f'{name} first response', timings)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark of a stock and price sync: the bulk stock update versus a full import of the changed feed.
+
+Imports a shop of ``--goods`` goods, then changes the quantity and price of
+``--changed`` of them both ways. Run from the ``project`` directory:
+
+    python -m benchmarks.bench_stock --goods 50000 --changed 1000 10000
+"""
+import argparse
+import random
+
+from benchmarks.utils import QueryCounter, setup_django, synthetic_feed, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--goods', type=int, default=50_000)
+    parser.add_argument('--changed', type=int, nargs='+', default=[100, 1000, 10_000])
+    args = parser.parse_args()
+
+    setup_django()
+    from backend.importer import CatalogImporter
+    from backend.models import Shop
+    from backend.stock import update_stock
+    from users.models import CustomUser
+
+    with test_database():
+        user = CustomUser.objects.create_user(email='bench@mail.ru', password='secret', type='shop')
+        data = synthetic_feed(args.goods)
+        shop = Shop.objects.create(name=data['shop'], user=user)
+        CatalogImporter(shop).run(data['categories'], data['goods'])
+
+        rng = random.Random(0)
+        for changed in args.changed:
+            goods = rng.sample(data['goods'], min(changed, len(data['goods'])))
+            for good in goods:
+                good['quantity'] = rng.randint(0, 100)
+                good['price'] = good['price'] + 1
+            rows = [{'external_id': good['id'], 'quantity': good['quantity'], 'price': good['price']} for good in goods]
+
+            with QueryCounter() as bulk:
+                results = update_stock(shop, rows)
+            assert all(result['status'] == 'updated' for result in results)
+            with QueryCounter() as full:
+                CatalogImporter(shop).run(data['categories'], data['goods'])
+            for name, counter in (('stock update', bulk), ('full import', full)):
+                print(f'{changed:>6} changed  {name:<13} {counter.elapsed * 1000:9.1f} ms  {counter.count:6} queries')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""
+Load test of the API: scripted scenarios over a seeded catalog, with latency percentiles per endpoint.
+
+Seeds ``--shops`` shops of ``--goods`` goods, ``--buyers`` buyers and ``--orders``
+past orders into a throw-away database, then runs every scenario
+``--iterations`` times through the WSGI handler from ``--threads`` clients:
+
+- browse: catalog pages with search, ordering, parameter and shop filters, and their next pages;
+- basket: goods added to the basket of a buyer, then the basket listed;
+- confirm: a basket filled and confirmed;
+- upload: a feed served by a local stub queued and imported by the worker;
+- stock: stock and prices of a shop updated in bulk.
+
+Every endpoint is reported with p50/p95/p99 latency, req/s and SQL queries
+per request. ``--output`` saves the results as JSON; ``--compare`` prints the
+changes against a saved run and exits with 1 when an endpoint runs more
+queries or its p95 latency grew by more than ``--threshold``. Run from the
+``project`` directory:
+
+    python -m benchmarks.loadtest --output before.json
+    python -m benchmarks.loadtest --compare before.json --output after.json
+"""
+import argparse
+import datetime
+import json
+import math
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.seed import seed
+from benchmarks.utils import QueryCounter, feed_server, setup_django, synthetic_feed, test_database
+
+
+SCENARIOS = ('browse', 'basket', 'confirm', 'upload', 'stock')
+SEARCH_TERMS = ('товар 12', 'черный', 'model-42', 'shop 1', 'товр')
+STOCK_ROWS = 100
+
+
+def percentile(values, share):
+    """
+    Nearest-rank percentile of a non-empty list.
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+class Recorder:
+    """
+    Latency, SQL queries and status of every request, grouped by scenario and endpoint.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.scenarios = {}
+        self.lock = threading.Lock()
+
+    def record(self, scenario, endpoint, latency, queries, status):
+        name = f'{scenario}/{endpoint}'
+        with self.lock:
+            self.scenarios[name] = scenario
+            self.samples[name].append((latency, queries, status))
+
+    def results(self, durations):
+        results = {}
+        for endpoint, samples in self.samples.items():
+            latencies = [latency for latency, _, _ in samples]
+            statuses = defaultdict(int)
+            for _, _, status in samples:
+                statuses[str(status)] += 1
+            results[endpoint] = {
+                'scenario': self.scenarios[endpoint],
+                'requests': len(samples),
+                'errors': sum(count for status, count in statuses.items() if int(status) >= 500),
+                'statuses': dict(sorted(statuses.items())),
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+                'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+                'requests_per_second': round(len(samples) / durations[self.scenarios[endpoint]], 1),
+                'queries_per_request': round(sum(queries for _, queries, _ in samples) / len(samples), 2),
+            }
+        return dict(sorted(results.items()))
+
+
+class Session:
+    """
+    A client of one thread, authenticated with the token of the user it acts for.
+    """
+
+    def __init__(self, recorder):
+        from django.test import Client
+
+        self.client = Client()
+        self.recorder = recorder
+        self.scenario = None
+
+    def request(self, endpoint, method, path, token, data=None):
+        with QueryCounter() as counter:
+            response = getattr(self.client, method)(path, data, content_type='application/json',
+                                                    HTTP_AUTHORIZATION=f'Token {token}')
+        self.recorder.record(self.scenario, endpoint, counter.elapsed, counter.count, response.status_code)
+        return response
+
+
+class Scenarios:
+    """
+    The scripted scenarios; every method runs one iteration.
+    """
+
+    def __init__(self, data, tokens, feeds_url, feeds, upload_goods):
+        self.data = data
+        self.tokens = tokens
+        self.feeds_url = feeds_url
+        self.feeds = feeds
+        self.upload_goods = upload_goods
+        self.offers = [(product_id, shop_id) for product_id, shop_id, quantity in data['offers'] if quantity >= 10]
+        self.external_ids = self.shop_goods()
+        self.uploads = 0
+        self.lock = threading.Lock()
+
+    def shop_goods(self):
+        from backend.models import ProductInfo
+
+        goods = defaultdict(list)
+        for shop_id, external_id in ProductInfo.objects.values_list('shop_id', 'external_id'):
+            goods[shop_id].append(external_id)
+        return goods
+
+    def buyer(self, rng):
+        buyer = rng.choice(self.data['buyers'])
+        return buyer, self.tokens[buyer.id], self.data['contacts'][buyer.id]
+
+    def browse(self, session, rng):
+        token = self.tokens[rng.choice(self.data['buyers']).id]
+        endpoint, params = rng.choice([
+            ('products', {}),
+            ('products?ordering', {'ordering': rng.choice(['price_rrc', '-quantity', 'model', 'shop__name'])}),
+            ('products?q', {'q': rng.choice(SEARCH_TERMS)}),
+            ('products?param', {'param': rng.choice(['Цвет=черный', 'Встроенная память (Гб)>=256'])}),
+            ('products?shop', {'shop': rng.choice(self.data['shops']).id}),
+        ])
+        response = session.request(endpoint, 'get', '/api/v1/products/', token, params)
+        for _ in range(rng.randint(0, 3)):
+            if response.status_code != 200 or not response.json()['next']:
+                break
+            response = session.request(f'{endpoint}&cursor', 'get', response.json()['next'], token)
+
+    def fill_basket(self, session, rng, token, contact):
+        lines = rng.sample(self.offers, min(rng.randint(1, 3), len(self.offers)))
+        session.request('add_order_items', 'post', '/api/v1/add_order_items/', token, {
+            'contact': contact.id,
+            'order_items': [{'product': {'id': product_id}, 'quantity': 1, 'shop': shop_id}
+                            for product_id, shop_id in lines],
+        })
+
+    def basket(self, session, rng):
+        _, token, contact = self.buyer(rng)
+        self.fill_basket(session, rng, token, contact)
+        session.request('basket', 'get', '/api/v1/basket', token)
+
+    def confirm(self, session, rng):
+        from backend.models import Order
+
+        buyer, token, contact = self.buyer(rng)
+        self.fill_basket(session, rng, token, contact)
+        order_id = Order.objects.filter(user=buyer, status='new').values_list('id', flat=True).first()
+        if order_id is not None:
+            session.request('confirm', 'patch', f'/api/v1/confirm/{order_id}/', token, {'status': 'confirm'})
+
+    def upload(self, session, rng):
+        import yaml
+        from backend.jobs import claim_job, run_job
+
+        with self.lock:
+            self.uploads += 1
+            number = self.uploads
+        shop_number = rng.randrange(len(self.data['shops']))
+        feed = synthetic_feed(self.upload_goods, shop=f'Shop {shop_number}', seed=number)
+        self.feeds[f'/feed-{number}.yaml'] = yaml.safe_dump(feed, allow_unicode=True, sort_keys=False).encode()
+
+        token = self.tokens[self.data['shop_users'][shop_number].id]
+        session.request('upload', 'post', '/api/v1/upload/', token, {'url': f'{self.feeds_url}/feed-{number}.yaml'})
+        # the work of import_worker, which cannot run its command outside the main thread
+        with QueryCounter() as counter:
+            while (job := claim_job()) is not None:
+                run_job(job)
+        session.recorder.record(session.scenario, 'import', counter.elapsed, counter.count, 200)
+
+    def stock(self, session, rng):
+        shop_number = rng.randrange(len(self.data['shops']))
+        goods = self.external_ids[self.data['shops'][shop_number].id]
+        rows = [{'external_id': external_id, 'quantity': rng.randint(10, 100),
+                 'price_rrc': rng.randint(1_000, 200_000)}
+                for external_id in rng.sample(goods, min(STOCK_ROWS, len(goods)))]
+        session.request('stock', 'patch', '/api/v1/stock/', self.tokens[self.data['shop_users'][shop_number].id],
+                        {'items': rows})
+
+
+def run(scenarios, names, iterations, threads, recorder, seed_value):
+    """
+    Run every scenario ``iterations`` times from ``threads`` clients.
+
+    Returns:
+        dict: Wall time of every scenario in seconds.
+    """
+    from django.db import connections
+
+    local = threading.local()
+    durations = {}
+    closing = threading.Barrier(threads)
+
+    def close_connections(_):
+        # every thread of the pool waits for the others, so each one closes its own connection
+        closing.wait()
+        connections.close_all()
+
+    def iteration(scenario, number):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = Session(recorder)
+        session.scenario = scenario
+        getattr(scenarios, scenario)(session, random.Random(f'{seed_value}-{scenario}-{number}'))
+
+    for name in names:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda number: iteration(name, number), range(iterations)))
+            list(pool.map(close_connections, range(threads)))
+        durations[name] = time.perf_counter() - started
+    return durations
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def report(results):
+    print(f'{"endpoint":<32} {"requests":>8} {"errors":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+          f'{"req/s":>8} {"queries":>7}')
+    for endpoint, result in results.items():
+        print(f'{endpoint:<32} {result["requests"]:>8} {result["errors"]:>6} {result["p50_ms"]:>8.1f} '
+              f'{result["p95_ms"]:>8.1f} {result["p99_ms"]:>8.1f} {result["requests_per_second"]:>8.1f} '
+              f'{result["queries_per_request"]:>7.1f}')
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the changes of p95 latency, req/s and queries against a saved run.
+
+    Returns:
+        list: The endpoints whose p95 latency grew by more than ``threshold``, or which run more queries.
+    """
+    print(f'\nagainst {baseline.get("commit") or "the baseline"} ({baseline.get("date", "")}):')
+    regressions = []
+    for endpoint, result in results.items():
+        before = baseline['endpoints'].get(endpoint)
+        if before is None:
+            continue
+        change = result['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+        throughput = result['requests_per_second'] / before['requests_per_second'] - 1 \
+            if before['requests_per_second'] else 0.0
+        regressed = change > threshold or result['queries_per_request'] > before['queries_per_request']
+        if regressed:
+            regressions.append(endpoint)
+        print(f'{endpoint:<32} p95 {change:+8.1%}  req/s {throughput:+8.1%}  '
+              f'queries {before["queries_per_request"]:.1f} -> {result["queries_per_request"]:.1f}'
+              f'{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shops', type=int, default=5)
+    parser.add_argument('--goods', type=int, default=2000, help='goods per shop')
+    parser.add_argument('--buyers', type=int, default=20)
+    parser.add_argument('--orders', type=int, default=200, help='past orders')
+    parser.add_argument('--upload-goods', type=int, default=500, help='goods of an uploaded feed')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--iterations', type=int, default=200, help='iterations of every scenario')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--no-cache', action='store_true', help='disable the catalog cache')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 growth reported as a regression')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import override_settings
+    from backend.cache import CATALOG_CACHE
+    from users.authentication import issue_token
+
+    caches = dict(settings.CACHES)
+    if args.no_cache:
+        caches[CATALOG_CACHE] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    recorder = Recorder()
+    feeds = {}
+    with override_settings(ALLOWED_HOSTS=['*'], CACHES=caches), test_database(), feed_server(feeds) as feeds_url:
+        started = time.perf_counter()
+        data = seed(args.shops, args.goods, args.buyers, args.orders, args.seed)
+        tokens = {user.id: issue_token(user)[0] for user in data['shop_users'] + data['buyers']}
+        print(f'seeded {args.shops} shops x {args.goods} goods, {args.buyers} buyers, {args.orders} orders '
+              f'in {time.perf_counter() - started:.1f}s on {connection.vendor}')
+
+        scenarios = Scenarios(data, tokens, feeds_url, feeds, args.upload_goods)
+        durations = run(scenarios, args.scenarios, args.iterations, args.threads, recorder, args.seed)
+        results = recorder.results(durations)
+        vendor = connection.vendor
+
+    report(results)
+    regressions = []
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            'commit': git_commit(),
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'database': vendor,
+            'arguments': vars(args),
+            'durations': {name: round(duration, 3) for name, duration in durations.items()},
+            'endpoints': results,
+        }, indent=2, ensure_ascii=False) + '\n')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Data generator of the benchmarks: shops with their catalogs, buyers and past orders.
+"""
+import random
+
+from benchmarks.utils import synthetic_feed
+
+
+PAST_ORDER_STATUSES = ('confirmed', 'assembled', 'sent', 'delivered', 'canceled')
+
+
+def seed(shops=5, goods=2000, buyers=20, orders=200, seed=0):
+    """
+    Fill the database with a catalog and its customers.
+
+    Every shop gets its own shop user and a feed of ``goods`` goods imported
+    with ``CatalogImporter``, which creates the categories, products and
+    parameters. Every buyer gets a contact, and ``orders`` closed orders of
+    one to five lines are spread over the buyers. Users get no password: the
+    benchmarks authenticate them with tokens.
+
+    Returns:
+        dict: ``shops`` (Shop), ``shop_users`` and ``buyers`` (CustomUser) in the same order,
+        ``contacts`` (Contact by buyer id) and ``offers`` (``(product_id, shop_id, quantity)`` of every good).
+    """
+    from django.contrib.auth.hashers import make_password
+    from backend.importer import CatalogImporter
+    from backend.models import Shop, ProductInfo, Order, OrderItem
+    from users.models import CustomUser, Contact
+
+    rng = random.Random(seed)
+    users = CustomUser.objects.bulk_create(
+        [CustomUser(email=f'shop{number}@bench.ru', type='shop', is_active=True, password=make_password(None))
+         for number in range(shops)] +
+        [CustomUser(email=f'buyer{number}@bench.ru', type='buyer', is_active=True, password=make_password(None))
+         for number in range(buyers)]
+    )
+    shop_users, buyer_users = users[:shops], users[shops:]
+
+    created_shops = []
+    for number, user in enumerate(shop_users):
+        feed = synthetic_feed(goods, shop=f'Shop {number}', seed=seed + number)
+        shop = Shop.objects.create(name=feed['shop'], user=user)
+        CatalogImporter(shop).run(feed['categories'], feed['goods'])
+        created_shops.append(shop)
+
+    contacts = {contact.user_id: contact for contact in Contact.objects.bulk_create([
+        Contact(user=user, city='Москва', street='Тверская', house=str(number + 1), phone='+70000000000')
+        for number, user in enumerate(buyer_users)
+    ])}
+    offers = list(ProductInfo.objects.order_by('pk').values_list('product_id', 'shop_id', 'quantity', 'price_rrc'))
+
+    if buyer_users and offers:
+        past_orders = Order.objects.bulk_create([
+            Order(user=user, contact=contacts[user.id], status=rng.choice(PAST_ORDER_STATUSES))
+            for user in (rng.choice(buyer_users) for _ in range(orders))
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, shop_id=shop_id, quantity=rng.randint(1, 3),
+                      unit_price=price)
+            for order in past_orders
+            for product_id, shop_id, _, price in rng.sample(offers, min(rng.randint(1, 5), len(offers)))
+        ], batch_size=5000)
+
+    return {
+        'shops': created_shops,
+        'shop_users': shop_users,
+        'buyers': buyer_users,
+        'contacts': contacts,
+        'offers': [(product_id, shop_id, quantity) for product_id, shop_id, quantity, _ in offers],
+    }
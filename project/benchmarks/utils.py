@@ -0,0 +1,132 @@
+import contextlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import django
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'retail_api.settings')
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database(verbosity=0):
+    """
+    Create throw-away test databases for the duration of a benchmark,
+    so that seeded data never touches the configured database.
+    """
+    from django.test.utils import setup_databases, teardown_databases
+
+    old_config = setup_databases(verbosity=verbosity, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=verbosity)
+
+
+class QueryCounter:
+    """
+    Count queries executed on a connection without keeping their SQL,
+    so that it stays cheap for imports issuing huge bulk statements.
+    """
+
+    def __init__(self, using='default'):
+        from django.db import connections
+
+        self.connection = connections[using]
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        self._wrapper.__exit__(*exc_info)
+
+
+def synthetic_feed(goods, categories=20, parameters=8, shop='Benchmark shop', seed=0):
+    """
+    Build a price list shaped like ``shop1.yaml`` with the given number of goods.
+    """
+    rnd = random.Random(seed)
+    category_ids = [100 + i for i in range(categories)]
+    colors = ['черный', 'белый', 'красный', 'синий', 'золотистый', 'серебристый']
+    return {
+        'shop': shop,
+        'categories': [{'id': category_id, 'name': f'Категория {category_id}'} for category_id in category_ids],
+        'goods': [
+            {
+                'id': 1_000_000 + i,
+                'category': rnd.choice(category_ids),
+                'model': f'vendor/model-{i % 5000}',
+                'name': f'Товар {i} ({rnd.choice(colors)})',
+                'price': rnd.randint(1_000, 200_000),
+                'price_rrc': rnd.randint(1_000, 220_000),
+                'quantity': rnd.randint(0, 100),
+                'parameters': {
+                    'Цвет': rnd.choice(colors),
+                    'Встроенная память (Гб)': rnd.choice([32, 64, 128, 256, 512]),
+                    **{f'Параметр {p}': rnd.randint(1, 50) for p in range(max(parameters - 2, 0))},
+                },
+            }
+            for i in range(goods)
+        ],
+    }
+
+
+@contextlib.contextmanager
+def feed_server(feeds, delay=0.0):
+    """
+    Serve feeds from a local HTTP server standing in for the suppliers.
+
+    Parameters:
+        feeds (dict): Maps a path such as ``/shop1.yaml`` to the bytes of the feed.
+        delay (float): Seconds every response waits, to emulate slow suppliers.
+
+    Yields:
+        str: The base URL of the server.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            body = feeds.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-yaml')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 256
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
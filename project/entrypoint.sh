@@ -0,0 +1,15 @@
+#!/bin/sh
+# Production entry point: apply migrations once, then replace the shell with gunicorn.
+# APP_INTERFACE=asgi serves retail_api.asgi with uvicorn workers instead of WSGI.
+set -e
+cd "$(dirname "$0")"
+
+if [ "${RUN_MIGRATIONS:-1}" = "1" ]; then
+    python manage.py migrate --noinput
+fi
+
+if [ "${APP_INTERFACE:-wsgi}" = "asgi" ]; then
+    export WEB_WORKER_CLASS="${WEB_WORKER_CLASS:-uvicorn_worker.UvicornWorker}"
+    exec gunicorn -c gunicorn.conf.py retail_api.asgi:application
+fi
+exec gunicorn -c gunicorn.conf.py retail_api.wsgi:application
@@ -0,0 +1,38 @@
+"""
+Gunicorn settings of the production server, started by ``entrypoint.sh``.
+
+Every value can be overridden with an environment variable. The application
+is loaded once in the master process and shared by the forked workers, so
+``HUP`` restarts the workers with the code already loaded: new code needs a
+restart of the container, or ``USR2`` to start a new master and then ``QUIT``
+to the old one. ``WEB_PRELOAD=0`` loads the application in every worker
+instead, and ``HUP`` reloads the code.
+"""
+import multiprocessing
+import os
+
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# keep DB_POOL_MAX_SIZE at least equal to the number of threads of a worker
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+
+preload_app = os.getenv('WEB_PRELOAD', '1') == '1'
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('WEB_KEEPALIVE', 5))
+# recycle workers now and then so a slow leak never grows unbounded
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('WEB_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # connections must never be shared between processes
+    from django.db import connections
+
+    connections.close_all()
@@ -0,0 +1,198 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and, for a ``METRICS_SAMPLE_RATE``
+share of them, counts the SQL queries with their time and the rendering
+time of the response. ``metrics_view`` exposes the histograms of this
+process; with several workers every worker keeps its own.
+"""
+import bisect
+import contextlib
+import contextvars
+import heapq
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SLOW_QUERIES_LOGGED = 5
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per combination of labels.
+    """
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, values, amount):
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                # a counter per bucket, then +Inf, the sum and the count
+                series = self.series[values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[bisect.bisect_left(self.buckets, amount)] += 1
+            series[-2] += amount
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {values: list(counts) for values, counts in self.series.items()}
+        for values, counts in sorted(series.items()):
+            labels = ','.join(f'{label}="{value}"' for label, value in zip(self.labels, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {counts[-2]}')
+            lines.append(f'{self.name}_count{{{labels}}} {counts[-1]}')
+        return lines
+
+
+request_duration = Histogram('retail_http_request_duration_seconds', 'Time to respond to a request.',
+                             ('view', 'method', 'status'), LATENCY_BUCKETS)
+db_duration = Histogram('retail_db_duration_seconds', 'Time spent in SQL queries per sampled request.',
+                        ('view', 'method'), LATENCY_BUCKETS)
+db_queries = Histogram('retail_db_queries', 'SQL queries per sampled request.', ('view', 'method'), QUERY_BUCKETS)
+render_duration = Histogram('retail_render_duration_seconds', 'Time to render the response of a sampled request.',
+                            ('view', 'method'), LATENCY_BUCKETS)
+HISTOGRAMS = (request_duration, db_duration, db_queries, render_duration)
+
+
+class QueryRecorder:
+    """
+    Execute wrapper counting the queries of a request and keeping the slowest ones.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            entry = (duration, self.count, sql)
+            if len(self.slowest) < SLOW_QUERIES_LOGGED:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+
+# the query recorder of the sampled request being served in this context
+_recorder = contextvars.ContextVar('metrics_query_recorder', default=None)
+
+
+@contextlib.contextmanager
+def record_queries():
+    """
+    Count the queries of the connections of this thread for the sampled request being served, if any.
+
+    The recorder follows the request in a context variable, so code serving
+    the request on another thread than the middleware can install it there.
+    """
+    recorder = _recorder.get()
+    with contextlib.ExitStack() as stack:
+        if recorder is not None:
+            for connection in connections.all():
+                if recorder not in connection.execute_wrappers:
+                    stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+class MetricsMiddleware:
+    """
+    Record the latency of every request, tagged by the URL name of its view.
+
+    Sampled requests also record their SQL queries and rendering time, and
+    are logged with their slowest queries when they take longer than
+    ``METRICS_SLOW_REQUEST_MS``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = random.random() < settings.METRICS_SAMPLE_RATE
+        recorder = QueryRecorder() if sampled else None
+        started = time.perf_counter()
+        if sampled:
+            request._metrics_render = 0.0
+        token = _recorder.set(recorder)
+        try:
+            with record_queries():
+                response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        values = (match.view_name if match else 'unmatched', request.method)
+        request_duration.observe(values + (str(response.status_code),), duration)
+        if sampled:
+            db_duration.observe(values, recorder.duration)
+            db_queries.observe(values, recorder.count)
+            render_duration.observe(values, request._metrics_render)
+            if duration * 1000 >= settings.METRICS_SLOW_REQUEST_MS:
+                self.log_slow(request, values[0], duration, recorder)
+        return response
+
+    def process_template_response(self, request, response):
+        if hasattr(request, '_metrics_render'):
+            started = time.perf_counter()
+
+            def rendered(response):
+                request._metrics_render = time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def log_slow(request, view, duration, recorder):
+        queries = '\n'.join(f'  {query_duration * 1000:.1f} ms: {sql[:300]}'
+                            for query_duration, number, sql in sorted(recorder.slowest, reverse=True))
+        logger.warning('Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms\n%s',
+                       request.method, request.get_full_path(), view, duration * 1000,
+                       recorder.count, recorder.duration * 1000, queries)
+
+
+def counters():
+    from backend.cache import stats
+
+    lines = ['# HELP retail_catalog_cache_total Catalog cache lookups of this process.',
+             '# TYPE retail_catalog_cache_total counter']
+    lines += [f'retail_catalog_cache_total{{result="{result}"}} {count}' for result, count in sorted(stats.items())]
+    return lines
+
+
+def metrics_view(request):
+    """
+    The metrics of this process, for Prometheus to scrape.
+
+    When ``METRICS_TOKEN`` is set, it has to be sent as a bearer token.
+    """
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=403)
+    lines = [line for histogram in HISTOGRAMS for line in histogram.render()] + counters()
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -19,11 +20,16 @@ ALLOWED_HOSTS = [
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# USERNAME_FIELD is the email, so the model backend authenticates by email with a single password check
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
-    'users.backends.EmailBackend',
 ]
 
+# Tokens issued by /api/v1/login/ and the in-process cache of validated tokens
+AUTH_TOKEN_LIFETIME = timedelta(days=int(os.getenv('AUTH_TOKEN_LIFETIME_DAYS', 30)))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10_000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 60))
+
 
 # Application definition
 INSTALLED_APPS = [
@@ -33,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'django_filters',
@@ -42,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'retail_api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,6 +59,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request metrics served at /metrics: SQL queries and rendering are only measured for
+# METRICS_SAMPLE_RATE of the requests, sampled requests slower than METRICS_SLOW_REQUEST_MS are logged
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0.1))
+METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', 500))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 ROOT_URLCONF = 'retail_api.urls'
 
 TEMPLATES = [
@@ -75,16 +89,45 @@ WSGI_APPLICATION = 'retail_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('POSTGRES_DB', 'retail_api'),
-        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
-        'PORT': os.getenv('POSTGRES_PORT', '5432'),
-        'USER': os.getenv('POSTGRES_USER', 'postgres'),
-        'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'secret')
+# DB_ENGINE=sqlite switches to a local SQLite file (SQLITE_PATH) for development and benchmarks.
+# PostgreSQL connections are kept open for DB_CONN_MAX_AGE seconds and checked before reuse;
+# with DB_POOL=1 every worker process keeps a psycopg pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+# connections instead (size it to the number of threads of a worker).
+DB_ENGINE = os.getenv('DB_ENGINE', 'postgresql')
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'retail_api'),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'secret'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.getenv('DB_POOL', '').lower() in ('1', 'true', 'yes'):
+        # pooled connections are returned to the pool after every request
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 4)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
 
 
 # Password validation
@@ -106,10 +149,60 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'users.authentication.TokenAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
 }
 
+# Cache of the product listing: 'locmem' (LRU bounded by CATALOG_CACHE_MAX_ENTRIES per process),
+# 'file' (CATALOG_CACHE_LOCATION is a directory) or 'redis' (CATALOG_CACHE_LOCATION is a redis:// URL)
+CATALOG_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CATALOG_CACHE_BACKEND = os.getenv('CATALOG_CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': CATALOG_CACHE_BACKENDS[CATALOG_CACHE_BACKEND],
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': int(os.getenv('CATALOG_CACHE_TIMEOUT', 600)),
+        'OPTIONS': {} if CATALOG_CACHE_BACKEND == 'redis' else {
+            'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+# Page size of the cursor-paginated lists and the upper bound for the `page_size` query parameter
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 500))
+
+# Seconds an upload may stay running; jobs left running longer, by a worker which crashed or was killed,
+# are marked as failed so their feeds can be queued again
+IMPORT_JOB_TIMEOUT = int(os.getenv('IMPORT_JOB_TIMEOUT', 3600))
+
+# PostgreSQL text search configuration of the product search (`q` parameter of the catalog)
+CATALOG_SEARCH_CONFIG = os.getenv('CATALOG_SEARCH_CONFIG', 'russian')
+
+# Directory of the per-shop catalog snapshots, rebuilt after every import and memory-mapped by the
+# listing of a single shop (`shop` parameter of the catalog); an empty value turns them off
+CATALOG_SNAPSHOT_DIR = os.getenv('CATALOG_SNAPSHOT_DIR', str(BASE_DIR / 'snapshots'))
+# Seconds a snapshot waits after an order or a stock update before it is rebuilt, collecting the
+# further changes of the shop; 0 rebuilds it when the change commits
+CATALOG_SNAPSHOT_DELAY = float(os.getenv('CATALOG_SNAPSHOT_DELAY', 5))
+
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_PORT = os.getenv('EMAIL_PORT')
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include('users.urls')),
     path('api/v1/', include('backend.urls', namespace='backend')),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,11 +1,68 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 import base64
-
-from backend.models import Shop, Product, ProductInfo, Order, OrderItem
+from pathlib import Path
+
+from benchmarks.utils import feed_server
+from backend.cache import CATALOG_CACHE, bump_catalog_version
+from backend.jobs import arun_job
+from backend.fast_serializers import ListItemsValues, ProductInfoValues
+from backend.orders import OutOfStock, confirm_order
+from backend.renderers import FastJSONRenderer
+from backend import snapshots
+from backend.snapshots import _schedule, _scheduled, build_snapshot
+from backend.serializers import ListItemsSerializer, ProductInfoSerializer
+from backend.models import Shop, Product, ProductInfo, Order, OrderItem, ImportJob
 from users.models import CustomUser, Contact
 
 
+REPOSITORY = Path(__file__).resolve().parents[3]
+
+
+@pytest.fixture(autouse=True)
+def catalog_cache():
+    """
+    Fixture that empties the catalog cache, which outlives the test database.
+    """
+    caches[CATALOG_CACHE].clear()
+    yield caches[CATALOG_CACHE]
+    caches[CATALOG_CACHE].clear()
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(settings, tmp_path):
+    """
+    Fixture that keeps the catalog snapshots written by the tests in a temporary directory.
+    """
+    settings.CATALOG_SNAPSHOT_DIR = str(tmp_path / 'snapshots')
+    return settings.CATALOG_SNAPSHOT_DIR
+
+
+@pytest.fixture
+def feed_url():
+    """
+    Fixture that serves the feeds of the tests (``shop1.yaml``, and ``README.md``
+    as a broken one) from a local HTTP server standing in for the shops.
+    """
+    files = {f'/{name}': (REPOSITORY / name).read_bytes() for name in ('shop1.yaml', 'README.md')}
+    with feed_server(files) as url:
+        yield url
+
 
 @pytest.fixture
 def client():
@@ -48,13 +105,14 @@ def user():
 
 
 @pytest.fixture
-def products(client):
+def products(client, feed_url):
     response = client.post('/api/v1/upload/', data={
-        'url': 'https://raw.githubusercontent.com/BroadName/retail_api/refs/heads/main/shop1.yaml',
+        'url': f'{feed_url}/shop1.yaml',
     }, headers={
         'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
         'Content-Type': 'application/json'
     })
+    call_command('import_worker', '--burst')
     products = Product.objects.all()
     return products
 
@@ -72,14 +130,14 @@ def encode_base64(string: str) -> str:
     return base64.b64encode(string.encode()).decode()
 
 @pytest.mark.parametrize(
-    ['quantity', 'status_code', 'shop_id', 'product_1_id', 'product_2_id'],
+    ['quantity', 'status_code'],
     (
-        (1, 201, 1, 1, 2 ),
-        (100, 403, 2, 15, 16 ),
+        (1, 201),
+        (100, 403),
     )
 )
 @pytest.mark.django_db
-def test_create_delete_order(client, user, contact, products, quantity, status_code, shop_id, product_1_id, product_2_id):
+def test_create_delete_order(client, user, contact, products, quantity, status_code):
     """
     Tests the creation of a new order.
 
@@ -91,7 +149,9 @@ def test_create_delete_order(client, user, contact, products, quantity, status_c
     retrieving the basket of the user.
     """
 
-    #shop_id = products.first().product_info.first().shop_id
+    # the ids depend on the sequences of the database, so they are taken from the imported goods
+    (product_1_id, shop_id), (product_2_id, _) = ProductInfo.objects.order_by('product_id').values_list(
+        'product_id', 'shop_id')[:2]
 
     response = client.post('/api/v1/add_order_items/',
                           data={
@@ -142,9 +202,9 @@ def test_create_delete_order(client, user, contact, products, quantity, status_c
         assert order.orderitem_set.count() == 2
 
         assert response_1.status_code == 200
-        assert basket[0].get('order') == 1
-        assert basket[0].get('product').get('id') == 2
-        assert basket[1].get('product').get('id') == 1
+        assert basket[0].get('order') == order.id
+        assert basket[0].get('product').get('id') == product_2_id
+        assert basket[1].get('product').get('id') == product_1_id
         assert basket[0].get('quantity') == 1
 
         response_to_delete = client.delete('/api/v1/delete_order_item/{100}/', headers={
@@ -153,13 +213,14 @@ def test_create_delete_order(client, user, contact, products, quantity, status_c
         })
         assert response_to_delete.status_code == 404
 
-        response_to_delete = client.delete('/api/v1/delete_order_item/1/', headers={
+        item_id = order.orderitem_set.get(product_id=product_1_id).id
+        response_to_delete = client.delete(f'/api/v1/delete_order_item/{item_id}/', headers={
             'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
             'Content-Type': 'application/json'
         })
         assert response_to_delete.status_code == 204
 
-        response_to_confirm = client.patch('/api/v1/confirm/1/',
+        response_to_confirm = client.patch(f'/api/v1/confirm/{order.id}/',
                                            data = {
                                                     "status": "confirm"
                                            },
@@ -173,20 +234,167 @@ def test_create_delete_order(client, user, contact, products, quantity, status_c
         assert order.status == 'confirmed'
 
 @pytest.mark.django_db
-def test_upload(client, user):
+def test_order_item_not_sold(user, contact, products):
+    order = Order.objects.create(user=user, contact=contact, status='new')
+    product_info = ProductInfo.objects.order_by('pk').first()
+    other_shop = Shop.objects.create(name='Другой магазин')
+
+    with pytest.raises(ValidationError, match='is not sold by shop'):
+        OrderItem.objects.create(order=order, product_id=product_info.product_id, shop=other_shop, quantity=1)
+    assert OrderItem.objects.create(order=order, product_id=product_info.product_id, shop_id=product_info.shop_id,
+                                    quantity=2).total_price == 2 * product_info.price_rrc
+
+
+@pytest.mark.django_db
+def test_upload(client, user, feed_url):
     response = client.post('/api/v1/upload/', data={
-        'url': 'https://raw.githubusercontent.com/BroadName/retail_api/refs/heads/main/shop1.yaml',
+        'url': f'{feed_url}/shop1.yaml',
     }, headers={
         'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
         'Content-Type': 'application/json'
     })
+    assert response.status_code == 202
+    assert not Product.objects.exists()
+
+    call_command('import_worker', '--burst')
+    job_response = client.get(response.json()['status_url'], headers={
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+        'Content-Type': 'application/json'
+    })
+    job = job_response.json()
     shop = Shop.objects.get(name='Связной')
     products = Product.objects.all().count()
 
-    assert response.status_code == 200
+    assert job_response.status_code == 200
+    assert job['status'] == 'done'
+    assert job['processed'] == 14
+    assert job['summary']['product_infos']['inserted'] == 14
     assert shop.name == 'Связной'
     assert products == 14
 
+    # the same feed again is recognised by its digest and not imported
+    response = client.post('/api/v1/upload/', data={
+        'url': f'{feed_url}/shop1.yaml',
+    }, headers={
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+        'Content-Type': 'application/json'
+    })
+    call_command('import_worker', '--burst')
+    job = ImportJob.objects.get(id=response.json()['job_id'])
+
+    assert job.status == 'done'
+    assert job.summary in ({'skipped': 'same digest'}, {'skipped': 'not modified'})
+
+
+@pytest.mark.django_db
+def test_upload_failed_job(client, user, feed_url):
+    response = client.post('/api/v1/upload/', data={
+        'url': f'{feed_url}/README.md',
+        'format': 'csv',
+    }, headers={
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+        'Content-Type': 'application/json'
+    })
+    call_command('import_worker', '--burst')
+    job = client.get(f'/api/v1/upload/{response.json()["job_id"]}/', headers={
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+        'Content-Type': 'application/json'
+    }).json()
+
+    assert response.status_code == 202
+    assert job['status'] == 'failed'
+    assert job['error'] == "KeyError: 'shop'"
+    assert not Shop.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_concurrently(client, user, feed_url):
+    urls = [
+        f'{feed_url}/shop1.yaml',
+        f'{feed_url}/README.md',
+    ]
+    job_ids = [client.post('/api/v1/upload/', data={'url': url, 'format': 'csv' if url.endswith('.md') else ''},
+                           headers={
+                               'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+                               'Content-Type': 'application/json'
+                           }).json()['job_id'] for url in urls]
+    call_command('import_worker', '--burst', '--concurrency', '4')
+    done, failed = (ImportJob.objects.get(id=job_id) for job_id in job_ids)
+
+    assert done.status == 'done'
+    assert done.summary['product_infos']['inserted'] == 14
+    assert failed.status == 'failed'
+    assert failed.error == "KeyError: 'shop'"
+    assert Product.objects.count() == 14
+
+
+@pytest.mark.django_db
+def test_stale_jobs(user, settings):
+    settings.IMPORT_JOB_TIMEOUT = 60
+    stale, running = (ImportJob.objects.create(user=user, url='http://example.com/feed.yaml', status='running',
+                                               started=timezone.now() - timedelta(seconds=seconds))
+                      for seconds in (120, 10))
+    call_command('import_worker', '--burst')
+    stale.refresh_from_db()
+    running.refresh_from_db()
+
+    assert stale.status == 'failed'
+    assert stale.error == 'Timed out after 60 s'
+    assert running.status == 'running'
+
+    call_command('refresh_feeds', 'http://example.com/feed.yaml', '--user', user.email, '--enqueue-only')
+    assert ImportJob.objects.filter(status='queued').count() == 0
+
+
+@pytest.mark.django_db
+def test_async_job_database_error(user, monkeypatch):
+    class BrokenQuerySet:
+        def first(self):
+            raise DatabaseError('connection lost')
+
+        async def afirst(self):
+            raise DatabaseError('connection lost')
+
+    monkeypatch.setattr('backend.jobs.synced_shop', lambda job: BrokenQuerySet())
+    job = ImportJob.objects.create(user=user, url='http://example.com/feed.yaml', status='running',
+                                   started=timezone.now())
+    async_to_sync(arun_job)(job)
+    job.refresh_from_db()
+
+    assert job.status == 'failed'
+    assert 'connection lost' in job.error
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_upload(client, user, feed_url):
+    url = f'{feed_url}/shop1.yaml'
+    response = client.post('/api/v1/upload/batch/', data={'feeds': [url, {'url': 'not a url'}]}, headers={
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+    }, format='json')
+
+    assert response.status_code == 400
+    assert list(response.json()['Error']) == ['1']
+    assert not ImportJob.objects.exists()
+
+    response = client.post('/api/v1/upload/batch/', data={'feeds': [url, {'url': url, 'format': 'yaml'}]}, headers={
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+    }, format='json')
+    jobs = response.json()['jobs']
+    call_command('import_worker', '--burst', '--concurrency', '4')
+
+    assert response.status_code == 202
+    assert len(jobs) == 2
+    assert set(ImportJob.objects.values_list('status', flat=True)) == {'done'}
+    assert Product.objects.count() == 14
+
+    # the nightly refresh finds the feed unchanged
+    call_command('refresh_feeds')
+    job = ImportJob.objects.latest('dt')
+
+    assert ImportJob.objects.count() == 3
+    assert job.status == 'done'
+    assert job.summary in ({'skipped': 'same digest'}, {'skipped': 'not modified'})
+
 
 @pytest.mark.django_db
 def test_get_products(client, user, products):
@@ -197,3 +405,516 @@ def test_get_products(client, user, products):
 
     assert response.status_code == 200
     assert products.count() == Product.objects.all().count()
+
+
+@pytest.mark.parametrize('ordering', ['-model', 'price_rrc', '-quantity', 'shop__name'])
+@pytest.mark.django_db
+def test_products_pagination(client, user, products, settings, ordering):
+    settings.API_MAX_PAGE_SIZE = 4
+    url = f'/api/v1/products/?ordering={ordering}&page_size=100'
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response.json())
+        url = pages[-1]['next']
+
+    expected = ProductInfo.objects.order_by(ordering, '-pk' if ordering.startswith('-') else 'pk')
+    results = [item for page in pages for item in page['results']]
+
+    assert [len(page['results']) for page in pages] == [4, 4, 4, 2]
+    assert [(item['product']['id'], item['shop']['id']) for item in results] == \
+        [(info.product_id, info.shop_id) for info in expected]
+    assert pages[0]['previous'] is None
+
+    previous = client.get(pages[1]['previous']).json()
+    assert previous['results'] == pages[0]['results']
+
+
+@pytest.mark.parametrize(
+    ['query', 'models'],
+    (
+        ('iphone xr', {'apple/iphone/xr'}),
+        ('Смартфон черный', {'apple/iphone/xr'}),
+        ('телевизоры 55"', {'lg/oled-cx', 'tcl/6-series'}),
+    )
+)
+@pytest.mark.django_db
+def test_search_products(client, user, products, query, models):
+    response = client.get('/api/v1/products/', {'q': query})
+
+    assert response.status_code == 200
+    assert {item['model'] for item in response.json()['results']} == models
+
+
+@pytest.mark.parametrize(
+    ['predicates', 'count'],
+    (
+        (['Цвет=черный'], 1),
+        (['Встроенная память (Гб)>=512'], 1),
+        (['Встроенная память (Гб)<512', 'Цвет!=красный'], 2),
+        (['Диагональ (дюйм)>6.1'], 1),
+        (['Цвет=оранжевый'], 0),
+    )
+)
+@pytest.mark.django_db
+def test_filter_products_by_parameters(client, user, products, predicates, count):
+    response = client.get('/api/v1/products/', {'param': predicates})
+
+    assert response.status_code == 200
+    assert len(response.json()['results']) == count
+
+
+@pytest.mark.django_db
+def test_product_facets(client, user, products):
+    response = client.get('/api/v1/products/', {'facets': 1})
+
+    assert response.status_code == 200
+    assert response.json()['facets']['Встроенная память (Гб)'] == {'256': 3, '512': 1}
+
+    response = client.get('/api/v1/products/', {'facets': 1, 'param': 'Встроенная память (Гб)=256'})
+
+    assert response.status_code == 200
+    assert response.json()['facets']['Цвет'] == {'красный': 1, 'синий': 1, 'черный': 1}
+
+    response = client.get('/api/v1/products/', {'param': 'Цвет'})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_products_cache(client, user, products, django_capture_on_commit_callbacks):
+    response = client.get('/api/v1/products/', {'ordering': 'model'})
+
+    assert response.status_code == 200
+    assert response['X-Cache'] == 'MISS'
+
+    cached = client.get('/api/v1/products/', {'ordering': 'model'})
+
+    assert cached['X-Cache'] == 'HIT'
+    assert cached['ETag'] == response['ETag']
+    assert cached.json() == response.json()
+
+    not_modified = client.get('/api/v1/products/', {'ordering': 'model'}, headers={'If-None-Match': response['ETag']})
+
+    assert not_modified.status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_catalog_version()
+    response = client.get('/api/v1/products/', {'ordering': 'model'}, headers={'If-None-Match': response['ETag']})
+
+    assert response.status_code == 200
+    assert response['X-Cache'] == 'MISS'
+
+
+@pytest.mark.django_db
+def test_add_order_items_queries(client, user, contact, products):
+    headers = {
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+        'Content-Type': 'application/json'
+    }
+    product_infos = list(ProductInfo.objects.order_by('pk'))
+
+    def add(count):
+        order_items = [{'product': {'id': product_info.product_id}, 'quantity': 1, 'shop': product_info.shop_id}
+                       for product_info in product_infos[:count]]
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/v1/add_order_items/', data={'contact': contact.id, 'order_items': order_items},
+                                   headers=headers)
+        assert response.status_code == 201
+        return len(queries)
+
+    small_basket = add(2)
+    Order.objects.all().delete()
+    large_basket = add(12)
+
+    assert small_basket == large_basket
+    assert OrderItem.objects.count() == 12
+
+    # the lines already in the basket are updated in bulk as well
+    assert add(2) == add(12)
+    assert OrderItem.objects.get(product=product_infos[0].product).quantity == 3
+
+
+@pytest.mark.django_db
+def test_confirm_order_out_of_stock(client, user, contact, products):
+    headers = {
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+        'Content-Type': 'application/json'
+    }
+    short, available = ProductInfo.objects.order_by('pk')[:2]
+    response = client.post('/api/v1/add_order_items/', data={'contact': contact.id, 'order_items': [
+        {'product': {'id': short.product_id}, 'quantity': 2, 'shop': short.shop_id},
+        {'product': {'id': available.product_id}, 'quantity': 1, 'shop': available.shop_id},
+    ]}, headers=headers)
+    assert response.status_code == 201
+
+    # the stock was sold out after the goods were put into the basket
+    ProductInfo.objects.filter(pk=short.pk).update(quantity=1)
+    order = Order.objects.get(user=user)
+    response = client.patch(f'/api/v1/confirm/{order.id}/', data={'status': 'confirm'}, headers=headers)
+
+    assert response.status_code == 403
+    assert 'available 1 pieces' in response.json()['Error']
+    order.refresh_from_db()
+    assert order.status == 'new'
+    assert ProductInfo.objects.get(pk=available.pk).quantity == available.quantity
+
+
+@pytest.mark.django_db(transaction=True)
+def test_confirm_orders_concurrently(user, contact, products):
+    if connection.vendor != 'postgresql':
+        pytest.skip('Concurrent confirmations need the row locking of PostgreSQL.')
+
+    product_info = ProductInfo.objects.order_by('pk').first()
+    ProductInfo.objects.filter(pk=product_info.pk).update(quantity=10)
+    orders = [Order.objects.create(user=user, contact=contact, status='new') for _ in range(40)]
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=product_info.product_id, shop_id=product_info.shop_id, quantity=1,
+                  unit_price=product_info.price_rrc)
+        for order in orders
+    ])
+
+    def confirm(order):
+        try:
+            return confirm_order(order) is not None
+        except OutOfStock:
+            return False
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        confirmed = sum(pool.map(confirm, orders))
+
+    assert confirmed == 10
+    assert ProductInfo.objects.get(pk=product_info.pk).quantity == 0
+    assert Order.objects.filter(status='confirmed').count() == 10
+
+
+@pytest.mark.django_db
+def test_list_orders(client, user, contact, products):
+    headers = {
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+        'Content-Type': 'application/json'
+    }
+    product_info = ProductInfo.objects.order_by('pk').first()
+
+    def create_orders(count, status):
+        orders = [Order.objects.create(user=user, contact=contact, status=status) for _ in range(count)]
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_info.product_id, shop_id=product_info.shop_id, quantity=quantity,
+                      unit_price=product_info.price_rrc)
+            for order in orders for quantity in (1, 2)
+        ])
+
+    def list_orders(params):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/orders/', params, headers=headers)
+        assert response.status_code == 200
+        return response.json(), len(queries)
+
+    create_orders(2, 'confirmed')
+    _, few_orders = list_orders({})
+    create_orders(20, 'delivered')
+    data, many_orders = list_orders({})
+
+    assert few_orders == many_orders
+    assert len(data['results']) == 22
+    assert data['results'][0]['total_sum'] == 3 * product_info.price_rrc
+    assert data['results'][0]['items_count'] == 2
+
+    data, _ = list_orders({'status': 'confirmed', 'page_size': 1})
+    assert len(data['results']) == 1
+    assert data['results'][0]['status'] == 'confirmed'
+    assert data['next']
+
+    data, _ = list_orders({'date_to': '2000-01-01'})
+    assert data['results'] == []
+
+    order = Order.objects.filter(status='confirmed').first()
+    response = client.get(f'/api/v1/order/{order.id}/', headers=headers)
+    assert response.status_code == 200
+    assert response.json()['total_sum'] == 3 * product_info.price_rrc
+    assert response.json()['items_count'] == 2
+
+
+@pytest.mark.django_db
+def test_order_item_price_snapshot(client, user, contact, products):
+    headers = {
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+        'Content-Type': 'application/json'
+    }
+    product_info = ProductInfo.objects.order_by('pk').first()
+    price = product_info.price_rrc
+    order_items = [{'product': {'id': product_info.product_id}, 'quantity': 1, 'shop': product_info.shop_id}]
+
+    client.post('/api/v1/add_order_items/', data={'contact': contact.id, 'order_items': order_items}, headers=headers)
+    # a later upload changes the price of the offer
+    ProductInfo.objects.filter(pk=product_info.pk).update(price_rrc=price + 1000)
+    client.post('/api/v1/add_order_items/', data={'contact': contact.id, 'order_items': order_items}, headers=headers)
+
+    order_item = OrderItem.objects.get()
+    assert order_item.quantity == 2
+    assert order_item.unit_price == price
+    assert order_item.total_price == 2 * price
+
+    OrderItem.objects.filter(pk=order_item.pk).update(quantity=5)
+    order_item.refresh_from_db()
+    assert order_item.total_price == 5 * price
+
+    order_item.unit_price = price - 1
+    OrderItem.objects.bulk_update([order_item], ['unit_price'])
+    order_item.refresh_from_db()
+    assert order_item.total_price == 5 * (price - 1)
+
+
+@pytest.mark.django_db
+def test_fast_serializers(client, user, contact, products):
+    order = Order.objects.create(user=user, contact=contact, status='new')
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=product_info.product_id, shop_id=product_info.shop_id, quantity=number + 1,
+                  unit_price=Decimal(product_info.price_rrc) / 3)
+        for number, product_info in enumerate(ProductInfo.objects.order_by('pk')[:3])
+    ])
+    product_infos = ProductInfo.objects.order_by('pk')
+    order_items = OrderItem.objects.order_by('pk')
+
+    assert ProductInfoValues().serialize(ProductInfoValues().values(product_infos)) == \
+        ProductInfoSerializer(product_infos, many=True).data
+    assert ListItemsValues().serialize(ListItemsValues().values(order_items)) == \
+        ListItemsSerializer(order_items, many=True).data
+
+    response = client.get('/api/v1/basket', headers={
+        'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
+    })
+    data = {'items': ListItemsSerializer(order_items, many=True).data, 'dt': order.dt, 'name': 'Связной'}
+    expected = json.loads(JSONRenderer().render(ListItemsSerializer(order_items, many=True).data))
+    assert sorted(response.json(), key=lambda item: item['product']['id']) == \
+        sorted(expected, key=lambda item: item['product']['id'])
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+def test_export_products(client, products, tmp_path):
+    expected = ProductInfoValues().serialize(ProductInfoValues().values(ProductInfo.objects.order_by('pk')))
+
+    response = client.get('/api/v1/products/export/?format=json')
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'application/json'
+    assert json.loads(b''.join(response.streaming_content)) == expected
+
+    response = client.get('/api/v1/products/export/?format=ndjson', headers={'Accept-Encoding': 'gzip'})
+    assert response['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+    assert [json.loads(line) for line in lines] == expected
+
+    assert client.get('/api/v1/products/export/?format=xml').status_code == 400
+
+    output = tmp_path / 'catalog.ndjson.gz'
+    call_command('export_catalog', '--format', 'ndjson', '--gzip', '--chunk-size', '5', '--output', str(output))
+    assert [json.loads(line) for line in gzip.decompress(output.read_bytes()).splitlines()] == expected
+
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_products_asgi(products):
+    expected = ProductInfoValues().serialize(ProductInfoValues().values(ProductInfo.objects.order_by('pk')))
+
+    async def export():
+        response = await AsyncClient().get('/api/v1/products/export/?format=ndjson&gzip=1')
+        return response, b''.join([piece async for piece in response.streaming_content])
+
+    response, content = async_to_sync(export)()
+
+    # an async iterator: the ASGI handler sends the pieces as they come instead of listing them first
+    assert response.is_async
+    assert [json.loads(line) for line in gzip.decompress(content).splitlines()] == expected
+
+@pytest.mark.django_db
+def test_shop_snapshot(client, user, products, catalog_cache, django_capture_on_commit_callbacks):
+    shop = Shop.objects.get()
+
+    def list_shop():
+        pages, url = [], f'/api/v1/products/?shop={shop.id}&page_size=4'
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                pages.append(client.get(url).json())
+                url = pages[-1]['next']
+            pages.append(client.get(pages[-1]['previous']).json())
+        catalog_cache.clear()
+        return pages, any('backend_productinfo' in query['sql'] for query in queries.captured_queries)
+
+    from_database, used_database = list_shop()
+    assert used_database
+    assert sum(len(page['results']) for page in from_database[:-1]) == 14
+    assert from_database[-1] == from_database[-3]
+
+    build_snapshot(shop.id)
+    from_snapshot, used_database = list_shop()
+    assert not used_database
+    assert from_snapshot == from_database
+
+    # goods of the shop changed: the snapshot is stale until it is rebuilt
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_catalog_version([shop.id])
+    assert list_shop() == (from_database, True)
+
+    call_command('build_snapshots')
+    assert list_shop() == (from_database, False)
+    assert client.get('/api/v1/products/?shop=x').status_code == 400
+
+
+@pytest.mark.django_db
+def test_corrupt_shop_snapshot(client, user, products, catalog_cache):
+    shop = Shop.objects.get()
+    url = f'/api/v1/products/?shop={shop.id}&page_size=100'
+    expected = client.get(url).json()
+    catalog_cache.clear()
+    path = build_snapshot(shop.id)
+    data = bytearray(path.read_bytes())
+    # the first section claims a length which is not a whole number of integers
+    offset, length = snapshots.SECTION.unpack_from(data, snapshots.HEADER.size)
+    snapshots.SECTION.pack_into(data, snapshots.HEADER.size, offset, length - 1)
+    path.unlink()
+    path.write_bytes(data)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.json() == expected
+
+
+@pytest.mark.django_db
+def test_shop_snapshot_after_confirm(client, user, contact, products, settings, django_capture_on_commit_callbacks):
+    settings.CATALOG_SNAPSHOT_DELAY = 0
+    shop = Shop.objects.get()
+    product_info = ProductInfo.objects.filter(shop=shop).order_by('pk').first()
+    build_snapshot(shop.id)
+    order = Order.objects.create(user=user, contact=contact, status='new')
+    OrderItem.objects.create(order=order, product_id=product_info.product_id, shop=shop, quantity=1,
+                             unit_price=product_info.price_rrc)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        confirm_order(order)
+    with CaptureQueriesContext(connection) as queries:
+        results = client.get(f'/api/v1/products/?shop={shop.id}&page_size=100').json()['results']
+
+    assert not any('backend_productinfo' in query['sql'] for query in queries.captured_queries)
+    assert next(result for result in results if result['product']['id'] == product_info.product_id)['quantity'] == \
+        product_info.quantity - 1
+
+
+def test_schedule_snapshots_debounced(settings, monkeypatch):
+    timers = []
+
+    class Timer:
+        def __init__(self, interval, function, args):
+            self.function, self.args, self.daemon = function, args, False
+            timers.append(self)
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr('backend.snapshots.threading.Timer', Timer)
+    monkeypatch.setattr('backend.snapshots._build_quietly', lambda shop_id: None)
+    settings.CATALOG_SNAPSHOT_DELAY = 5
+    _schedule([1, 2])
+    _schedule([1])
+    assert [timer.args for timer in timers] == [[1], [2]]
+
+    timers[0].function(*timers[0].args)
+    _schedule([1])
+    assert [timer.args for timer in timers] == [[1], [2], [1]]
+    _scheduled.clear()
+
+
+@pytest.mark.django_db
+def test_update_stock(client, user, products, feed_url):
+    shop = Shop.objects.get()
+    first, second = ProductInfo.objects.filter(shop=shop).order_by('pk')[:2]
+    headers = {'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}'}
+    items = [
+        {'external_id': first.external_id, 'quantity': 7},
+        {'external_id': second.external_id, 'price': 100, 'price_rrc': 120},
+        {'external_id': 999999, 'quantity': 1},
+        {'external_id': first.external_id, 'quantity': 1},
+        {'external_id': second.external_id, 'quantity': -1},
+    ]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.patch('/api/v1/stock/', {'items': items}, format='json', headers=headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert (data['updated'], data['not_found'], data['invalid']) == (2, 1, 2)
+    assert [result['status'] for result in data['results']] == ['updated', 'updated', 'not_found', 'invalid', 'invalid']
+    assert sum(query['sql'].startswith('WITH changes') for query in queries.captured_queries) == 1
+
+    updated_first, updated_second = ProductInfo.objects.filter(pk__in=[first.pk, second.pk]).order_by('pk')
+    assert (updated_first.quantity, updated_first.price, updated_first.fingerprint) == (7, first.price, '')
+    assert (updated_second.quantity, updated_second.price, updated_second.price_rrc) == (second.quantity, 100, 120)
+    assert Shop.objects.get().feed_digest == ''
+
+    # the next upload of the unchanged feed is imported again and restores the feed values
+    client.post('/api/v1/upload/', data={
+        'url': f'{feed_url}/shop1.yaml',
+    }, format='json', headers=headers)
+    call_command('import_worker', '--burst')
+    assert ProductInfo.objects.get(pk=first.pk).quantity == first.quantity
+
+    # values over the integer columns are rejected per row instead of failing the update
+    response = client.patch('/api/v1/stock/', {'items': [
+        {'external_id': first.external_id, 'quantity': 2 ** 31},
+        {'external_id': 2 ** 31, 'quantity': 1},
+        {'external_id': second.external_id, 'quantity': 2 ** 31 - 1},
+    ]}, format='json', headers=headers)
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json()['results']] == ['invalid', 'invalid', 'updated']
+    assert response.json()['results'][0]['error'] == 'quantity should be an integer from 0 to 2147483647'
+    assert ProductInfo.objects.get(pk=first.pk).quantity == first.quantity
+
+    assert client.patch('/api/v1/stock/', {'items': []}, format='json', headers=headers).status_code == 400
+    assert client.patch('/api/v1/stock/', {'items': items, 'shop': shop.id + 1}, format='json',
+                        headers=headers).status_code == 404
+
+
+@pytest.mark.parametrize('ordering', ['dt', '-dt'])
+@pytest.mark.django_db
+def test_orders_pagination_by_date(client, user, contact, ordering):
+    headers = {'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}'}
+    orders = [Order.objects.create(user=user, contact=contact, status='delivered') for _ in range(7)]
+    created = orders[0].dt.replace(microsecond=0)
+    # several orders within one millisecond, two of them at the same microsecond
+    for order, microsecond in zip(orders, [100, 200, 200, 300, 999, 1500, 250_000]):
+        Order.objects.filter(pk=order.pk).update(dt=created.replace(microsecond=microsecond))
+    expected = list(Order.objects.order_by(ordering, 'pk' if ordering == 'dt' else '-pk').values_list('id', flat=True))
+
+    ids, url, pages = [], f'/api/v1/orders/?ordering={ordering}&page_size=2', 0
+    while url and pages < 10:
+        data = client.get(url, headers=headers).json()
+        ids += [order['id'] for order in data['results']]
+        url, pages = data['next'], pages + 1
+
+    assert ids == expected
+
+
+@pytest.mark.django_db
+def test_orders_pagination_by_total(client, user, contact, products):
+    headers = {'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}'}
+    product_info = ProductInfo.objects.order_by('pk').first()
+    orders = [Order.objects.create(user=user, contact=contact, status='delivered') for _ in range(5)]
+    # orders without lines total 0 instead of NULL
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=product_info.product_id, shop_id=product_info.shop_id, quantity=number,
+                  unit_price=product_info.price_rrc)
+        for number, order in enumerate(orders[:3], start=1)
+    ])
+
+    ids, url = [], '/api/v1/orders/?ordering=total_sum&page_size=2'
+    while url:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        ids += [order['id'] for order in response.json()['results']]
+        url = response.json()['next']
+
+    assert ids == [orders[3].id, orders[4].id, orders[0].id, orders[1].id, orders[2].id]
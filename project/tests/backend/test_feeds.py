@@ -0,0 +1,164 @@
+import asyncio
+import gzip
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from backend import feeds
+from backend.feeds import FeedReader, FeedError, adownload_feed, detect_format, download_feed, feed_client
+
+
+SHOP_FEED = Path(__file__).resolve().parents[3] / 'shop1.yaml'
+
+
+def chunked(data: bytes, size: int = 7) -> io.BufferedReader:
+    """
+    Wraps the given bytes into a buffered stream, that is read in small chunks.
+    """
+    return io.BufferedReader(io.BytesIO(data), buffer_size=size)
+
+
+@pytest.fixture
+def feed_server():
+    """
+    Fixture that serves ``shop1.yaml`` gzip-compressed from a local HTTP server
+    with an ETag, and answers 304 to a request with the same ETag. ``broken.yaml``
+    is cut off in the middle.
+    """
+    body = gzip.compress(SHOP_FEED.read_bytes())
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/broken.yaml':
+                # the connection is closed halfway through the announced body
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body[:len(body) // 2])
+            elif self.path != '/shop1.yaml':
+                self.send_error(404)
+            elif self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', '"v1"')
+                self.end_headers()
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_read_yaml_feed():
+    feed = FeedReader(chunked(SHOP_FEED.read_bytes()))
+    batches = list(feed.batches(5))
+
+    assert feed.shop == 'Связной'
+    assert [category['id'] for category in feed.categories] == [224, 15, 1, 5]
+    assert [len(batch) for batch in batches] == [5, 5, 4]
+    assert batches[0][0]['parameters']['Встроенная память (Гб)'] == 512
+
+
+def test_read_jsonl_feed():
+    lines = [
+        {'shop': 'Связной', 'categories': [{'id': 224, 'name': 'Смартфоны'}]},
+        {'id': 1, 'category': 224, 'model': 'm', 'name': 'n', 'price': 1, 'price_rrc': 2, 'quantity': 3},
+        {'id': 2, 'category': 224, 'model': 'm', 'name': 'n', 'price': 1, 'price_rrc': 2, 'quantity': 3},
+    ]
+    data = '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines).encode()
+    feed = FeedReader(chunked(data), 'jsonl')
+
+    assert feed.shop == 'Связной'
+    assert len(feed.categories) == 1
+    assert [good['id'] for good in feed.goods()] == [1, 2]
+
+
+def test_read_csv_feed():
+    data = ('id,category,category_name,model,name,price,price_rrc,quantity,Цвет,Встроенная память (Гб)\n'
+            '1,224,Смартфоны,apple/iphone/xr,iPhone XR,65000,69990,9,красный,256\n').encode()
+    feed = FeedReader(chunked(data), 'csv', shop='Связной')
+    goods = list(feed.goods())
+
+    assert feed.shop == 'Связной'
+    assert goods[0]['category_name'] == 'Смартфоны'
+    assert goods[0]['parameters'] == {'Цвет': 'красный', 'Встроенная память (Гб)': 256}
+
+
+def test_invalid_feed():
+    with pytest.raises(KeyError):
+        FeedReader(chunked(b'categories: []\ngoods: []\n'))
+    with pytest.raises(FeedError):
+        FeedReader(chunked(b'- just\n- a list\n'))
+
+
+@pytest.mark.parametrize(
+    ['url', 'content_type', 'feed_format'],
+    (
+        ('https://example.com/shop1.yaml', None, 'yaml'),
+        ('https://example.com/feed.jsonl', 'text/plain', 'jsonl'),
+        ('https://example.com/feed', 'text/csv; charset=utf-8', 'csv'),
+        ('https://example.com/feed', None, 'yaml'),
+    )
+)
+def test_detect_format(url, content_type, feed_format):
+    assert detect_format(url, content_type) == feed_format
+
+
+def test_download_feed(feed_server):
+    download = download_feed(f'{feed_server}/shop1.yaml')
+
+    assert download.file.read() == SHOP_FEED.read_bytes()
+    assert download.etag == '"v1"'
+    assert download_feed(f'{feed_server}/shop1.yaml', download.etag).not_modified
+    with pytest.raises(FeedError):
+        download_feed(f'{feed_server}/missing.yaml')
+    with pytest.raises(FeedError):
+        # nothing listens on the port
+        download_feed('http://127.0.0.1:1/shop1.yaml')
+
+
+def test_download_feed_too_large(feed_server, monkeypatch):
+    monkeypatch.setattr(feeds, 'MAX_FEED_SIZE', 1000)
+
+    with pytest.raises(FeedError):
+        download_feed(f'{feed_server}/shop1.yaml')
+
+
+def test_download_feed_broken(feed_server, monkeypatch):
+    spools = []
+
+    class Spool(feeds._Spool):
+        def __init__(self):
+            super().__init__()
+            spools.append(self)
+
+    monkeypatch.setattr(feeds, '_Spool', Spool)
+
+    with pytest.raises(FeedError):
+        download_feed(f'{feed_server}/broken.yaml')
+    assert len(spools) == 1
+    assert spools[0].file.closed
+
+
+def test_download_feeds_concurrently(feed_server):
+    async def download_all():
+        async with feed_client() as client:
+            return await asyncio.gather(*(adownload_feed(f'{feed_server}/shop1.yaml', client=client)
+                                          for _ in range(10)))
+
+    downloads = asyncio.run(download_all())
+
+    assert {download.file.read() for download in downloads} == {SHOP_FEED.read_bytes()}
@@ -0,0 +1,73 @@
+import copy
+from pathlib import Path
+
+import pytest
+import yaml
+
+from backend.importer import CatalogImporter
+from backend.models import Shop, Parameter, Product, ProductInfo, ProductParameter, ParameterFacet
+from users.models import CustomUser
+
+
+SHOP_FEED = Path(__file__).resolve().parents[3] / 'shop1.yaml'
+
+
+@pytest.fixture
+def feed():
+    """
+    Fixture that returns the parsed `shop1.yaml` price list.
+    """
+    return yaml.safe_load(SHOP_FEED.read_text(encoding='utf-8'))
+
+
+@pytest.fixture
+def shop():
+    """
+    Fixture that returns a `Shop` instance owned by a shop user.
+    """
+    user = CustomUser.objects.create_user(email='test_shop@mail.ru', password='secret', is_active=True, type='shop')
+    return Shop.objects.create(name='Связной', user=user)
+
+
+@pytest.mark.django_db
+def test_import_catalog(shop, feed):
+    summary = CatalogImporter(shop, batch_size=5).run(feed['categories'], feed['goods'])
+
+    assert summary['categories']['inserted'] == 4
+    assert summary['product_infos']['inserted'] == 14
+    assert ProductInfo.objects.filter(shop=shop).count() == 14
+    assert ProductParameter.objects.count() == sum(len(good['parameters']) for good in feed['goods'])
+    assert shop.categories.count() == 4
+    assert ProductInfo.objects.get(shop=shop, external_id=feed['goods'][0]['id']).parameters == \
+        feed['goods'][0]['parameters']
+    assert ParameterFacet.objects.get(parameter__name='Встроенная память (Гб)', value='256').count == 3
+
+
+@pytest.mark.django_db
+def test_reimport_changed_catalog(shop, feed):
+    CatalogImporter(shop).run(feed['categories'], feed['goods'])
+
+    changed = copy.deepcopy(feed)
+    removed = changed['goods'].pop()
+    changed['goods'][0]['price_rrc'] += 1
+    changed['goods'][1]['parameters'].pop('Цвет')
+    summary = CatalogImporter(shop).run(changed['categories'], changed['goods'])
+
+    assert summary['product_infos'] == {'inserted': 0, 'updated': 2, 'unchanged': 11, 'deleted': 1}
+    assert summary['parameters']['deleted'] == 1
+    assert not ProductInfo.objects.filter(shop=shop, external_id=removed['id']).exists()
+    assert ProductInfo.objects.get(shop=shop, external_id=changed['goods'][0]['id']).price_rrc == \
+        feed['goods'][0]['price_rrc'] + 1
+    assert 'Цвет' not in ProductInfo.objects.get(shop=shop, external_id=changed['goods'][1]['id']).parameters
+    assert not ParameterFacet.objects.filter(parameter__name='Цвет', value='красный').exists()
+
+
+@pytest.mark.django_db
+def test_import_catalog_order(shop, feed):
+    CatalogImporter(shop, batch_size=5).run(feed['categories'], feed['goods'])
+
+    # new rows are inserted in the order of the feed, whatever the hashing of the process
+    names = list(dict.fromkeys(good['name'] for good in feed['goods']))
+    parameters = list(dict.fromkeys(name for good in feed['goods'] for name in good['parameters']))
+    assert list(Product.objects.order_by('pk').values_list('name', flat=True)) == names
+    assert list(Parameter.objects.order_by('pk').values_list('name', flat=True)) == parameters
@@ -0,0 +1,68 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+BEFORE = [('backend', '0005_order_item_unit_price')]
+AFTER = [('backend', '0006_merge_duplicates')]
+
+
+@pytest.fixture
+def migrate():
+    """
+    Fixture that migrates the database to the given targets and returns the historical apps,
+    and migrates it back to the latest state afterwards.
+    """
+    def migrate(targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    yield migrate
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_merge_duplicates(migrate):
+    apps = migrate(BEFORE)
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Contact = apps.get_model('users', 'Contact')
+    Shop = apps.get_model('backend', 'Shop')
+    Category = apps.get_model('backend', 'Category')
+    Product = apps.get_model('backend', 'Product')
+    ProductInfo = apps.get_model('backend', 'ProductInfo')
+    Order = apps.get_model('backend', 'Order')
+    OrderItem = apps.get_model('backend', 'OrderItem')
+
+    user = CustomUser.objects.create(email='buyer@mail.ru', type='buyer', is_active=True)
+    contact = Contact.objects.create(user=user, city='Москва', street='Ленина', house='1', phone='+70000000000')
+    first_shop, second_shop = (Shop.objects.create(name=f'Shop {number}') for number in range(2))
+    # the same category and product imported by two shops
+    categories = [Category.objects.create(external_id=1, name='Смартфоны') for _ in range(2)]
+    categories[0].shops.add(first_shop)
+    categories[1].shops.add(second_shop)
+    products = [Product.objects.create(category=category, name='iPhone') for category in categories]
+    infos = [ProductInfo.objects.create(product=product, shop=shop, external_id=number, quantity=1, price=10,
+                                        price_rrc=12)
+             for number, (product, shop) in enumerate(zip(products, (first_shop, second_shop)))]
+    order = Order.objects.create(user=user, contact=contact, status='new')
+    items = [OrderItem.objects.create(order=order, product=product, shop=shop, quantity=1, unit_price=12,
+                                      total_price=12)
+             for product, shop in zip(products, (first_shop, second_shop))]
+
+    apps = migrate(AFTER)
+    Category = apps.get_model('backend', 'Category')
+    Product = apps.get_model('backend', 'Product')
+    ProductInfo = apps.get_model('backend', 'ProductInfo')
+    OrderItem = apps.get_model('backend', 'OrderItem')
+
+    category = Category.objects.get()
+    product = Product.objects.get()
+    assert category.pk == categories[0].pk
+    assert set(category.shops.values_list('pk', flat=True)) == {first_shop.pk, second_shop.pk}
+    assert (product.pk, product.category_id) == (products[0].pk, category.pk)
+    assert set(ProductInfo.objects.values_list('pk', 'product_id')) == {(info.pk, product.pk) for info in infos}
+    assert set(OrderItem.objects.values_list('pk', 'product_id', 'shop_id')) == \
+        {(item.pk, product.pk, item.shop_id) for item in items}
@@ -0,0 +1,75 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+
+from retail_api.metrics import HISTOGRAMS, Histogram, db_queries
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture(autouse=True)
+def metrics(settings):
+    """
+    Fixture that samples every request and empties the histograms of the process.
+    """
+    settings.METRICS_SAMPLE_RATE = 1.0
+    settings.METRICS_TOKEN = ''
+    for histogram in HISTOGRAMS:
+        histogram.series.clear()
+    yield
+    for histogram in HISTOGRAMS:
+        histogram.series.clear()
+
+
+def test_histogram():
+    histogram = Histogram('test_seconds', 'Test.', ('view',), (0.1, 1.0))
+    for amount in (0.05, 0.1, 0.5, 3):
+        histogram.observe(('a',), amount)
+
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{view="a",le="0.1"} 2',
+        'test_seconds_bucket{view="a",le="1.0"} 3',
+        'test_seconds_bucket{view="a",le="+Inf"} 4',
+        'test_seconds_sum{view="a"} 3.65',
+        'test_seconds_count{view="a"} 4',
+    ]
+
+
+@pytest.mark.django_db
+def test_metrics(client, settings, caplog):
+    settings.METRICS_SLOW_REQUEST_MS = 0
+    with caplog.at_level(logging.WARNING, logger='retail_api.metrics'):
+        assert client.get('/api/v1/products/').status_code == 200
+    response = client.get('/metrics')
+    metrics = response.content.decode()
+
+    assert response.status_code == 200
+    assert 'retail_http_request_duration_seconds_count{view="backend:products",method="GET",status="200"} 1' in metrics
+    assert 'retail_db_queries_count{view="backend:products",method="GET"} 1' in metrics
+    assert 'retail_render_duration_seconds_count{view="backend:products",method="GET"} 1' in metrics
+    assert 'retail_catalog_cache_total{result="misses"}' in metrics
+    assert 'Slow request GET /api/v1/products/ (backend:products)' in caplog.text
+    assert 'SELECT' in caplog.text
+
+
+@pytest.mark.django_db
+def test_metrics_token(client, settings):
+    settings.METRICS_TOKEN = 'secret'
+
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_metrics_asgi():
+    # under ASGI the middleware and the view run in a thread of the request, not the main one
+    response = async_to_sync(AsyncClient().get)('/api/v1/products/')
+
+    assert response.status_code == 200
+    assert db_queries.series[('backend:products', 'GET')][-2] >= 1
@@ -1,7 +1,9 @@
 import pytest
+from django.utils import timezone
 from rest_framework.test import APIClient
 import base64
-from users.models import CustomUser, Contact
+from users.authentication import token_cache
+from users.models import CustomUser, Contact, AuthToken
 
 
 # for testing change POSTGRES_HOST to 127.0.0.1 in .env file
@@ -150,4 +152,38 @@ def test_delete_contact(client, user, contact):
         'Authorization': f'Basic {encode_base64("test_user@mail.ru:secret")}',
         'Content-Type': 'application/json'})
 
-    assert delete_response.status_code == 204
\ No newline at end of file
+    assert delete_response.status_code == 204
+
+@pytest.mark.django_db
+def test_token_login(client, user, contact, django_assert_num_queries):
+    token_cache.clear()
+    assert client.post('/api/v1/login/', data={'email': 'test_user@mail.ru', 'password': 'wrong'}).status_code == 403
+    response = client.post('/api/v1/login/', data={'email': 'test_user@mail.ru', 'password': 'secret'})
+    token = response.json()['token']
+    auth_token = AuthToken.objects.get(user=user)
+
+    assert response.status_code == 200
+    assert auth_token.key != token
+    assert client.get('/api/v1/contacts/', headers={'Authorization': f'Token {token}'}).status_code == 200
+
+    # a cached token costs no query, only the contacts are selected
+    with django_assert_num_queries(1):
+        response = client.get('/api/v1/contacts/', headers={'Authorization': f'Token {token}'})
+    assert response.json()[0]['city'] == 'test'
+
+    assert client.post('/api/v1/logout/', headers={'Authorization': f'Token {token}'}).status_code == 200
+    assert client.get('/api/v1/contacts/', headers={'Authorization': f'Token {token}'}).status_code == 403
+    assert not AuthToken.objects.exists()
+
+
+@pytest.mark.django_db
+def test_expired_token(client, user):
+    token_cache.clear()
+    token = client.post('/api/v1/login/', data={'email': 'test_user@mail.ru', 'password': 'secret'}).json()['token']
+    AuthToken.objects.update(expires=timezone.now())
+    token_cache.clear()
+
+    response = client.get('/api/v1/contacts/', headers={'Authorization': f'Token {token}'})
+
+    assert response.status_code == 403
+    assert response.json()['detail'] == 'Invalid or expired token.'
@@ -0,0 +1,64 @@
+from smtplib import SMTPServerDisconnected
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import OutboxMessage
+from users.outbox import MAX_ATTEMPTS, dispatch_batch, enqueue_email
+
+
+class FailingBackend(BaseEmailBackend):
+    """
+    Email backend of a mail server that drops every connection.
+    """
+    def send_messages(self, email_messages):
+        raise SMTPServerDisconnected('Connection unexpectedly closed')
+
+
+@pytest.fixture
+def client():
+    """
+    Fixture that returns an instance of `rest_framework.test.APIClient`,
+    which is a test client for making requests to your Django views.
+    """
+    return APIClient()
+
+
+@pytest.mark.django_db
+def test_registration_email_is_queued(client):
+    response = client.post('/api/v1/registration/', data={'email': 'test_user@mail.ru', 'password': 'secret'})
+
+    assert response.status_code == 201
+    assert not mail.outbox
+    assert OutboxMessage.objects.get().recipients == ['test_user@mail.ru']
+
+    call_command('send_outbox', '--burst')
+
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == ['test_user@mail.ru']
+    assert mail.outbox[0].content_subtype == 'html'
+    assert OutboxMessage.objects.get().status == 'sent'
+
+
+@pytest.mark.django_db
+def test_outbox_retries_with_backoff(settings):
+    settings.EMAIL_BACKEND = 'tests.users.test_outbox.FailingBackend'
+    message = enqueue_email('Subject', 'Body', ['test_user@mail.ru'])
+
+    assert dispatch_batch() == {'sent': 0, 'retried': 1, 'failed': 0}
+    message.refresh_from_db()
+    assert message.status == 'pending'
+    assert message.attempts == 1
+    assert message.next_attempt > timezone.now()
+    assert 'SMTPServerDisconnected' in message.last_error
+
+    # not due yet
+    assert dispatch_batch() == {'sent': 0, 'retried': 0, 'failed': 0}
+
+    OutboxMessage.objects.update(attempts=MAX_ATTEMPTS - 1, next_attempt=timezone.now())
+    assert dispatch_batch() == {'sent': 0, 'retried': 0, 'failed': 1}
+    assert OutboxMessage.objects.get().status == 'failed'
@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import CustomUser, Contact, ConfirmToken
+from .models import CustomUser, Contact, ConfirmToken, OutboxMessage, AuthToken
 
 
 admin.site.register(CustomUser)
 admin.site.register(Contact)
-admin.site.register(ConfirmToken)
\ No newline at end of file
+admin.site.register(ConfirmToken)
+admin.site.register(OutboxMessage)
+admin.site.register(AuthToken)
@@ -0,0 +1,125 @@
+import copy
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import AuthToken
+
+
+def hash_token(token):
+    """
+    A token has 256 random bits, so a single SHA-256 is enough to store it:
+    the slow password hashers only matter for guessable secrets.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_token(user):
+    """
+    Create a token for the user, dropping the expired ones.
+
+    Returns:
+        tuple: The token to hand to the client and its AuthToken row.
+    """
+    token = secrets.token_urlsafe(32)
+    AuthToken.objects.filter(user=user, expires__lte=timezone.now()).delete()
+    auth_token = AuthToken.objects.create(user=user, key=hash_token(token),
+                                          expires=timezone.now() + settings.AUTH_TOKEN_LIFETIME)
+    return token, auth_token
+
+
+def revoke_token(auth_token):
+    AuthToken.objects.filter(pk=auth_token.pk).delete()
+    token_cache.discard(auth_token.key)
+
+
+class TokenCache:
+    """
+    In-process LRU of validated tokens.
+
+    An entry is trusted for ``AUTH_TOKEN_CACHE_TTL`` seconds, so a token
+    revoked through another process or a deactivated user is refused at
+    most that long after the change.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, auth_token, valid_until = entry
+            if valid_until <= time.monotonic() or auth_token.expires <= timezone.now():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user, auth_token
+
+    def set(self, key, user, auth_token):
+        with self.lock:
+            self.entries[key] = (user, auth_token, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class TokenAuthentication(BaseAuthentication):
+    """
+    Authenticate ``Authorization: Token <token>`` with tokens issued by the login view.
+
+    A token is looked up by its hash on the unique index together with its
+    user, and cached, so most requests cost a dictionary lookup instead of
+    the password hashing of Basic authentication.
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = hash_token(auth[1].decode())
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        cached = token_cache.get(key)
+        if cached is None:
+            auth_token = AuthToken.objects.select_related('user').filter(key=key).first()
+            if auth_token is None or auth_token.expires <= timezone.now():
+                raise exceptions.AuthenticationFailed('Invalid or expired token.')
+            if not auth_token.user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+            token_cache.set(key, auth_token.user, auth_token)
+            cached = auth_token.user, auth_token
+
+        user, auth_token = cached
+        # every request gets its own instance, the cached one is never changed
+        return copy.copy(user), auth_token
+
+    def authenticate_header(self, request):
+        return self.keyword
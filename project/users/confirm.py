@@ -1,21 +1,25 @@
 from django.conf import settings
-from django.core.mail import EmailMessage
+
+from .outbox import enqueue_email
 
 
 def send_email(email, token, recipient):
+    """
+    Queue the email confirmation link; it is sent by the ``send_outbox`` command.
+    """
 
     link = f'http://127.0.0.1:8000/api/v1/confirm_email/{token}/{email}'
     body = f"""
             Please click on the link to confirm your email:
             <a href="{link}">Confirm your email</a>
             """
-    msg = EmailMessage('Registration on retail site',
-                       body, settings.EMAIL_HOST_USER, recipient)
-    msg.content_subtype = "html"
-    msg.send()
+    enqueue_email('Registration on retail site', body, recipient)
 
 
 def send_confirmed_order(order_info, recipient):
+    """
+    Queue the order confirmation for the buyer and the shop administrator.
+    """
 
     products_list = ""
 
@@ -41,12 +45,6 @@ def send_confirmed_order(order_info, recipient):
     </pre>
                 """
 
-    msg_to_user = EmailMessage('Registration on retail site',
-                       body_to_recipient, settings.EMAIL_HOST_USER, recipient)
-    msg_to_user.content_subtype = "html"
-    msg_to_user.send()
-
-    msg_to_admin = EmailMessage('Registration on retail site',
-                       body_to_admin, settings.EMAIL_HOST_USER, [settings.EMAIL_HOST_USER])
-    msg_to_admin.content_subtype = "html"
-    msg_to_admin.send()
\ No newline at end of file
+    enqueue_email('Registration on retail site', body_to_recipient, recipient)
+    if settings.EMAIL_HOST_USER:
+        enqueue_email('Registration on retail site', body_to_admin, [settings.EMAIL_HOST_USER])
@@ -0,0 +1,29 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.outbox import dispatch_batch
+
+
+class Command(BaseCommand):
+    help = 'Send the queued emails in batches over a reused mail server connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages sent per connection.')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait before polling an empty outbox again.')
+        parser.add_argument('--burst', action='store_true', help='Exit once no message is due.')
+
+    def handle(self, *args, **options):
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+        while not stopping:
+            counts = dispatch_batch(options['batch_size'])
+            if not any(counts.values()):
+                if options['burst']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f'Outbox: {counts["sent"]} sent, {counts["retried"]} retried, {counts["failed"]} failed')
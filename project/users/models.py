@@ -4,6 +4,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.utils import timezone
 
 from .managers import CustomUserManager
 
@@ -13,6 +14,12 @@ USER_TYPE_CHOICES = (
     ('shop', 'Магазин'),
 )
 
+OUTBOX_STATUS_CHOICES = (
+    ('pending', 'Ожидает отправки'),
+    ('sent', 'Отправлено'),
+    ('failed', 'Ошибка'),
+)
+
 
 class BaseUser(AbstractUser):
 
@@ -78,4 +85,44 @@ class ConfirmToken(models.Model):
 
     class Meta:
         verbose_name = 'Токен подтверждения'
-        verbose_name_plural = 'Список токенов подтверждения'
\ No newline at end of file
+        verbose_name_plural = 'Список токенов подтверждения'
+
+
+class AuthToken(models.Model):
+    key = models.CharField(max_length=64, unique=True, verbose_name='SHA-256 токена')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='auth_tokens',
+                             verbose_name='Пользователь')
+    dt = models.DateTimeField(auto_now_add=True, verbose_name='Дата выдачи')
+    expires = models.DateTimeField(verbose_name='Действует до')
+
+    class Meta:
+        verbose_name = 'Токен доступа'
+        verbose_name_plural = 'Список токенов доступа'
+
+    def __str__(self):
+        return f'{self.user} : {self.expires}'
+
+
+class OutboxMessage(models.Model):
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    body = models.TextField(verbose_name='Текст')
+    content_subtype = models.CharField(max_length=20, default='html', verbose_name='Формат')
+    from_email = models.CharField(max_length=255, blank=True, verbose_name='Отправитель')
+    recipients = models.JSONField(default=list, verbose_name='Получатели')
+    status = models.CharField(max_length=7, default='pending', verbose_name='Статус', choices=OUTBOX_STATUS_CHOICES)
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток отправки')
+    next_attempt = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    dt = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    sent = models.DateTimeField(null=True, blank=True, verbose_name='Дата отправки')
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Очередь исходящих писем'
+        ordering = ('-dt',)
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'], name='outbox_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} -> {", ".join(self.recipients)}: {self.status}'
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+MAX_ATTEMPTS = 8
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 3600
+
+
+def enqueue_email(subject, body, recipients, html=True):
+    """
+    Put a message into the outbox instead of sending it.
+
+    The row is written through the current connection, so it is committed or
+    rolled back together with the change the message is about.
+    """
+    return OutboxMessage.objects.create(subject=subject, body=body, recipients=list(recipients),
+                                        content_subtype='html' if html else 'plain',
+                                        from_email=settings.DEFAULT_FROM_EMAIL or '')
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff: 30s, 1m, 2m, ... up to an hour between attempts.
+    """
+    return timedelta(seconds=min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+def dispatch_batch(size=100):
+    """
+    Send a batch of due messages over a single mail server connection.
+
+    The batch is locked with ``SKIP LOCKED`` so several dispatchers never send
+    the same message. A message that cannot be sent is retried with backoff
+    and marked as failed after ``MAX_ATTEMPTS``.
+
+    Returns:
+        dict: Numbers of ``sent``, ``retried`` and ``failed`` messages.
+    """
+    counts = {'sent': 0, 'retried': 0, 'failed': 0}
+    with transaction.atomic():
+        messages = list(OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+            status='pending', next_attempt__lte=timezone.now(),
+        ).order_by('next_attempt')[:size])
+        if not messages:
+            return counts
+
+        connection = get_connection()
+        try:
+            for message in messages:
+                email = EmailMessage(message.subject, message.body, message.from_email or None,
+                                     message.recipients, connection=connection)
+                email.content_subtype = message.content_subtype
+                try:
+                    # opened once and kept for the batch; reopened after a failure
+                    connection.open()
+                    email.send()
+                except Exception as er:
+                    connection.close()
+                    message.attempts += 1
+                    message.last_error = f'{type(er).__name__}: {er}'
+                    if message.attempts >= MAX_ATTEMPTS:
+                        message.status = 'failed'
+                        counts['failed'] += 1
+                    else:
+                        message.next_attempt = timezone.now() + retry_delay(message.attempts)
+                        counts['retried'] += 1
+                else:
+                    message.attempts += 1
+                    message.status = 'sent'
+                    message.sent = timezone.now()
+                    counts['sent'] += 1
+        finally:
+            connection.close()
+
+        OutboxMessage.objects.bulk_update(messages, ['status', 'attempts', 'next_attempt', 'last_error', 'sent'])
+    return counts
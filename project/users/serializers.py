@@ -13,6 +13,11 @@ class CreateCustomUserSerializer(serializers.ModelSerializer):
         fields = ['id','email', 'first_name', 'last_name', 'type', 'password']
 
 
+class LoginSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    password = serializers.CharField()
+
+
 class UpdateCustomUserSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(required=False, help_text='При смене email необходимо подтвердить аккаунт')
     password = serializers.CharField(required=False)
@@ -2,12 +2,14 @@ from django.urls import path
 
 
 from .views import (CreateCustomUserViewSet, CreateContactView, UpdateCustomUserViewSet, GetContactView, ConfirmEmailView,
-                    UpdateContactView, DeleteContactView)
+                    UpdateContactView, DeleteContactView, LoginView, LogoutView)
 
 app_name = 'users'
 
 urlpatterns = [
     path('registration/', CreateCustomUserViewSet.as_view(), name='registration'),
+    path('login/', LoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('add_contact/', CreateContactView.as_view(), name='add_contact'),
     path('update_user/', UpdateCustomUserViewSet.as_view(), name='update_user'),
     path('contacts/', GetContactView.as_view(), name='contacts'),
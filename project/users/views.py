@@ -1,5 +1,6 @@
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.contrib.auth import authenticate
+from django.db import transaction
 from .confirm import send_email
 from django.http import JsonResponse
 from django_filters.rest_framework import DjangoFilterBackend
@@ -8,11 +9,13 @@ from rest_framework.filters import SearchFilter
 from rest_framework.generics import CreateAPIView, UpdateAPIView, ListAPIView, DestroyAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from .permissions import IsOwnerOrReadOnly
-from .models import CustomUser, Contact, ConfirmToken
+from .authentication import issue_token, revoke_token
+from .models import CustomUser, Contact, ConfirmToken, AuthToken
 from .serializers import (CreateCustomUserSerializer, CreateContactSerializer, UpdateCustomUserSerializer,
-                          GetContactSerializer, UpdateContactSerializer)
+                          GetContactSerializer, UpdateContactSerializer, LoginSerializer)
 
 
 class CreateCustomUserViewSet(CreateAPIView):
@@ -25,9 +28,10 @@ class CreateCustomUserViewSet(CreateAPIView):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = CustomUser.objects.create_user(**serializer.validated_data)
-        token = ConfirmToken.objects.create(user=user)
-        send_email(user.email, token.token, [user.email])
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(**serializer.validated_data)
+            token = ConfirmToken.objects.create(user=user)
+            send_email(user.email, token.token, [user.email])
         return JsonResponse({"Success": "Account created successfully, please confirm your email"},
                             status=status.HTTP_201_CREATED)
 
@@ -40,23 +44,61 @@ class UpdateCustomUserViewSet(UpdateAPIView):
     def update(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = CustomUser.objects.get(id=self.request.user.id)
-        if (serializer.validated_data.get('email') is not None and
-                request.user.email != serializer.validated_data.get('email')):
-            email = serializer.validated_data.get('email')
-            user.email = email
-            user.is_active = False
-            token = ConfirmToken.objects.create(user=user)
-            send_email(email, token.token, [email])
-        user.first_name = serializer.validated_data.get('first_name', user.first_name)
-        user.last_name = serializer.validated_data.get('last_name', user.last_name)
-        user.type = serializer.validated_data.get('type', user.type)
-        if serializer.validated_data.get('password') is not None:
-            user.set_password(serializer.validated_data.get('password', user.password))
-        user.save()
+        with transaction.atomic():
+            user = CustomUser.objects.get(id=self.request.user.id)
+            if (serializer.validated_data.get('email') is not None and
+                    request.user.email != serializer.validated_data.get('email')):
+                email = serializer.validated_data.get('email')
+                user.email = email
+                user.is_active = False
+                token = ConfirmToken.objects.create(user=user)
+                send_email(email, token.token, [email])
+            user.first_name = serializer.validated_data.get('first_name', user.first_name)
+            user.last_name = serializer.validated_data.get('last_name', user.last_name)
+            user.type = serializer.validated_data.get('type', user.type)
+            if serializer.validated_data.get('password') is not None:
+                user.set_password(serializer.validated_data.get('password', user.password))
+            user.save()
         return Response({"Success": "Profile updated successfully"}, status=status.HTTP_201_CREATED)
 
 
+class LoginView(APIView):
+    """
+    Exchange the email and password for an API token.
+
+    The password is checked once here; later requests send
+    ``Authorization: Token <token>`` and skip password hashing.
+    """
+    authentication_classes = []
+
+    def post(self, request, *args, **kwargs):
+        serializer = LoginSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = authenticate(request, username=serializer.validated_data['email'],
+                            password=serializer.validated_data['password'])
+        if user is None:
+            return JsonResponse({"Error": "Invalid email or password, or the email is not confirmed"},
+                                status=status.HTTP_403_FORBIDDEN)
+
+        token, auth_token = issue_token(user)
+        return Response({"Success": "Logged in successfully", "token": token,
+                         "expires": auth_token.expires}, status=status.HTTP_200_OK)
+
+
+class LogoutView(APIView):
+    """
+    Revoke the token the request was authenticated with.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.auth, AuthToken):
+            return JsonResponse({"Error": "Only token authentication can be revoked"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        revoke_token(request.auth)
+        return Response({"Success": "Logged out successfully"}, status=status.HTTP_200_OK)
+
+
 class CreateContactView(CreateAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Contact.objects.all()